@@ -2,18 +2,47 @@ import os
 import io
 import zipfile
 import uuid
-from datetime import datetime, timezone
+import hashlib
+import shutil
+import tempfile
+import threading
+import itertools
+import time
+_boot_started = time.perf_counter()
+import csv
+import random
+import gzip
+import gc
+import bisect
+import cProfile
+import sys
+import types
+import importlib
+import resource
+import subprocess
+import math
+import base64
+import socket
+import hmac
+from collections import deque, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial, lru_cache
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, json, send_file, flash, redirect, url_for, session, send_from_directory
-import qrcode
+from types import SimpleNamespace
+from flask import Flask, render_template, request, jsonify, json, send_file, flash, redirect, url_for, session, send_from_directory, abort, Response, stream_with_context, g, has_request_context
 from slugify import slugify
-from PIL import Image, ImageDraw, ImageFont, ImageEnhance
-from pdf2image import convert_from_bytes
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.utils import ImageReader
+from PIL import Image, ImageDraw, ImageFont, ImageOps
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from xml.sax.saxutils import escape
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import or_, and_, func, tuple_, event as sa_event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import load_only, joinedload, Session as OrmSession
 from flask_migrate import Migrate
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, TextAreaField # <-- পরিবর্তন: TextAreaField যোগ করা হয়েছে
@@ -21,11 +50,49 @@ from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationE
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from email_validator import validate_email
-import stripe
+import click
 from dotenv import load_dotenv
 from flask_mail import Mail, Message
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadTimeSignature
-from rembg import remove
+try: import brotli # ঐচ্ছিক: থাকলে পেজ ক্যাশে br বডিও তৈরি হয়
+except ImportError: brotli = None
+
+# --- নতুন সংযোজন: ভারী টুল ব্যাকএন্ডগুলো প্রথম ব্যবহারের সময় লোড হয় (lazy import) ---
+# প্রতিটি gunicorn ওয়ার্কার বা `flask db upgrade`-এর মতো CLI আর শুরুতেই onnxruntime/reportlab/stripe লোড করে না
+LAZY_IMPORT_TIMINGS = {} # মডিউল -> প্রথম লোডে কত সেকেন্ড লেগেছে
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name); object.__setattr__(self, '_lazy_module', None)
+    def _load(self):
+        module = object.__getattribute__(self, '_lazy_module')
+        if module is None:
+            started = time.perf_counter(); module = importlib.import_module(self.__name__)
+            LAZY_IMPORT_TIMINGS[self.__name__] = time.perf_counter() - started
+            # এরপর থেকে অ্যাট্রিবিউট সরাসরি __dict__ থেকে আসে, __getattr__-এর খরচ নেই
+            self.__dict__.update(module.__dict__); object.__setattr__(self, '_lazy_module', module)
+        return module
+    def __getattr__(self, name): return getattr(self._load(), name)
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value); self.__dict__[name] = value
+    @property
+    def loaded(self): return object.__getattribute__(self, '_lazy_module') is not None
+def lazy_import(name):
+    return sys.modules[name] if name in sys.modules else LazyModule(name)
+rembg = lazy_import('rembg')
+pdf2image = lazy_import('pdf2image')
+rl_pagesizes = lazy_import('reportlab.lib.pagesizes')
+rl_canvas = lazy_import('reportlab.pdfgen.canvas')
+rl_utils = lazy_import('reportlab.lib.utils')
+rl_config = lazy_import('reportlab.rl_config')
+qrcode = lazy_import('qrcode')
+stripe = lazy_import('stripe')
+np = lazy_import('numpy')
+LAZY_BACKENDS = {'rembg': (rembg,), 'pdf': (pdf2image, rl_pagesizes, rl_canvas, rl_utils, rl_config), 'qr': (qrcode,), 'stripe': (stripe,), 'numpy': (np,)}
+def preload_backends(names):
+    # gunicorn --preload-এর সাথে: মাস্টার প্রসেসে একবার লোড, ফর্ক করা ওয়ার্কাররা copy-on-write-এ শেয়ার করে
+    for name in (LAZY_BACKENDS if names == ['all'] else names):
+        for module in LAZY_BACKENDS.get(name, ()):
+            if isinstance(module, LazyModule): module._load()
 
 load_dotenv() 
 
@@ -36,36 +103,295 @@ app.secret_key = "a-very-secret-key-for-my-gizmo-business"
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 STATIC_FOLDER = os.path.join(BASE_DIR, 'static')
 UPLOAD_FOLDER = os.path.join(STATIC_FOLDER, 'uploads_studio')
-PROCESSED_FOLDER = os.path.join(STATIC_FOLDER, 'processed_studio')
+# রানটাইম ডেটার ফোল্ডারগুলো env দিয়ে বদলানো যায় (যেমন বেঞ্চমার্ক/টেস্ট টেম্প ফোল্ডারে চালায়), import এর সময়েই পড়া হয়
+PROCESSED_FOLDER = os.getenv('PROCESSED_FOLDER') or os.path.join(STATIC_FOLDER, 'processed_studio')
 # --- নতুন সংযোজন: ইউজার ফাইল সেভ করার ফোল্ডার ---
-USER_FILES_FOLDER = os.path.join(STATIC_FOLDER, 'user_files')
+USER_FILES_FOLDER = os.getenv('USER_FILES_FOLDER') or os.path.join(STATIC_FOLDER, 'user_files')
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['PROCESSED_FOLDER'] = PROCESSED_FOLDER
 app.config['USER_FILES_FOLDER'] = USER_FILES_FOLDER # <-- নতুন কনফিগ
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
+# --- নতুন সংযোজন: ব্যাকগ্রাউন্ড জব কিউ কনফিগারেশন ---
+# জবের ইনপুট/আউটপুট static ফোল্ডারের বাইরে রাখা হয়, যাতে সরাসরি পাবলিক না হয়
+JOBS_FOLDER = os.getenv('JOBS_FOLDER') or os.path.join(BASE_DIR, 'job_queue')
+app.config['JOBS_FOLDER'] = JOBS_FOLDER
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS') or os.cpu_count() or 2)
+app.config['JOB_RETENTION_HOURS'] = int(os.getenv('JOB_RETENTION_HOURS') or 24) # শেষ হওয়া জবের রো ও ফোল্ডার এত ঘণ্টা পরে মুছে যায়; 0 = রেখে দেওয়া
+app.config['JOB_STALE_SECONDS'] = int(os.getenv('JOB_STALE_SECONDS') or 3600) # এতক্ষণ কোনো অগ্রগতি না থাকা 'running' জবকে মৃত ধরা হয়
+# --- নতুন সংযোজন: Image Studio প্যারালাল প্রসেসিং ---
+app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS') or os.cpu_count() or 1) # 1 = সবসময় একটার পর একটা
+app.config['IMAGE_PARALLEL_MIN_BATCH'] = int(os.getenv('IMAGE_PARALLEL_MIN_BATCH') or 4) # এর চেয়ে ছোট ব্যাচ সিরিয়ালি চলে
+app.config['STUDIO_SPILL_BYTES'] = int(os.getenv('STUDIO_SPILL_BYTES') or 64 * 1024 * 1024) # একটি ব্যাচের আউটপুট এর বেশি হলে বাকিটা টেম্প ফাইলে যায়
+app.config['STUDIO_REDUCING_GAP'] = float(os.getenv('STUDIO_REDUCING_GAP') or 2.0) # রিসাইজের আগে ইন্টিজার reduce; টার্গেটের অন্তত এত গুণ রেজোলিউশন LANCZOS-এর জন্য থাকে
+app.config['WATERMARK_CACHE_BYTES'] = int(os.getenv('WATERMARK_CACHE_BYTES') or 32 * 1024 * 1024) # প্রতি প্রসেসে মেমোয়াইজড ওয়াটারমার্ক টাইলের মোট পিক্সেল-বাইট
+app.config['WATERMARK_TEXT_SIZE_RANGE'] = (8, 400) # ফন্ট সাইজ (px) এর বাইরে গেলে কাছের সীমায় আনা হয়
+app.config['WATERMARK_IMAGE_SCALE_RANGE'] = (0.01, 1.0) # ছবির প্রস্থের ভগ্নাংশ হিসেবে ওয়াটারমার্ক ছবির প্রস্থ
+
+# --- নতুন সংযোজন: PDF রাস্টারাইজেশন কনফিগারেশন ---
+app.config['PDF_RENDER_CHUNK_PAGES'] = int(os.getenv('PDF_RENDER_CHUNK_PAGES') or 4) # একবারে সর্বোচ্চ কত পেজ রেন্ডার হবে
+app.config['PDF_RENDER_THREADS'] = int(os.getenv('PDF_RENDER_THREADS') or min(4, os.cpu_count() or 1)) # প্রতি চাংকে কয়টি pdftoppm প্রসেস
+app.config['PDF_DEFAULT_DPI'] = 150
+app.config['PDF_MAX_DPI'] = 300
+app.config['PDF_JPEG_QUALITY'] = int(os.getenv('PDF_JPEG_QUALITY') or 85) # JPG -> PDF-এ ছবি ছোট বা ডিকোড করতে হলে যে কোয়ালিটিতে আবার এনকোড হয়
+
+# --- নতুন সংযোজন: কনভার্সন রেজাল্ট ক্যাশ কনফিগারেশন ---
+RESULT_CACHE_FOLDER = os.getenv('RESULT_CACHE_FOLDER') or os.path.join(BASE_DIR, 'result_cache')
+app.config['RESULT_CACHE_FOLDER'] = RESULT_CACHE_FOLDER
+app.config['RESULT_CACHE_ENABLED'] = (os.getenv('RESULT_CACHE_ENABLED') or '1').lower() not in ('0', 'false', 'no')
+app.config['RESULT_CACHE_MAX_BYTES'] = int(os.getenv('RESULT_CACHE_MAX_BYTES') or 512 * 1024 * 1024)
+
+# --- নতুন সংযোজন: AI Background Remover ইঞ্জিন কনফিগারেশন ---
+app.config['REMBG_MODEL'] = os.getenv('REMBG_MODEL') or 'u2net' # ডিফল্ট মডেল
+app.config['REMBG_MODELS'] = [m.strip() for m in (os.getenv('REMBG_MODELS') or app.config['REMBG_MODEL']).split(',') if m.strip()] # ইউজার যেগুলো বেছে নিতে পারবে
+app.config['REMBG_MAX_SIDE'] = int(os.getenv('REMBG_MAX_SIDE') or 1024) # এর চেয়ে বড় ছবি ছোট করে মাস্ক বানানো হয়; 0 = বন্ধ
+app.config['REMBG_WORKERS'] = int(os.getenv('REMBG_WORKERS') or 0) # 0 = এই প্রসেসেই; N = N টি আলাদা ইনফারেন্স প্রসেস
+app.config['REMBG_TIMEOUT_SECONDS'] = float(os.getenv('REMBG_TIMEOUT_SECONDS') or 60) # সিঙ্ক রিকোয়েস্ট কিউ + ইনফারেন্সে এর বেশি অপেক্ষা করে না
+app.config['REMBG_PRELOAD'] = (os.getenv('REMBG_PRELOAD') or '').lower() in ('1', 'true', 'yes')
+app.config['PRELOAD_BACKENDS'] = [b.strip() for b in (os.getenv('PRELOAD_BACKENDS') or '').split(',') if b.strip()] # যেমন 'all' বা 'pdf,qr'; gunicorn --preload-এর সাথে ব্যবহারের জন্য
+
+# --- নতুন সংযোজন: QR ইঞ্জিন কনফিগারেশন ---
+app.config['QR_CACHE_ENTRIES'] = int(os.getenv('QR_CACHE_ENTRIES') or 2048) # ইন-মেমরি LRU-তে সর্বোচ্চ কয়টি কোড থাকবে
+app.config['QR_DEFAULT_SIZE'] = 300
+app.config['QR_MAX_SIZE'] = 2000
+app.config['QR_BULK_MAX_ROWS'] = int(os.getenv('QR_BULK_MAX_ROWS') or 5000)
+# রেন্ডার করা কোড digest দিয়ে ডিস্কেও থাকে, যাতে /qr/<digest> URL যেকোনো ওয়ার্কারে ও LRU থেকে বাদ পড়ার পরেও কাজ করে
+app.config['QR_DISK_CACHE_FOLDER'] = os.getenv('QR_DISK_CACHE_FOLDER') or os.path.join(BASE_DIR, 'qr_cache')
+app.config['QR_DISK_CACHE_ENABLED'] = True
+app.config['QR_DISK_CACHE_MAX_BYTES'] = int(os.getenv('QR_DISK_CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+
+# --- নতুন সংযোজন: ব্যাচ Slug কনফিগারেশন ---
+app.config['SLUG_BATCH_MAX'] = int(os.getenv('SLUG_BATCH_MAX') or 100000) # একটি JSON রিকোয়েস্টে সর্বোচ্চ কয়টি টাইটেল
+app.config['SLUG_QUERY_CHUNK'] = 500 # ইউনিকনেস চেকের IN (...) কোয়েরিতে একবারে কয়টি slug (SQLite প্যারামিটার সীমার নিচে)
+app.config['SLUG_SEPARATOR_MAX_LENGTH'] = 3 # separator হিসেবে সর্বোচ্চ কত অক্ষরের স্ট্রিং গ্রহণযোগ্য
+
+# --- নতুন সংযোজন: রেন্ডার করা পেজের ক্যাশ ও ব্লগ পেজিনেশন ---
+PAGE_CACHE_FOLDER = os.getenv('PAGE_CACHE_FOLDER') or os.path.join(BASE_DIR, 'page_cache') # প্রতিটি namespace-এর generation ফাইল, সব ওয়ার্কার প্রসেস এটি দেখে
+app.config['PAGE_CACHE_FOLDER'] = PAGE_CACHE_FOLDER
+app.config['PAGE_CACHE_ENABLED'] = (os.getenv('PAGE_CACHE_ENABLED') or '1').lower() not in ('0', 'false', 'no')
+app.config['PAGE_CACHE_ENTRIES'] = int(os.getenv('PAGE_CACHE_ENTRIES') or 512)
+app.config['PAGE_CACHE_CHECK_SECONDS'] = 1.0 # অন্য প্রসেসের invalidation সর্বোচ্চ এতক্ষণ পরে চোখে পড়ে
+app.config['BLOG_PAGE_SIZE'] = int(os.getenv('BLOG_PAGE_SIZE') or 10)
+app.config['PAGE_CACHE_COMPRESS_MIN'] = 1024 # এর চেয়ে ছোট পেজের gzip/br কপি রাখা হয় না
+
+# --- নতুন সংযোজন: হ্যাশড স্ট্যাটিক অ্যাসেট কনফিগারেশন ---
+ASSET_BUILD_FOLDER = os.getenv('ASSET_BUILD_FOLDER') or os.path.join(BASE_DIR, 'asset_build')
+app.config['ASSET_BUILD_FOLDER'] = ASSET_BUILD_FOLDER
+app.config['ASSET_PIPELINE_ENABLED'] = (os.getenv('ASSET_PIPELINE_ENABLED') or '1').lower() not in ('0', 'false', 'no')
+app.config['ASSET_SKIP_DIRS'] = {'uploads_studio', 'processed_studio', 'user_files'}
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600
+
+# --- নতুন সংযোজন: লগইন করা ইউজারের ক্যাশ ---
+app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL') or 60) # সেকেন্ড; 0 = বন্ধ
+app.config['USER_CACHE_FOLDER'] = os.getenv('USER_CACHE_FOLDER') # দেওয়া থাকলে সব ওয়ার্কার প্রসেস এই ফোল্ডারের ক্যাশ শেয়ার করে (যেমন /dev/shm/mygizmo_users)
+
+# --- নতুন সংযোজন: পাসওয়ার্ড হ্যাশিং কনফিগারেশন ---
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS') or 12) # cost বদলালে পুরনো হ্যাশ পরের সফল লগইনে নতুন cost-এ রিহ্যাশ হয়
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS') or max(1, (os.cpu_count() or 2) // 2)) # একসাথে সর্বোচ্চ কয়টি bcrypt; বাকি কোর ইমেজ টুলের জন্য
+app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT') or 5) # সেকেন্ড; এর বেশি লাইনে থাকলে 503
+
 # --- ডাটাবেস কনফিগারেশন ---
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(BASE_DIR, 'site.db')
+# --- পরিবর্তন: DATABASE_URL থাকলে সার্ভার ডাটাবেস (যেমন PostgreSQL), নাহলে আগের মতো লোকাল SQLite ---
+DATABASE_URL = os.getenv('DATABASE_URL') or 'sqlite:///' + os.path.join(BASE_DIR, 'site.db')
+if DATABASE_URL.startswith('postgres://'): DATABASE_URL = 'postgresql://' + DATABASE_URL[len('postgres://'):] # Heroku-ধরনের URL
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['DB_BUSY_TIMEOUT_MS'] = int(os.getenv('DB_BUSY_TIMEOUT_MS') or 5000) # SQLite: লক পেলে এতক্ষণ অপেক্ষা, সাথে সাথে "database is locked" নয়
+if DATABASE_URL.startswith('sqlite'):
+    # জব/ওয়েবহুক থ্রেডও একই কানেকশন পুল ব্যবহার করে
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': app.config['DB_BUSY_TIMEOUT_MS'] / 1000, 'check_same_thread': False}}
+else:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE') or 5),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW') or 10),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT') or 10),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE') or 1800), # সার্ভার idle কানেকশন কেটে দেওয়ার আগেই রিসাইকেল
+        'pool_pre_ping': True,
+    }
+app.config['DB_QUERY_BUDGET'] = int(os.getenv('DB_QUERY_BUDGET') or 10) # একটি রিকোয়েস্টে এর বেশি কোয়েরি হলে লগে সতর্কবার্তা
+# --- নতুন সংযোজন: মেট্রিক্স ও স্যাম্পল প্রোফাইলিং ---
+app.config['METRICS_MEMORY_ENDPOINTS'] = {'process_images', 'handle_conversion', 'ai_background_remover', 'qr_generator_bulk'} # এই POST রুটগুলোর পিক মেমরি মাপা হয়
+app.config['METRICS_PROFILE_RATE'] = float(os.getenv('METRICS_PROFILE_RATE') or 0) # যেমন 0.01 = প্রতি ১০০ রিকোয়েস্টে একটির cProfile ডাম্প
+app.config['METRICS_PROFILE_FOLDER'] = os.getenv('METRICS_PROFILE_FOLDER') or os.path.join(BASE_DIR, 'profiles') # `python -m pstats <file>` বা snakeviz দিয়ে দেখা যায়
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN') or '' # /metrics-এ 'Authorization: Bearer <token>' লাগবে; খালি = শুধু লোকালহোস্ট থেকে সরাসরি রিকোয়েস্ট
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, render_as_batch=True) # SQLite-এ ALTER সীমিত, তাই batch মোডে মাইগ্রেশন
+
+# --- নতুন সংযোজন: SQLite কানেকশন সেটিংস ---
+@sa_event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL: রিডাররা রাইটারকে আটকায় না; NORMAL synchronous WAL-এ নিরাপদ এবং প্রতি কমিটে fsync কমায়
+    if type(dbapi_connection).__module__.split('.')[0] not in ('sqlite3', 'pysqlite2'): return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={app.config['DB_BUSY_TIMEOUT_MS']}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
 bcrypt = Bcrypt(app)
 
+# --- নতুন সংযোজন: সীমিত থ্রেড পুলে bcrypt ---
+class PasswordHashBusy(Exception):
+    pass
+class PasswordHasher:
+    # bcrypt GIL ছেড়ে দেয়, তাই আলাদা থ্রেডে চলে; সেমাফোর একসাথে চলা হ্যাশের সংখ্যা বেঁধে রাখে,
+    # লগইন ঝড়ে বাকিরা সর্বোচ্চ PASSWORD_HASH_QUEUE_TIMEOUT অপেক্ষা করে তারপর PasswordHashBusy
+    def __init__(self, config):
+        self.config = config; self._lock = threading.Lock(); self._executor = None
+        self._slots = threading.BoundedSemaphore(config['PASSWORD_HASH_WORKERS'])
+        self.counters = {"hashed": 0, "verified": 0, "rejected": 0, "rehashed": 0, "wait_seconds": 0.0}
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None: self._executor = ThreadPoolExecutor(max_workers=self.config['PASSWORD_HASH_WORKERS'], thread_name_prefix="bcrypt")
+            return self._executor
+    def _run(self, counter, fn, *args):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.config['PASSWORD_HASH_QUEUE_TIMEOUT']):
+            with self._lock: self.counters["rejected"] += 1
+            raise PasswordHashBusy("password hashing queue is full")
+        try:
+            waited = time.perf_counter() - start
+            result = self._get_executor().submit(fn, *args).result()
+        finally: self._slots.release()
+        with self._lock: self.counters[counter] += 1; self.counters["wait_seconds"] += waited
+        return result
+    def hash(self, password, counter="hashed"):
+        return self._run(counter, bcrypt.generate_password_hash, password, self.config['BCRYPT_LOG_ROUNDS']).decode('utf-8')
+    def verify(self, password_hash, password):
+        return self._run("verified", bcrypt.check_password_hash, password_hash, password)
+    def needs_rehash(self, password_hash):
+        # "$2b$12$..." -> cost 12
+        try: return int(password_hash.split('$')[2]) != self.config['BCRYPT_LOG_ROUNDS']
+        except (IndexError, ValueError): return True
+    def stats(self):
+        with self._lock: return dict(self.counters, workers=self.config['PASSWORD_HASH_WORKERS'], cost=self.config['BCRYPT_LOG_ROUNDS'])
+password_hasher = PasswordHasher(app.config)
+
+@app.cli.command('bench-bcrypt')
+@click.option('--min-cost', default=4, show_default=True)
+@click.option('--max-cost', default=14, show_default=True)
+@click.option('--seconds', default=1.0, show_default=True, help='প্রতিটি cost কতক্ষণ মাপা হবে')
+def bench_bcrypt(min_cost, max_cost, seconds):
+    """এই হোস্টে প্রতিটি bcrypt cost-এ প্রতি সেকেন্ডে কয়টি হ্যাশ (একটি থ্রেডে ও পুরো পুলে)।"""
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    click.echo(f"{'cost':>4} {'ms/hash':>9} {'hash/s (1)':>11} {f'hash/s ({workers})':>11}")
+    for cost in range(min_cost, max_cost + 1):
+        def measure(threads):
+            count = [0] * threads; deadline = time.perf_counter() + seconds
+            def loop(i):
+                while True:
+                    bcrypt.generate_password_hash('benchmark-password', cost); count[i] += 1
+                    if time.perf_counter() >= deadline: return
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool: list(pool.map(loop, range(threads)))
+            return sum(count) / (time.perf_counter() - start)
+        single = measure(1); pooled = measure(workers) if workers > 1 else single
+        click.echo(f"{cost:>4} {1000 / single:>9.1f} {single:>11.1f} {pooled:>11.1f}" + ("  <- current" if cost == app.config['BCRYPT_LOG_ROUNDS'] else ""))
+
 # --- Stripe কী কনফিগারেশন ---
 app.config['STRIPE_PUBLISHABLE_KEY'] = os.getenv('STRIPE_PUBLISHABLE_KEY')
 app.config['STRIPE_SECRET_KEY'] = os.getenv('STRIPE_SECRET_KEY')
 app.config['STRIPE_PRICE_ID'] = os.getenv('STRIPE_PRICE_ID')
-stripe.api_key = app.config['STRIPE_SECRET_KEY']
+app.config['STRIPE_WEBHOOK_SECRET'] = os.getenv('STRIPE_WEBHOOK_SECRET') # থাকলে ওয়েবহুকের সিগনেচার যাচাই হয়
+# --- নতুন সংযোজন: বিলিং ক্লায়েন্ট কনফিগারেশন ---
+app.config['BILLING_CLIENT'] = os.getenv('BILLING_CLIENT') or 'stripe' # 'stub' = নেটওয়ার্ক ছাড়া লোকাল স্টাব
+app.config['BILLING_STUB_LATENCY_MS'] = int(os.getenv('BILLING_STUB_LATENCY_MS') or 0)
+app.config['BILLING_STUB_FAILURE_RATE'] = float(os.getenv('BILLING_STUB_FAILURE_RATE') or 0)
+app.config['STRIPE_TIMEOUT_SECONDS'] = float(os.getenv('STRIPE_TIMEOUT_SECONDS') or 10)
+app.config['BILLING_WORKERS'] = 2
+app.config['BILLING_MAX_ATTEMPTS'] = 5
+app.config['BILLING_RETRY_BASE_SECONDS'] = 2.0 # 2, 4, 8, 16 সেকেন্ড পরপর রিট্রাই
+app.config['BILLING_BREAKER_FAILURES'] = 5
+app.config['BILLING_BREAKER_RESET_SECONDS'] = 30
+# --- নতুন সংযোজন: ওয়েবহুক ইভেন্ট ওয়ার্কার ---
+app.config['STRIPE_EVENT_BATCH_SIZE'] = int(os.getenv('STRIPE_EVENT_BATCH_SIZE') or 200)
+app.config['STRIPE_EVENT_BATCH_WINDOW_MS'] = int(os.getenv('STRIPE_EVENT_BATCH_WINDOW_MS') or 200)
+app.config['STRIPE_EVENT_POLL_SECONDS'] = 30 # wake() ছাড়াও এতক্ষণ পরপর pending ইভেন্ট খোঁজে (অন্য প্রসেসে সেভ হওয়া ইভেন্টের জন্য)
+app.config['STRIPE_EVENT_STALE_SECONDS'] = 300
+
+# --- নতুন সংযোজন: ইউজার ফাইল লাইব্রেরি, রিটেনশন ও কোটা ---
+app.config['FILE_LIBRARY_PAGE_SIZE'] = 20
+app.config['FILE_LIBRARY_MAX_PAGE_SIZE'] = 100
+# রিটেনশন ও কোটা ডিফল্টে বন্ধ (0): চালু থাকলে সুইপার ইউজারের সেভ করা ফাইল স্থায়ীভাবে মুছে দেয়, তাই এটি ডিপ্লয়ের সময় সচেতন সিদ্ধান্ত।
+# চালু করতে env-এ দিন, যেমন USER_FILE_RETENTION_DAYS=90 USER_STORAGE_QUOTA_MB=500 USER_STORAGE_QUOTA_PRO_MB=5000,
+# তারপর একবার `flask sweep-user-files --recount` চালিয়ে পুরনো ফাইলের সাইজ ও প্রতিটি ইউজারের হিসাব মিলিয়ে নিন
+app.config['USER_FILE_RETENTION_DAYS'] = int(os.getenv('USER_FILE_RETENTION_DAYS') or 0) # এর চেয়ে পুরনো সেভ করা ফাইল মুছে যায়; 0 = চিরকাল রাখা
+app.config['USER_STORAGE_QUOTA_MB'] = int(os.getenv('USER_STORAGE_QUOTA_MB') or 0) # ফ্রি প্ল্যান; 0 = সীমাহীন
+app.config['USER_STORAGE_QUOTA_PRO_MB'] = int(os.getenv('USER_STORAGE_QUOTA_PRO_MB') or 0) # সক্রিয় সাবস্ক্রিপশন; 0 = সীমাহীন
+app.config['FILE_SWEEP_INTERVAL_SECONDS'] = int(os.getenv('FILE_SWEEP_INTERVAL_SECONDS') or 900) # 0 = ব্যাকগ্রাউন্ড সুইপ বন্ধ (শুধু flask sweep-user-files)
+app.config['FILE_SWEEP_BATCH'] = 200
+app.config['FILE_SWEEP_PAUSE_MS'] = 50 # ব্যাচের মাঝে বিরতি, যাতে রিকোয়েস্টের রাইট (SQLite-এ একটাই রাইটার) আটকে না থাকে
+app.config['FILE_SWEEP_LOCK_STALE_SECONDS'] = 3600
 
 # --- লগইন ম্যানেজার ---
 login_manager = LoginManager(app)
 login_manager.login_view = 'login' 
 login_manager.login_message_category = 'info' 
 
+# --- পরিবর্তন: প্রতিটি রিকোয়েস্টে DB-তে না গিয়ে ক্যাশ থেকে ইউজার ---
+class UserCache:
+    # user_id -> Flask-Login ও টেমপ্লেটের দরকারি ফিল্ড; প্রসেসের ভেতরে TTL ক্যাশ, USER_CACHE_FOLDER থাকলে তার ওপর শেয়ার্ড ফাইল স্টোর
+    # শেয়ার্ড মোডে লোকাল এন্ট্রি শুধু তখনই চলে যখন ফাইলটি এখনো আছে ও বদলায়নি, তাই invalidate সব ওয়ার্কারে সাথে সাথে কার্যকর হয়
+    def __init__(self, config):
+        self.config = config; self._lock = threading.Lock(); self._local = {}
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+    def _path(self, user_id): return os.path.join(self.config['USER_CACHE_FOLDER'], f"{int(user_id)}.json")
+    def get(self, user_id):
+        ttl = self.config['USER_CACHE_TTL']
+        if not ttl: return None
+        with self._lock: entry = self._local.get(user_id)
+        if self.config['USER_CACHE_FOLDER']:
+            try: st = os.stat(self._path(user_id))
+            except OSError: st = None
+            if st is None or time.time() - st.st_mtime > ttl: entry = None
+            elif entry is None or entry[2] != st.st_mtime_ns:
+                try:
+                    with open(self._path(user_id)) as fh: entry = (time.monotonic() + ttl, json.load(fh), st.st_mtime_ns)
+                except (OSError, ValueError): entry = None
+                if entry:
+                    with self._lock: self._local[user_id] = entry
+        if entry is None or entry[0] < time.monotonic():
+            with self._lock: self.counters["misses"] += 1
+            return None
+        with self._lock: self.counters["hits"] += 1
+        return entry[1]
+    def put(self, user_id, data):
+        if not self.config['USER_CACHE_TTL']: return
+        version = None
+        if self.config['USER_CACHE_FOLDER']:
+            try:
+                os.makedirs(self.config['USER_CACHE_FOLDER'], exist_ok=True); tmp_path = f"{self._path(user_id)}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, "w") as fh: json.dump(data, fh)
+                os.replace(tmp_path, self._path(user_id)); version = os.stat(self._path(user_id)).st_mtime_ns
+            except OSError as e: print(f"User cache write failed: {e}")
+        with self._lock: self._local[user_id] = (time.monotonic() + self.config['USER_CACHE_TTL'], data, version)
+    def invalidate(self, user_id):
+        with self._lock: self._local.pop(user_id, None); self.counters["invalidations"] += 1
+        if self.config['USER_CACHE_FOLDER']:
+            try: os.remove(self._path(user_id))
+            except OSError: pass
+    def stats(self):
+        with self._lock: return dict(self.counters, entries=len(self._local), ttl=self.config['USER_CACHE_TTL'], shared=bool(self.config['USER_CACHE_FOLDER']))
+user_cache = UserCache(app.config)
+
+class CachedUser(UserMixin):
+    # User রো-এর হালকা কপি; এর বাইরে কোনো অ্যাট্রিবিউট (যেমন files, posts) লাগলে তখনই আসল রো লোড হয়
+    FIELDS = ('id', 'username', 'email', 'subscription_status', 'stripe_customer_id')
+    def __init__(self, data): self.__dict__.update(data)
+    def __getattr__(self, name):
+        if name.startswith('__'): raise AttributeError(name)
+        if '_user' not in self.__dict__: self.__dict__['_user'] = db.session.get(User, self.id)
+        return getattr(self.__dict__['_user'], name)
+    def __repr__(self): return f"CachedUser('{self.username}', '{self.email}', '{self.subscription_status}')"
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id); data = user_cache.get(user_id)
+    if data is None:
+        user = db.session.get(User, user_id)
+        if user is None: return None
+        data = {field: getattr(user, field) for field in CachedUser.FIELDS}; user_cache.put(user_id, data)
+    return CachedUser(data)
 
 # --- ডাটাবেস মডেল (User Model) ---
 class User(db.Model, UserMixin):
@@ -75,6 +401,9 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(60), nullable=False)
     stripe_customer_id = db.Column(db.String(120), unique=True)
     subscription_status = db.Column(db.String(50), default='inactive')
+    # --- নতুন সংযোজন: স্টোরেজের হিসাব — UserFile ইনসার্ট/ডিলিটের সময় একই ট্রানজ্যাকশনে বাড়ে-কমে ---
+    storage_bytes = db.Column(db.BigInteger, nullable=False, default=0, server_default='0', index=True)
+    file_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # --- নতুন সংযোজন: User এবং UserFile-এর মধ্যে সম্পর্ক ---
     files = db.relationship('UserFile', backref='user', lazy=True, cascade="all, delete-orphan")
@@ -87,8 +416,25 @@ class User(db.Model, UserMixin):
     @property
     def password(self): raise AttributeError('password is not a readable attribute')
     @password.setter
-    def password(self, password): self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
-    def verify_password(self, password): return bcrypt.check_password_hash(self.password_hash, password)
+    def password(self, password): self.password_hash = password_hasher.hash(password)
+    def verify_password(self, password):
+        if not password_hasher.verify(self.password_hash, password): return False
+        # cost বদলে থাকলে সঠিক পাসওয়ার্ড হাতে থাকতেই নতুন cost-এ রিহ্যাশ (কলার কমিট করে)
+        if password_hasher.needs_rehash(self.password_hash):
+            self.password_hash = password_hasher.hash(password, counter="rehashed")
+        return True
+
+# User রো বদলালে/মুছলে (স্টাইপ ওয়েবহুকের সাবস্ক্রিপশন স্ট্যাটাস, প্রোফাইল আপডেট) কমিটের পরে ক্যাশ থেকে বাদ
+@sa_event.listens_for(OrmSession, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = {obj.id for obj in itertools.chain(session.dirty, session.deleted) if isinstance(obj, User) and obj.id is not None}
+    if changed: session.info.setdefault('changed_user_ids', set()).update(changed)
+@sa_event.listens_for(OrmSession, 'after_commit')
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()): user_cache.invalidate(user_id)
+@sa_event.listens_for(OrmSession, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
 
 # --- নতুন সংযোজন: UserFile ডাটাবেস মডেল ---
 class UserFile(db.Model):
@@ -99,11 +445,55 @@ class UserFile(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     # User টেবিলের সাথে লিঙ্ক
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # --- নতুন সংযোজন: কন্টেন্ট-অ্যাড্রেসড ব্লব (পুরনো রো-তে None থাকে, তখন saved_filename-ই ডিস্কের ফাইল) ---
+    blob_hash = db.Column(db.String(64), db.ForeignKey('file_blob.hash'), nullable=True, index=True)
+    file_size = db.Column(db.Integer, nullable=True)
+    # ড্যাশবোর্ড: user_id দিয়ে ফিল্টার, created_at অনুযায়ী নতুন আগে; লাইব্রেরির টাইপ ফিল্টার; সুইপারের রিটেনশন স্ক্যান
+    __table_args__ = (db.Index('ix_user_file_user_id_created_at', 'user_id', 'created_at'),
+                      db.Index('ix_user_file_user_id_file_type_created_at', 'user_id', 'file_type', 'created_at'),
+                      db.Index('ix_user_file_created_at', 'created_at'))
 
     def __repr__(self):
         return f"UserFile('{self.original_filename}', '{self.file_type}')"
 
 
+# --- নতুন সংযোজন: FileBlob মডেল ---
+# একই বাইটের আউটপুট ডিস্কে একবারই থাকে (USER_FILES_FOLDER/blobs/ab/<sha256>); ref_count = কতগুলো UserFile রো এটিকে দেখায়
+class FileBlob(db.Model):
+    hash = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"FileBlob('{self.hash[:12]}', {self.size}, refs={self.ref_count})"
+
+# UserFile রো তৈরি/মোছার সময় একই ট্রানজ্যাকশনে ref_count আপডেট হয় (User ডিলিটের cascade-ও এতে ধরা পড়ে)
+@db.event.listens_for(UserFile, 'after_insert')
+def _user_file_blob_ref(mapper, connection, target):
+    if not target.blob_hash: return
+    blobs = FileBlob.__table__
+    updated = connection.execute(blobs.update().where(blobs.c.hash == target.blob_hash).values(ref_count=blobs.c.ref_count + 1))
+    if not updated.rowcount:
+        connection.execute(blobs.insert().values(hash=target.blob_hash, size=target.file_size or 0, ref_count=1, created_at=datetime.now(timezone.utc)))
+
+@db.event.listens_for(UserFile, 'after_delete')
+def _user_file_blob_unref(mapper, connection, target):
+    if not target.blob_hash: return
+    blobs = FileBlob.__table__
+    connection.execute(blobs.update().where(blobs.c.hash == target.blob_hash).values(ref_count=blobs.c.ref_count - 1))
+
+@db.event.listens_for(UserFile, 'after_insert')
+def _user_storage_add(mapper, connection, target):
+    users = User.__table__
+    connection.execute(users.update().where(users.c.id == target.user_id).values(storage_bytes=users.c.storage_bytes + (target.file_size or 0), file_count=users.c.file_count + 1))
+
+@db.event.listens_for(UserFile, 'after_delete')
+def _user_storage_sub(mapper, connection, target):
+    users = User.__table__
+    connection.execute(users.update().where(users.c.id == target.user_id).values(storage_bytes=users.c.storage_bytes - (target.file_size or 0), file_count=users.c.file_count - 1))
+
+
 # --- পরিবর্তন: Post ডাটাবেস মডেল (নতুন) ---
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -111,13 +501,197 @@ class Post(db.Model):
     slug = db.Column(db.String(200), unique=True, nullable=False)
     content = db.Column(db.Text, nullable=False)
     excerpt = db.Column(db.String(300), nullable=True)
-    date_posted = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    date_posted = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True) # ব্লগ লিস্টিংয়ের keyset পেজিনেশন
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     def __repr__(self):
         return f"Post('{self.title}', '{self.date_posted}')"
 
 
+# --- নতুন সংযোজন: ব্যাকগ্রাউন্ড Job মডেল ---
+# কিউটি এই টেবিলেই থাকে (কোনো এক্সটার্নাল ব্রোকার নেই); ইনপুট/রেজাল্ট ফাইল JOBS_FOLDER/<id>/ এ থাকে
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True) # queued -> running -> done / failed
+    params = db.Column(db.Text, nullable=False, default='{}')
+    result_filename = db.Column(db.String(300), nullable=True)
+    download_name = db.Column(db.String(300), nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+    error = db.Column(db.String(500), nullable=True)
+    warnings = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+
+    def __repr__(self):
+        return f"Job('{self.id}', '{self.kind}', '{self.status}')"
+
+
+# --- নতুন সংযোজন: টুল পাইপলাইনের ধাপভিত্তিক মেট্রিক্স (Prometheus টেক্সট ফরম্যাট) ---
+METRIC_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_BYTE_BUCKETS = tuple(2 ** n for n in range(16, 33, 2)) # 64 KiB ... 4 GiB
+class Metrics:
+    # প্রসেস-লোকাল হিস্টোগ্রাম ও কাউন্টার; gunicorn-এ প্রতিটি ওয়ার্কার নিজের /metrics দেয়
+    # ইমেজ প্রসেস পুল ও জব পুলের ওয়ার্কারে collect() দিয়ে স্যাম্পলগুলো জমিয়ে রেজাল্টের সাথে ফেরত আনা হয়, প্যারেন্টে merge()
+    def __init__(self):
+        self._lock = threading.Lock(); self._local = threading.local()
+        self.histograms = {}; self.counters = {}
+        self._memory = {"inflight": 0, "epoch": 0}
+    def observe(self, name, value, buckets=METRIC_TIME_BUCKETS, **labels):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None: buffer.append((name, value, buckets, labels)); return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None: h = self.histograms[key] = {"buckets": buckets, "counts": [0] * (len(buckets) + 1), "sum": 0.0}
+            h["counts"][bisect.bisect_left(buckets, value)] += 1; h["sum"] += value
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self.counters[key] = self.counters.get(key, 0) + value
+    @contextmanager
+    def stage(self, stage, **labels):
+        started = time.perf_counter()
+        try: yield
+        finally: self.observe('stage_seconds', time.perf_counter() - started, stage=stage, **labels)
+    @contextmanager
+    def collect(self):
+        # নেস্ট করা যায়: ভেতরের collect() শেষ হলে বাইরেরটির বাফার ফিরে আসে (জব-চাইল্ডে স্টুডিও ছবিগুলো সিরিয়ালি চলে ও merge() বাইরের বাফারে যায়)
+        previous = getattr(self._local, 'buffer', None); self._local.buffer = samples = []
+        try: yield samples
+        finally: self._local.buffer = previous
+    def merge(self, samples):
+        for name, value, buckets, labels in samples: self.observe(name, value, buckets, **labels)
+    def memory_begin(self):
+        # একটি রিকোয়েস্টের পিক মেমরি শুধু তখনই মাপা যায় যখন সেটি একা চলছে (VmHWM পুরো প্রসেসের);
+        # মাঝে আরেকটি মাপা রিকোয়েস্ট ঢুকলে epoch বদলায় এবং দুটোরই মাপ বাদ যায়
+        with self._lock:
+            self._memory["inflight"] += 1; self._memory["epoch"] += 1
+            if self._memory["inflight"] > 1: return None
+            baseline = _peak_rss_reset()
+            return (self._memory["epoch"], baseline) if baseline is not None else None
+    def memory_end(self, token, endpoint):
+        with self._lock:
+            self._memory["inflight"] -= 1
+            if token is None or token[0] != self._memory["epoch"]: return
+        self.observe('request_peak_memory_bytes', max(0, _proc_status_kb("VmHWM") - token[1]) * 1024, METRIC_BYTE_BUCKETS, endpoint=endpoint)
+    def render(self):
+        def labels(pairs): return "{" + ",".join(f'{k}="{_prom_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+        lines = []; seen = set()
+        with self._lock:
+            for (name, pairs), h in sorted(self.histograms.items()):
+                metric = f"mygizmo_{name}"
+                if metric not in seen: seen.add(metric); lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for le, count in zip(list(h["buckets"]) + ["+Inf"], h["counts"]):
+                    cumulative += count; lines.append(f"{metric}_bucket{labels(pairs + (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{labels(pairs)} {h['sum']:.6f}"); lines.append(f"{metric}_count{labels(pairs)} {cumulative}")
+            for (name, pairs), value in sorted(self.counters.items()):
+                metric = f"mygizmo_{name}_total"
+                if metric not in seen: seen.add(metric); lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{labels(pairs)} {value}")
+        return lines
+metrics = Metrics()
+def _prom_escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+@app.before_request
+def _metrics_request_start():
+    g.metrics_started = time.perf_counter()
+    g.metrics_memory = (metrics.memory_begin(),) if request.method == 'POST' and request.endpoint in app.config['METRICS_MEMORY_ENDPOINTS'] else None
+    g.metrics_profiler = None
+    # একই থ্রেডে আরেকটি প্রোফাইলার (বা ডিবাগার) চালু থাকলে স্যাম্পল বাদ
+    if app.config['METRICS_PROFILE_RATE'] and random.random() < app.config['METRICS_PROFILE_RATE'] and sys.getprofile() is None:
+        g.metrics_profiler = cProfile.Profile(); g.metrics_profiler.enable()
+@app.after_request
+def _metrics_request_finish(response):
+    # স্ট্রিম করা রেসপন্সে আসল কাজ (ছবি প্রসেস, ZIP) বডি পাঠানোর সময় হয়, তাই সময়/মেমরি/প্রোফাইল রেসপন্স বন্ধ হলে নেওয়া হয়
+    endpoint = request.endpoint or 'unmatched'; started = g.get('metrics_started', time.perf_counter()); memory = g.get('metrics_memory'); profiler = g.get('metrics_profiler')
+    metrics.inc('request_bytes_in', request.content_length or 0, endpoint=endpoint)
+    sent = [0]
+    if response.is_streamed and not response.direct_passthrough:
+        body = response.response
+        def counted():
+            try:
+                for chunk in body: sent[0] += len(chunk); yield chunk
+            finally:
+                if hasattr(body, 'close'): body.close()
+        response.response = counted()
+    else: sent[0] = response.content_length or 0
+    def finish():
+        metrics.observe('request_seconds', time.perf_counter() - started, endpoint=endpoint)
+        metrics.inc('request_bytes_out', sent[0], endpoint=endpoint)
+        if memory is not None: metrics.memory_end(memory[0], endpoint)
+        if profiler:
+            profiler.disable(); os.makedirs(app.config['METRICS_PROFILE_FOLDER'], exist_ok=True)
+            profiler.dump_stats(os.path.join(app.config['METRICS_PROFILE_FOLDER'], f"{endpoint}-{int(time.time() * 1000)}-{os.getpid()}.prof"))
+    # send_file (direct_passthrough)-এ werkzeug close কলব্যাক চালায় না; সেখানে বডি আগেই তৈরি, তাই এখনই হিসাব
+    if response.direct_passthrough: finish()
+    else: response.call_on_close(finish)
+    return response
+
+# DB কমিটের সময় (রিকোয়েস্ট, জব ও ব্যাকগ্রাউন্ড থ্রেড সব মিলিয়ে)
+@sa_event.listens_for(OrmSession, 'before_commit')
+def _commit_timer_start(session): session.info['commit_started'] = time.perf_counter()
+@sa_event.listens_for(OrmSession, 'after_commit')
+def _commit_timer_stop(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None: metrics.observe('stage_seconds', time.perf_counter() - started, stage='db_commit')
+
+# --- নতুন সংযোজন: রুট অনুযায়ী কোয়েরি সংখ্যা ও ল্যাটেন্সি রিপোর্ট ---
+class QueryStats:
+    def __init__(self, config):
+        self.config = config; self._lock = threading.Lock(); self.routes = {}
+    def record(self, endpoint, count, elapsed_ms):
+        with self._lock:
+            r = self.routes.setdefault(endpoint, {"requests": 0, "queries": 0, "max_queries": 0, "db_ms": 0.0, "max_db_ms": 0.0, "over_budget": 0})
+            r["requests"] += 1; r["queries"] += count; r["db_ms"] += elapsed_ms
+            r["max_queries"] = max(r["max_queries"], count); r["max_db_ms"] = max(r["max_db_ms"], elapsed_ms)
+            if count > self.config['DB_QUERY_BUDGET']: r["over_budget"] += 1
+    def report(self):
+        with self._lock:
+            return {"budget": self.config['DB_QUERY_BUDGET'], "routes": {endpoint: dict(r, avg_queries=round(r["queries"] / r["requests"], 2),
+                    avg_db_ms=round(r["db_ms"] / r["requests"], 2), db_ms=round(r["db_ms"], 2), max_db_ms=round(r["max_db_ms"], 2))
+                    for endpoint, r in sorted(self.routes.items())}}
+query_stats = QueryStats(app.config)
+
+@sa_event.listens_for(Engine, "before_cursor_execute")
+def _query_timer_start(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context(): conn.info.setdefault('query_start', []).append(time.perf_counter())
+@sa_event.listens_for(Engine, "after_cursor_execute")
+def _query_timer_stop(conn, cursor, statement, parameters, context, executemany):
+    # ব্যাকগ্রাউন্ড থ্রেডের (জব, ওয়ার্কার) কোয়েরি কোনো রুটের হিসাবে যায় না
+    if not has_request_context() or not conn.info.get('query_start'): return
+    elapsed = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+    g.db_queries = g.get('db_queries', 0) + 1; g.db_ms = g.get('db_ms', 0.0) + elapsed
+
+@app.after_request
+def _record_query_stats(response):
+    count = g.get('db_queries', 0); elapsed_ms = g.get('db_ms', 0.0); endpoint = request.endpoint or 'unmatched'
+    query_stats.record(endpoint, count, elapsed_ms)
+    if count > app.config['DB_QUERY_BUDGET']: print(f"Query budget exceeded: {endpoint} ran {count} queries ({elapsed_ms:.1f} ms)")
+    if count: response.headers.add('Server-Timing', f'db;dur={elapsed_ms:.1f};desc="queries={count}"')
+    return response
+
+# --- নতুন সংযোজন: Stripe ওয়েবহুক ইভেন্ট মডেল ---
+# event_id ইউনিক, তাই Stripe একই ইভেন্ট আবার পাঠালে দ্বিতীয় রো তৈরি হয় না
+class StripeEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(255), unique=True, nullable=False)
+    type = db.Column(db.String(100), nullable=False)
+    customer_id = db.Column(db.String(120), nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    event_created = db.Column(db.Integer, nullable=True) # Stripe-এর created (unix সময়), ক্রম ঠিক রাখতে
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True) # pending -> processing -> applied / superseded / unmatched; ignored
+    claimed_by = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    received_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"StripeEvent('{self.event_id}', '{self.type}', '{self.status}')"
+
+
 # --- ফর্ম ক্লাস (আগের মতোই) ---
 class RegistrationForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=4, max=30)])
@@ -150,144 +724,1817 @@ if not os.path.exists(STATIC_FOLDER): os.makedirs(STATIC_FOLDER)
 if not os.path.exists(UPLOAD_FOLDER): os.makedirs(UPLOAD_FOLDER)
 if not os.path.exists(PROCESSED_FOLDER): os.makedirs(PROCESSED_FOLDER)
 if not os.path.exists(USER_FILES_FOLDER): os.makedirs(USER_FILES_FOLDER) # <-- নতুন ফোল্ডার তৈরি
+if not os.path.exists(JOBS_FOLDER): os.makedirs(JOBS_FOLDER)
+if not os.path.exists(RESULT_CACHE_FOLDER): os.makedirs(RESULT_CACHE_FOLDER)
+if not os.path.exists(PAGE_CACHE_FOLDER): os.makedirs(PAGE_CACHE_FOLDER)
 
 # --- টুলসের হেল্পার ফাংশন ---
 
+# --- নতুন সংযোজন: কন্টেন্ট-অ্যাড্রেসড ব্লব স্টোর ---
+def blob_path(blob_hash):
+    return os.path.join(app.config['USER_FILES_FOLDER'], 'blobs', blob_hash[:2], blob_hash)
+
+def store_blob(source):
+    # পাথ বা file-like সোর্সকে ব্লব স্টোরে রাখে; (hash, size) রিটার্ন করে। একই কন্টেন্ট আগে থাকলে আর লেখা হয় না
+    blobs_dir = os.path.join(app.config['USER_FILES_FOLDER'], 'blobs'); tmp_dir = os.path.join(blobs_dir, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    if isinstance(source, (str, Path)):
+        # পাথ: শুধু পড়ে হ্যাশ করা হয়; নতুন হলে হার্ডলিঙ্ক (একই ফাইলসিস্টেমে কোনো কপি লাগে না), নাহলে স্ট্রিমিং কপি
+        blob_hash = file_digest(source); size = os.path.getsize(source); target = blob_path(blob_hash)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.tmp")
+            try: os.link(source, tmp_path)
+            except OSError: shutil.copyfile(source, tmp_path)
+            os.utime(tmp_path); os.replace(tmp_path, target) # হার্ডলিঙ্কের পুরনো mtime যেন gc_blobs-এর বয়স হিসাবে না আসে
+        return blob_hash, size
+    # বাফার: টেম্প ফাইলে ১MB করে লিখতে লিখতেই হ্যাশ হয়; পুরো বাফার আর একবারে read() করা হয় না
+    h = hashlib.sha256(); size = 0; source.seek(0)
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            for block in iter(lambda: source.read(1024 * 1024), b""): h.update(block); fh.write(block); size += len(block)
+        blob_hash = h.hexdigest(); target = blob_path(blob_hash)
+        if os.path.exists(target): os.remove(tmp_path)
+        else: os.makedirs(os.path.dirname(target), exist_ok=True); os.replace(tmp_path, target)
+    except Exception:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+    finally: source.seek(0) # বাফারটি রিসেট করুন যাতে send_file এটি ব্যবহার করতে পারে
+    return blob_hash, size
+
+def gc_blobs(min_age_seconds=3600):
+    # ref_count 0 হয়ে যাওয়া ব্লব এবং ক্র্যাশের পর পড়ে থাকা টেম্প/অচেনা ফাইল মুছে ফেলে; মুক্ত হওয়া বাইট রিটার্ন করে
+    blobs = FileBlob.__table__; freed = 0; removed = 0
+    for blob in FileBlob.query.filter(FileBlob.ref_count <= 0).all():
+        # শর্তসহ ডিলিট: এর মধ্যে কেউ আবার রেফার করলে রো-টি থেকে যায়
+        if db.session.execute(blobs.delete().where(blobs.c.hash == blob.hash, blobs.c.ref_count <= 0)).rowcount:
+            try: os.remove(blob_path(blob.hash)); freed += blob.size; removed += 1
+            except OSError: pass
+    db.session.commit()
+    blobs_dir = os.path.join(app.config['USER_FILES_FOLDER'], 'blobs'); cutoff = time.time() - min_age_seconds
+    if os.path.isdir(blobs_dir):
+        known = None
+        for bucket in os.listdir(blobs_dir):
+            bucket_path = os.path.join(blobs_dir, bucket)
+            if not os.path.isdir(bucket_path): continue
+            for name in os.listdir(bucket_path):
+                path = os.path.join(bucket_path, name)
+                try: st = os.stat(path)
+                except OSError: continue
+                if st.st_mtime > cutoff: continue
+                if bucket != 'tmp':
+                    if known is None: known = {h for (h,) in db.session.query(FileBlob.hash)}
+                    if name in known: continue
+                try: os.remove(path); freed += st.st_size; removed += 1
+                except OSError: pass
+    return {"removed": removed, "freed_bytes": freed}
+
+@app.cli.command('gc-blobs')
+def gc_blobs_command():
+    """রেফারেন্সহীন ইউজার-ফাইল ব্লব মুছে ফেলে।"""
+    print(gc_blobs())
+
 # --- নতুন সংযোজন: ফাইল সেভ করার হেল্পার ফাংশন ---
 def save_user_file(user, file_buffer_or_path, original_name, file_type):
     # যদি ইউজার লগইন করা না থাকে, তবে কিছুই সেভ করবে না
     if not user or not user.is_authenticated:
         return
 
-    # আপনার নির্দেশনা অনুযায়ী, আমরা এখন 'pro' স্ট্যাটাস চেক করছি না
+    # আপনার নির্দেশনা অনুযায়ী, আমরা এখন 'pro' স্ট্যাটাস চেক করছি না
     # if user.subscription_status != 'active':
     #     return # ভবিষ্যতে এটি চালু করা যাবে
 
     try:
+        # saved_filename এখন শুধু ডাউনলোড লিঙ্কের হ্যান্ডল; আসল বাইট কন্টেন্ট হ্যাশের ব্লবে থাকে
         unique_filename = f"{uuid.uuid4().hex}_{original_name}"
-        save_path = os.path.join(app.config['USER_FILES_FOLDER'], unique_filename)
+        if not isinstance(file_buffer_or_path, (str, Path)) and not hasattr(file_buffer_or_path, 'read'): return
+        with metrics.stage('file_save', tool=file_type): blob_hash, size = store_blob(file_buffer_or_path)
         
-        # চেক করুন এটি একটি ফাইল পাথ নাকি মেমরি বাফার
-        if isinstance(file_buffer_or_path, (str, Path)):
-            # এটি একটি ফাইল পাথ, শুধু কপি করুন
-            import shutil
-            shutil.copy(file_buffer_or_path, save_path)
-        elif hasattr(file_buffer_or_path, 'read'):
-            # এটি একটি মেমরি বাফার (যেমন BytesIO)
-            file_buffer_or_path.seek(0)
-            with open(save_path, 'wb') as f:
-                f.write(file_buffer_or_path.read())
-            file_buffer_or_path.seek(0) # বাফারটি রিসেট করুন যাতে send_file এটি ব্যবহার করতে পারে
-        
-        # ডাটাবেসে এন্ট্রি তৈরি করুন
+        # ডাটাবেসে এন্ট্রি তৈরি করুন (ref_count after_insert ইভেন্টে বাড়ে)
         new_file = UserFile(
             original_filename=original_name,
             saved_filename=unique_filename,
             file_type=file_type,
-            user_id=user.id
+            user_id=user.id,
+            blob_hash=blob_hash,
+            file_size=size
         )
         db.session.add(new_file)
         db.session.commit()
-        print(f"File saved for user {user.id}: {unique_filename}")
+        # কমিটের আগমুহূর্তে gc_blobs একই ব্লব মুছে থাকলে আবার লিখে দিন
+        if not os.path.exists(blob_path(blob_hash)): store_blob(file_buffer_or_path)
+        print(f"File saved for user {user.id}: {unique_filename} (blob {blob_hash[:12]})")
+        # কোটা ছাড়ালে সুইপার সাথে সাথে জাগে এবং পুরনো ফাইলগুলো আগে মোছে
+        user_file_sweeper.start(); quota = storage_quota_bytes(user.subscription_status)
+        if quota and db.session.query(User.storage_bytes).filter(User.id == user.id).scalar() > quota: user_file_sweeper.wake()
 
     except Exception as e:
         print(f"Error saving user file: {e}")
         db.session.rollback() # কোনো সমস্যা হলে ডাটাবেস রোলব্যাক করুন
 
+# --- নতুন সংযোজন: ইউজার ফাইল লাইব্রেরি (keyset পেজিনেশন) ---
+def encode_file_cursor(user_file):
+    return base64.urlsafe_b64encode(f"{user_file.created_at.isoformat()}|{user_file.id}".encode()).decode().rstrip("=")
+def decode_file_cursor(cursor):
+    # ভুল কার্সরে ValueError
+    created_at, _, file_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().rpartition("|")
+    return datetime.fromisoformat(created_at), int(file_id)
+def user_file_page(user_id, file_type=None, search=None, cursor=None, limit=None):
+    # (created_at, id) অনুযায়ী নতুন আগে; OFFSET নেই, তাই যত পুরনো পেজই হোক খরচ একই। রিটার্ন: (files, next_cursor)
+    # file_type দিলে (user_id, file_type, created_at) ইনডেক্স, নাহলে (user_id, created_at) ইনডেক্স থেকেই সারিগুলো আসে
+    limit = max(1, min(limit or app.config['FILE_LIBRARY_PAGE_SIZE'], app.config['FILE_LIBRARY_MAX_PAGE_SIZE']))
+    query = UserFile.query.filter(UserFile.user_id == user_id)
+    if file_type: query = query.filter(UserFile.file_type == file_type)
+    if search: query = query.filter(UserFile.original_filename.icontains(search, autoescape=True))
+    if cursor: query = query.filter(tuple_(UserFile.created_at, UserFile.id) < decode_file_cursor(cursor))
+    files = query.order_by(UserFile.created_at.desc(), UserFile.id.desc()).limit(limit + 1).all()
+    return files[:limit], (encode_file_cursor(files[limit - 1]) if len(files) > limit else None)
+def user_file_types(user_id):
+    return dict(db.session.query(UserFile.file_type, func.count()).filter(UserFile.user_id == user_id).group_by(UserFile.file_type).order_by(UserFile.file_type))
+def user_file_json(user_file):
+    return {"id": user_file.id, "name": user_file.original_filename, "file_type": user_file.file_type, "size": user_file.file_size,
+            "created_at": user_file.created_at.isoformat(), "download_url": url_for('download_file', filename=user_file.saved_filename)}
+def storage_quota_bytes(subscription_status):
+    quota_mb = app.config['USER_STORAGE_QUOTA_PRO_MB' if subscription_status == 'active' else 'USER_STORAGE_QUOTA_MB']
+    return quota_mb * 1024 * 1024 if quota_mb else None
+def user_storage(user_id):
+    used, count, status = db.session.query(User.storage_bytes, User.file_count, User.subscription_status).filter(User.id == user_id).one()
+    return {"used_bytes": used, "file_count": count, "quota_bytes": storage_quota_bytes(status), "retention_days": app.config['USER_FILE_RETENTION_DAYS'] or None}
+def over_quota_users(limit):
+    # রিটার্ন: [(user_id, subscription_status, storage_bytes)] — ফ্রি ও প্রো প্ল্যানের আলাদা কোটা
+    free, pro = storage_quota_bytes(None), storage_quota_bytes('active'); conditions = []
+    if free: conditions.append(and_(or_(User.subscription_status.is_(None), User.subscription_status != 'active'), User.storage_bytes > free))
+    if pro: conditions.append(and_(User.subscription_status == 'active', User.storage_bytes > pro))
+    if not conditions: return []
+    return db.session.query(User.id, User.subscription_status, User.storage_bytes).filter(or_(*conditions)).limit(limit).all()
+def recount_user_storage():
+    # ইনক্রিমেন্টাল হিসাব কোনো কারণে সরে গেলে UserFile সারি থেকে আবার গোনা; রিটার্ন: আপডেট হওয়া ইউজারের সংখ্যা
+    sizes = db.session.query(func.coalesce(func.sum(UserFile.file_size), 0)).filter(UserFile.user_id == User.id).scalar_subquery()
+    counts = db.session.query(func.count(UserFile.id)).filter(UserFile.user_id == User.id).scalar_subquery()
+    updated = User.query.update({User.storage_bytes: sizes, User.file_count: counts}, synchronize_session=False)
+    db.session.commit()
+    return updated
+
+# --- নতুন সংযোজন: রিটেনশন ও কোটা সুইপার ---
+# ব্যাকগ্রাউন্ড থ্রেডে ছোট ব্যাচে চলে; প্রতিটি ব্যাচ আলাদা ছোট ট্রানজ্যাকশন, মাঝে একটু বিরতি — রিকোয়েস্ট থ্রেড কখনো অপেক্ষা করে না।
+# আগে DB রো মুছে কমিট হয় (ইভেন্ট ব্লবের ref_count ও ইউজারের হিসাব কমায়), তারপর gc_blobs রেফারেন্সহীন ব্লব ডিস্ক থেকে মোছে,
+# তাই কোনো রো কখনো অনুপস্থিত ফাইলকে দেখায় না। একাধিক ওয়ার্কার প্রসেসে একটি লক ফাইল দিয়ে এক সময়ে একজনই সুইপ করে।
+class UserFileSweeper:
+    def __init__(self, config):
+        self.config = config; self._wake = threading.Event(); self._thread = None; self._lock = threading.Lock(); self._pid = None
+        self.counters = {"runs": 0, "sizes_backfilled": 0, "expired": 0, "evicted": 0, "blobs_removed": 0, "freed_bytes": 0, "jobs_expired": 0, "jobs_reset": 0,
+                         "skipped_locked": 0, "errors": 0}
+        self.last_run_seconds = None
+    def start(self):
+        if self.config['FILE_SWEEP_INTERVAL_SECONDS'] <= 0: return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid(): return
+            self._pid = os.getpid(); self._thread = threading.Thread(target=self._run, daemon=True, name="file-sweeper"); self._thread.start()
+    def wake(self):
+        self.start(); self._wake.set()
+    def _run(self):
+        while True:
+            with app.app_context():
+                try: self.sweep()
+                except Exception as e:
+                    db.session.rollback(); self._count(errors=1); print(f"File sweeper error: {e}")
+                finally: db.session.remove()
+            self._wake.wait(self.config['FILE_SWEEP_INTERVAL_SECONDS']); self._wake.clear()
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items(): self.counters[key] += value
+    def _lock_path(self): return os.path.join(self.config['USER_FILES_FOLDER'], '.sweep.lock')
+    def _acquire(self):
+        path = self._lock_path()
+        for _ in range(2):
+            try: fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                # ক্র্যাশ করা প্রসেসের পুরনো লক হলে সরিয়ে আরেকবার চেষ্টা
+                try:
+                    if time.time() - os.path.getmtime(path) < self.config['FILE_SWEEP_LOCK_STALE_SECONDS']: return False
+                    os.remove(path)
+                except OSError: pass
+                continue
+            os.write(fd, str(os.getpid()).encode()); os.close(fd); return True
+        return False
+    def _release(self):
+        try: os.remove(self._lock_path())
+        except OSError: pass
+    def _delete(self, ids):
+        files = (UserFile.query.options(load_only(UserFile.id, UserFile.user_id, UserFile.blob_hash, UserFile.file_size, UserFile.saved_filename))
+                 .filter(UserFile.id.in_(ids)).all())
+        legacy = [f.saved_filename for f in files if not f.blob_hash]
+        for f in files: db.session.delete(f)
+        db.session.commit()
+        # ব্লব ছাড়া পুরনো রো-এর ফাইল সরাসরি USER_FILES_FOLDER-এ থাকে; রো কমিটের পরেই মোছা হয়
+        for name in legacy:
+            path = safe_join(self.config['USER_FILES_FOLDER'], name)
+            try:
+                if path: os.remove(path)
+            except OSError: pass
+        try: os.utime(self._lock_path()) # লম্বা সুইপে লকটি যেন পুরনো বলে ধরা না পড়ে
+        except OSError: pass
+        time.sleep(self.config['FILE_SWEEP_PAUSE_MS'] / 1000)
+        return len(files)
+    def backfill_sizes(self):
+        # ব্লব স্টোরের আগের রো-তে file_size নেই, তাই কোটায় সেগুলো 0 বাইট গোনা হতো; ডিস্ক থেকে সাইজ বসিয়ে ইউজারের হিসাবেও যোগ হয়
+        # ফাইল না পাওয়া গেলে 0 বসে, যাতে একই রো প্রতি রানে আবার স্ক্যান না হয়। রিটার্ন: আপডেট হওয়া রো-এর সংখ্যা
+        filled = 0
+        while True:
+            rows = (db.session.query(UserFile.id, UserFile.user_id, UserFile.blob_hash, UserFile.saved_filename)
+                    .filter(UserFile.file_size.is_(None)).limit(self.config['FILE_SWEEP_BATCH']).all())
+            if not rows: return filled
+            for file_id, user_id, blob_hash, saved_filename in rows:
+                path = blob_path(blob_hash) if blob_hash else safe_join(self.config['USER_FILES_FOLDER'], saved_filename)
+                try: size = os.path.getsize(path) if path else 0
+                except OSError: size = 0
+                UserFile.query.filter_by(id=file_id).update({UserFile.file_size: size}, synchronize_session=False)
+                User.query.filter_by(id=user_id).update({User.storage_bytes: User.storage_bytes + size}, synchronize_session=False)
+            db.session.commit(); filled += len(rows)
+            time.sleep(self.config['FILE_SWEEP_PAUSE_MS'] / 1000)
+    def sweep(self):
+        # রিটার্ন: এই রানের হিসাব; অন্য প্রসেস তখন সুইপ করলে None
+        if not self._acquire(): self._count(skipped_locked=1); return None
+        started = time.perf_counter(); result = {"expired": 0, "evicted": 0}
+        try:
+            batch = self.config['FILE_SWEEP_BATCH']; days = self.config['USER_FILE_RETENTION_DAYS']
+            result["sizes_backfilled"] = self.backfill_sizes() # কোটার হিসাবের আগে
+            if days:
+                cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+                while True:
+                    ids = [i for (i,) in db.session.query(UserFile.id).filter(UserFile.created_at < cutoff).order_by(UserFile.created_at).limit(batch)]
+                    if not ids: break
+                    result["expired"] += self._delete(ids)
+            for user_id, status, used in over_quota_users(batch):
+                # সবচেয়ে পুরনো ফাইল আগে, যতক্ষণ না ব্যবহার কোটার নিচে নামে
+                excess = used - storage_quota_bytes(status)
+                while excess > 0:
+                    rows = db.session.query(UserFile.id, UserFile.file_size).filter(UserFile.user_id == user_id).order_by(UserFile.created_at, UserFile.id).limit(batch).all()
+                    if not rows: break
+                    ids = []
+                    for file_id, size in rows:
+                        ids.append(file_id); excess -= size or 0
+                        if excess <= 0: break
+                    result["evicted"] += self._delete(ids)
+            result.update(gc_blobs())
+            # ব্যাকগ্রাউন্ড জব: মৃত ওয়ার্কারের 'running' জব failed, আর মেয়াদোত্তীর্ণ জবের রো ও JOBS_FOLDER/<id>/ মুছে ফেলা
+            result["jobs_reset"] = reset_stale_jobs(); result["jobs_expired"] = expire_jobs(batch)
+        finally: self._release()
+        self._count(runs=1, sizes_backfilled=result["sizes_backfilled"], expired=result["expired"], evicted=result["evicted"], blobs_removed=result["removed"], freed_bytes=result["freed_bytes"],
+                    jobs_expired=result["jobs_expired"], jobs_reset=result["jobs_reset"])
+        self.last_run_seconds = time.perf_counter() - started
+        return result
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, last_run_seconds=self.last_run_seconds, running=bool(self._thread and self._thread.is_alive()),
+                        interval=self.config['FILE_SWEEP_INTERVAL_SECONDS'])
+user_file_sweeper = UserFileSweeper(app.config)
+
+@app.cli.command('sweep-user-files')
+@click.option('--recount', is_flag=True, help='আগে UserFile সারি থেকে প্রতিটি ইউজারের স্টোরেজ আবার গোনা')
+def sweep_user_files_command(recount):
+    """রিটেনশন ও কোটা নীতি (পুরনো জব মোছা সহ) এখনই প্রয়োগ করে (ক্রন থেকে চালানোর জন্য)।"""
+    if recount: print(f"Recounted storage for {recount_user_storage()} users")
+    print(user_file_sweeper.sweep() or "Another process is sweeping right now.")
+
 # --- (বাকি হেল্পার ফাংশনগুলো আগের মতোই) ---
 ALLOWED_EXT = {"png", "jpg", "jpeg", "webp", "bmp", "gif"}
 FORMAT_MAP = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "PDF": "pdf"}
-def convert_jpg_to_pdf(image_files):
-    pil_images = []
-    for image_file in image_files:
-        try:
-            image = Image.open(image_file)
-            if image.mode == 'RGBA' or image.mode == 'P': image = image.convert('RGB')
-            pil_images.append(image)
-        except Exception as e: print(f"Skipping non-image file: {e}")
-    if not pil_images: return None
-    pdf_buffer = io.BytesIO()
-    pil_images[0].save(pdf_buffer, format='PDF', save_all=True, append_images=pil_images[1:])
+# --- নতুন সংযোজন: পেজ-বাই-পেজ PDF অ্যাসেম্বলি (reportlab) ---
+# ছবিগুলো একটি একটি করে পড়ে reportlab ক্যানভাসে আঁকা হয় (প্রতি ছবিতে showPage), তাই ডিকোড করা ছবি একসাথে মেমরিতে থাকে না।
+# JPEG-এর DCT স্ট্রিম ডিকোড না করে হুবহু PDF-এ বসে; অন্য ফরম্যাট, অথবা max DPI-র জন্য ছোট করতে হলে তবেই ছবি ডিকোড হয়।
+# সীমা: reportlab ইনক্রিমেন্টালি লিখতে পারে না — ক্যানভাস প্রতিটি পেজের এনকোড করা ইমেজ স্ট্রিম save() পর্যন্ত মেমরিতে রাখে,
+# তাই পিক মেমরি O(এক পেজের ডিকোড করা ছবি + পুরো আউটপুট PDF-এর সাইজ), O(এক পেজ) নয়। আপলোড সাইজের সীমাই এটিকে বেঁধে রাখে।
+PDF_PAGE_SIZES = {"a4": "A4", "a3": "A3", "a5": "A5", "letter": "LETTER", "legal": "LEGAL"}
+PDF_FITS = ("contain", "cover", "stretch")
+# EXIF orientation -> ইউনিট স্কোয়ারের ম্যাট্রিক্স (a b c d e f); পাসথ্রু JPEG-ও ডিকোড ছাড়াই সোজা দেখায়
+PDF_ORIENTATION_MATRIX = {1: (1, 0, 0, 1, 0, 0), 2: (-1, 0, 0, 1, 1, 0), 3: (-1, 0, 0, -1, 1, 1), 4: (1, 0, 0, -1, 0, 1),
+                          5: (0, -1, -1, 0, 1, 1), 6: (0, -1, 1, 0, 0, 1), 7: (0, 1, 1, 0, 0, 0), 8: (0, 1, -1, 0, 1, 0)}
+def parse_pdf_layout_options(form, default_page="image"):
+    # ছবি -> PDF অপশন: page_size ("image" = প্রতিটি পেজ ছবির নিজের মাপে), orientation, fit, margin (mm), max_dpi (0 = কখনো ছোট করা হয় না)
+    page_size = (form.get("page_size") or default_page).lower()
+    orientation = (form.get("orientation") or "auto").lower(); fit = (form.get("fit") or "contain").lower()
+    max_dpi = int(form.get("max_dpi") or 0)
+    return {"page_size": page_size if page_size == "image" or page_size in PDF_PAGE_SIZES else default_page,
+            "orientation": orientation if orientation in ("auto", "portrait", "landscape") else "auto",
+            "fit": fit if fit in PDF_FITS else "contain", "margin_mm": max(0.0, min(50.0, float(form.get("margin") or 0))),
+            "max_dpi": max(36, min(app.config['PDF_MAX_DPI'], max_dpi)) if max_dpi > 0 else 0}
+@lru_cache(maxsize=None)
+def _jpeg_passthrough_reader():
+    # drawImage() ImageReader-এর নাম (ক্যাশ কী) বানাতে getRGBData() ডাকে, যা পুরো ছবি ডিকোড করে;
+    # JPEG পাসথ্রুতে DCT স্ট্রিম হুবহু যায়, তাই নামের জন্য কন্টেন্ট হ্যাশই যথেষ্ট — reportlab প্রথম ব্যবহারেই লোড হয়
+    class JpegPassthroughReader(rl_utils.ImageReader):
+        _dataA = None
+        def getRGBData(self): return hashlib.md5(self.fp.getvalue()).digest()
+    return JpegPassthroughReader
+def _pdf_page_layout(img_w, img_h, img_dpi, layout):
+    # রিটার্ন: (page_w, page_h, box, clip) পয়েন্টে; box = ছবি আঁকার (x, y, w, h), clip = cover হলে কন্টেন্ট এরিয়া
+    margin = layout["margin_mm"] * 72 / 25.4
+    if layout["page_size"] == "image":
+        # পুরনো আচরণের মতো পেজ = ছবির মাপ (ছবির DPI অনুযায়ী, না থাকলে 72), margin চারপাশে যোগ হয়
+        w, h = img_w * 72 / img_dpi, img_h * 72 / img_dpi
+        return w + 2 * margin, h + 2 * margin, (margin, margin, w, h), None
+    page_w, page_h = sorted(getattr(rl_pagesizes, PDF_PAGE_SIZES[layout["page_size"]]))
+    if layout["orientation"] == "landscape" or (layout["orientation"] == "auto" and img_w > img_h): page_w, page_h = page_h, page_w
+    area_w, area_h = max(1.0, page_w - 2 * margin), max(1.0, page_h - 2 * margin)
+    if layout["fit"] == "stretch": return page_w, page_h, (margin, margin, area_w, area_h), None
+    scale = (min if layout["fit"] == "contain" else max)(area_w / img_w, area_h / img_h); w, h = img_w * scale, img_h * scale
+    box = (margin + (area_w - w) / 2, margin + (area_h - h) / 2, w, h)
+    return page_w, page_h, box, ((margin, margin, area_w, area_h) if layout["fit"] == "cover" else None)
+def _pdf_downsample_target(box, disp_w, disp_h, layout):
+    # max_dpi অনুযায়ী ছবির পিক্সেল সাইজ; ছোট করার দরকার না থাকলে None
+    # এক পিক্সেলের রাউন্ডিং পার্থক্যে (যেমন আগেই ছোট করা Image Studio পেজ) ডিকোড/রি-এনকোড হয় না
+    if not layout["max_dpi"]: return None
+    target = (math.ceil(box[2] / 72 * layout["max_dpi"]), math.ceil(box[3] / 72 * layout["max_dpi"]))
+    return None if target[0] + 1 >= disp_w or target[1] + 1 >= disp_h else target
+def draw_pdf_page(canvas, data, layout):
+    # একটি ছবি থেকে একটি পেজ; L/RGB JPEG ডিকোড ছাড়াই (DCTDecode) বসে, বাকিগুলো ডিকোড হয়ে FlateDecode (আলফা থাকলে SMask)
+    with Image.open(io.BytesIO(data)) as im:
+        fmt, mode, (px_w, px_h) = im.format, im.mode, im.size
+        orientation = im.getexif().get(0x0112, 1) if fmt == "JPEG" else 1
+        img_dpi = float((im.info.get("dpi") or (0,))[0] or 0)
+    if orientation not in PDF_ORIENTATION_MATRIX: orientation = 1
+    disp_w, disp_h = (px_h, px_w) if orientation in (5, 6, 7, 8) else (px_w, px_h)
+    page_w, page_h, box, clip = _pdf_page_layout(disp_w, disp_h, img_dpi if img_dpi >= 36 else 72.0, layout)
+    target = _pdf_downsample_target(box, disp_w, disp_h, layout)
+    # ছবি আগে পুরোপুরি তৈরি হয়, তারপর ক্যানভাস ছোঁয়া হয় — ডিকোড ব্যর্থ হলে অর্ধেক আঁকা পেজ থাকে না
+    if fmt == "JPEG" and mode in ("L", "RGB") and not target: reader = _jpeg_passthrough_reader()(io.BytesIO(data))
+    else:
+        # ডিকোড পথ: EXIF ঘোরানো ও (দরকার হলে) ছোট করা হয়; ছোট করা বা CMYK JPEG আবার JPEG হিসেবেই এনকোড হয়
+        with studio_open_resized(data, *(target or (0, 0)), keep_aspect=True, tool='pdf') as im:
+            if fmt == "JPEG" or (target and im.mode == "RGB"):
+                out = io.BytesIO(); im.save(out, "JPEG", quality=app.config['PDF_JPEG_QUALITY']); out.seek(0)
+                reader = _jpeg_passthrough_reader()(out)
+            else: reader = rl_utils.ImageReader(im); reader.getRGBData()
+        orientation = 1
+    canvas.setPageSize((page_w, page_h)); canvas.saveState()
+    if clip:
+        path = canvas.beginPath(); path.rect(*clip); canvas.clipPath(path, stroke=0, fill=0)
+    x, y, w, h = box; canvas.transform(w, 0, 0, h, x, y)
+    # পাসথ্রু JPEG-এর EXIF orientation ছবি ঘুরিয়ে নয়, ইউনিট স্কোয়ারের ম্যাট্রিক্স দিয়ে প্রয়োগ হয়
+    if orientation != 1: canvas.transform(*PDF_ORIENTATION_MATRIX[orientation])
+    canvas.drawImage(reader, 0, 0, 1, 1, mask='auto'); canvas.restoreState(); canvas.showPage()
+def _read_pdf_source(source):
+    if isinstance(source, (bytes, bytearray)): return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fh: return fh.read()
+    if hasattr(source, "seek"): source.seek(0)
+    return source.read()
+def write_pdf(sources, sink, layout=None):
+    # sources: bytes, ফাইল পাথ বা read() আছে এমন অবজেক্ট — একটি একটি করে পড়া হয়; ছবি নয় এমন ফাইল বাদ যায়
+    # রিটার্ন: লেখা পেজের সংখ্যা (0 হলে sink-এ কিছুই লেখা হয় না)
+    layout = layout or parse_pdf_layout_options({})
+    rl_config.useA85 = 0 # ইমেজ স্ট্রিম বাইনারি থাকে; ASCII85 করলে ফাইল ~২৫% বড় হয়
+    canvas = rl_canvas.Canvas(sink, pageCompression=1); pages = 0
+    for source in sources:
+        try: draw_pdf_page(canvas, _read_pdf_source(source), layout)
+        except Exception as e: print(f"Skipping non-image file: {e}"); continue
+        pages += 1
+    if pages: canvas.save()
+    return pages
+def convert_jpg_to_pdf(image_files, layout=None):
+    # রিটার্ন: spooled বাফার (খুব বড় হলেই ডিস্কে নামে) অথবা কোনো ছবি না থাকলে None
+    pdf_buffer = tempfile.SpooledTemporaryFile(max_size=app.config['STUDIO_SPILL_BYTES'], dir=app.config['PROCESSED_FOLDER'])
+    with metrics.stage('encode', tool='jpg_to_pdf'): pages = write_pdf(image_files, pdf_buffer, layout)
+    if not pages: pdf_buffer.close(); return None
     pdf_buffer.seek(0)
     return pdf_buffer
-def convert_pdf_to_jpgs(pdf_file):
-    pdf_bytes = pdf_file.read()
-    try: images = convert_from_bytes(pdf_bytes)
-    except Exception as e: print(f"PDF to JPG Error: {e} (Poppler installed?)"); return None
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w') as zf:
-        for i, image in enumerate(images):
-            img_buffer = io.BytesIO(); image.save(img_buffer, format='JPEG'); img_buffer.seek(0)
-            zf.writestr(f'page_{i+1}.jpg', img_buffer.read())
-    zip_buffer.seek(0); return zip_buffer
+def parse_pdf_options(form):
+    # PDF -> ছবি কনভার্সনের ইউজার অপশন (DPI, পেজ রেঞ্জ, ফরম্যাট, কোয়ালিটি)
+    dpi = int(form.get("dpi") or app.config['PDF_DEFAULT_DPI'])
+    image_format = (form.get("image_format") or "jpeg").lower(); pages = (form.get("pages") or "").strip()
+    list(_page_spec_parts(pages)) # ভুল সিনট্যাক্স হলে এখানেই PageRangeError, কাজ শুরুর আগে
+    return {"dpi": max(36, min(app.config['PDF_MAX_DPI'], dpi)), "pages": pages,
+            "image_format": image_format if image_format in ("jpeg", "png") else "jpeg",
+            "quality": max(1, min(100, int(form.get("quality") or 90)))}
+class PageRangeError(ValueError):
+    pass
+def _page_spec_parts(spec):
+    # "1-3, 7, 10-" -> (1, 3), (7, 7), (10, None); None = ডকুমেন্টের শেষ পেজ পর্যন্ত
+    for part in spec.split(","):
+        part = part.strip()
+        if not part: continue
+        start, sep, end = (p.strip() for p in part.partition("-"))
+        if not all(x.isdigit() for x in (start, end) if x):
+            raise PageRangeError(f"'{part}' is not a page number or range (use e.g. 1-3, 7, 10-)")
+        start = int(start) if start else 1; end = (int(end) if end else None) if sep else start
+        if start < 1 or (end is not None and end < start): raise PageRangeError(f"'{part}' is not a valid page range")
+        yield start, end
+def parse_page_ranges(spec, total):
+    # "1-3, 7, 10-" -> [(1, 3), (7, 7), (10, total)]; খালি হলে পুরো ডকুমেন্ট
+    if not spec: return [(1, total)]
+    ranges = [(start, min(total, end or total)) for start, end in _page_spec_parts(spec) if start <= total]
+    if not ranges: raise PageRangeError(f"no selected page exists (the document has {total} pages)")
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1: merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else: merged.append((start, end))
+    return merged
+def pdf_to_jpg_error(e):
+    # ইউজারকে দেখানোর বার্তা; Poppler এর কথা শুধু তখনই, যখন সত্যিই pdfinfo/pdftoppm পাওয়া যায়নি
+    if isinstance(e, PageRangeError): return f"Invalid page range: {e}."
+    if isinstance(e, (pdf2image.exceptions.PDFInfoNotInstalledError, FileNotFoundError)): return "Error during PDF to JPG conversion. Did you install Poppler?"
+    return f"Error during PDF to JPG conversion: {e}"
+def convert_pdf_to_jpgs(pdf_file, options=None):
+    # রিটার্ন: (arcname, image_bytes) জেনারেটর — stream_zip() এটিকে সরাসরি ক্লায়েন্টে স্ট্রিম করে
+    # পেজ রেঞ্জ ডকুমেন্টের বাইরে হলে PageRangeError, PDF পড়া না গেলে pdf2image এর এক্সসেপশন (pdf_to_jpg_error দেখুন)
+    # pdftoppm ছোট ছোট চাংকে পেজ রেন্ডার করে সরাসরি টেম্প ফোল্ডারে JPEG/PNG লেখে, তাই PIL-এ ডিকোড/এনকোড হয় না
+    # এবং পেজ সংখ্যা যত বেশিই হোক, এক সময়ে সর্বোচ্চ একটি চাংক ডিস্কে ও একটি পেজ মেমরিতে থাকে
+    options = options or parse_pdf_options({})
+    work_dir = tempfile.mkdtemp(dir=app.config['PROCESSED_FOLDER'])
+    pdf_path = os.path.join(work_dir, "input.pdf")
+    try:
+        with open(pdf_path, "wb") as fh: shutil.copyfileobj(pdf_file, fh)
+        ranges = parse_page_ranges(options["pages"], pdf2image.pdfinfo_from_path(pdf_path)["Pages"])
+    except Exception as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        # পেজ রেঞ্জের ভুল ইউজারের, সার্ভারের নয় — ট্রেসব্যাকসহ লগ শুধু বাকি ব্যর্থতার
+        if not isinstance(e, PageRangeError): app.logger.exception("PDF to JPG conversion failed")
+        raise
+    ext = "jpg" if options["image_format"] == "jpeg" else "png"
+    chunk_pages = app.config['PDF_RENDER_CHUNK_PAGES']
+    def pages():
+        try:
+            for first, last in ranges:
+                for start in range(first, last + 1, chunk_pages):
+                    end = min(last, start + chunk_pages - 1)
+                    with metrics.stage('pdf_render', tool='pdf_to_jpg'): paths = pdf2image.convert_from_path(pdf_path, dpi=options["dpi"], first_page=start, last_page=end, fmt=options["image_format"],
+                                              jpegopt={"quality": options["quality"], "progressive": False, "optimize": False} if ext == "jpg" else None,
+                                              output_folder=work_dir, paths_only=True, thread_count=min(app.config['PDF_RENDER_THREADS'], end - start + 1))
+                    for page_no, path in zip(range(start, end + 1), paths):
+                        with open(path, "rb") as fh: data = fh.read()
+                        os.remove(path)
+                        yield f'page_{page_no}.{ext}', data
+        except Exception: app.logger.exception("PDF to JPG rendering failed"); raise
+        finally: shutil.rmtree(work_dir, ignore_errors=True)
+    return pages()
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXT
+# --- পরিবর্তন: ওয়াটারমার্ক ইঞ্জিন — ফন্ট ও টাইল প্রতি প্রসেসে একবার তৈরি হয়ে মেমোয়াইজড থাকে (ব্যাচের প্রতিটি ছবিতে আবার নয়),
+# আর কম্পোজিট হয় শুধু টাইলের জায়গাটুকুতে, পুরো ছবির সমান ওভারলে বানিয়ে নয়
+class TileCache:
+    # key -> তৈরি করা টাইল; এন্ট্রির সংখ্যা নয়, মোট পিক্সেল-বাইট (WATERMARK_CACHE_BYTES) দিয়ে সীমিত LRU
+    # কী-তে আপলোড করা ওয়াটারমার্কের bytes নয়, তার sha256 — তাই ক্যাশের কারণে কোনো আপলোড মেমরিতে আটকে থাকে না
+    def __init__(self, config):
+        self.config = config; self._lock = threading.Lock(); self._entries = OrderedDict(); self._bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+    @staticmethod
+    def _nbytes(value):
+        img = value[0] if isinstance(value, tuple) else value
+        return img.width * img.height * len(img.getbands())
+    def get(self, key, create):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None: self._entries.move_to_end(key); self.counters["hits"] += 1; return entry[0]
+            self.counters["misses"] += 1
+        value = create(); size = self._nbytes(value); limit = self.config['WATERMARK_CACHE_BYTES']
+        if size > limit: return value # একাই সীমার চেয়ে বড় টাইল রাখা হয় না
+        with self._lock:
+            if key not in self._entries: self._entries[key] = (value, size); self._bytes += size
+            while self._bytes > limit:
+                _, (_, evicted) = self._entries.popitem(last=False); self._bytes -= evicted; self.counters["evictions"] += 1
+        return value
+    def stats(self):
+        with self._lock: return dict(self.counters, entries=len(self._entries), bytes=self._bytes, max_bytes=self.config['WATERMARK_CACHE_BYTES'])
+watermark_tiles = TileCache(app.config)
+@lru_cache(maxsize=64)
 def _safe_font(size=24):
     try: return ImageFont.truetype("arial.ttf", size)
     except IOError:
         try: return ImageFont.truetype("DejaVuSans.ttf", size)
         except IOError: return ImageFont.load_default()
+def _text_watermark_tile(text, fontsize, opacity):
+    return watermark_tiles.get(("text", text, fontsize, opacity), lambda: _render_text_watermark_tile(text, fontsize, opacity))
+def _render_text_watermark_tile(text, fontsize, opacity):
+    # রিটার্ন: (টাইল, দৃশ্যমান প্রস্থ, দৃশ্যমান উচ্চতা); টাইলটি (0, 0) থেকে আঁকা, তাই বসানোর হিসাব আগের মতোই থাকে
+    font = _safe_font(fontsize); probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    try:
+        bbox = probe.textbbox((0, 0), text, font=font); textwidth = bbox[2] - bbox[0]; textheight = bbox[3] - bbox[1]; size = (max(1, bbox[2]), max(1, bbox[3]))
+    except AttributeError: textwidth, textheight = probe.textsize(text, font=font); size = (max(1, textwidth), max(1, textheight))
+    tile = Image.new("RGBA", size, (255, 255, 255, 0))
+    ImageDraw.Draw(tile).text((0, 0), text, font=font, fill=(255, 255, 255, int(255 * opacity)))
+    return tile, textwidth, textheight
+def _decode_watermark(wm_data):
+    try:
+        with Image.open(io.BytesIO(wm_data)) as wm: return wm.convert("RGBA")
+    except Exception as e: raise RuntimeError(f"Watermark image load failed: {e}")
+def _image_watermark_tile(wm_data, target_w, opacity):
+    # একই ব্যাচে একই প্রস্থের ছবির জন্য ডিকোড, রিসাইজ ও অপাসিটি একবারই
+    wm_digest = hashlib.sha256(wm_data).hexdigest()
+    def create():
+        wm = watermark_tiles.get(("source", wm_digest), lambda: _decode_watermark(wm_data))
+        return _render_image_watermark_tile(wm, target_w, opacity)
+    return watermark_tiles.get(("image", wm_digest, target_w, opacity), create)
+def _render_image_watermark_tile(wm, target_w, opacity):
+    target_h = max(1, int(wm.height * target_w / wm.width))
+    tile = wm.resize((target_w, target_h), Image.LANCZOS)
+    if opacity < 1.0:
+        arr = np.asarray(tile).copy(); arr[..., 3] = (arr[..., 3] * opacity).astype(np.uint8); tile = Image.fromarray(arr, "RGBA")
+    # আগের ফুল-ফ্রেম লেয়ারে মাস্ক দিয়ে paste করার ফলাফল (আলফা আরেকবার গুণ হয়) টাইলেই ধরে রাখা হয়
+    layer = Image.new("RGBA", tile.size, (255, 255, 255, 0)); layer.paste(tile, (0, 0), tile)
+    return layer
+def _watermark_position(position, base_size, tile_w, tile_h):
+    width, height = base_size; margin = max(10, int(min(base_size) * 0.02))
+    positions = {"bottom-right": (width - tile_w - margin, height - tile_h - margin), "bottom-left": (margin, height - tile_h - margin), "top-left": (margin, margin), "top-right": (width - tile_w - margin, margin), "center": ((width - tile_w) // 2, (height - tile_h) // 2)}
+    return positions.get(position, positions["bottom-right"])
+def _composite_tile(img, tile, pos):
+    # ছবির বাইরের অংশ কেটে শুধু ছেদ-অংশে ব্লেন্ড; RGBA হলে PIL-এর alpha_composite, নাহলে NumPy দিয়ে সরাসরি RGB-তে
+    x, y = pos; left, top = max(0, x), max(0, y); right, bottom = min(img.width, x + tile.width), min(img.height, y + tile.height)
+    if left >= right or top >= bottom: return img
+    tile = tile.crop((left - x, top - y, right - x, bottom - y)); box = (left, top, right, bottom)
+    if img.mode == "RGBA": img.alpha_composite(tile, (left, top)); return img
+    if img.mode != "RGB": img = img.convert("RGB")
+    src = np.asarray(tile, dtype=np.uint16); alpha = src[..., 3:4]
+    region = np.asarray(img.crop(box), dtype=np.uint16)
+    img.paste(Image.fromarray(((src[..., :3] * alpha + region * (255 - alpha) + 127) // 255).astype(np.uint8), "RGB"), box)
+    return img
 def add_text_watermark(img: Image.Image, text: str, position: str, opacity: float, fontsize: int):
     if not text: return img
-    base = img.convert("RGBA"); overlay = Image.new("RGBA", base.size, (255, 255, 255, 0)); draw = ImageDraw.Draw(overlay); font = _safe_font(fontsize)
+    tile, textwidth, textheight = _text_watermark_tile(text, int(fontsize), float(opacity))
+    return _composite_tile(img, tile, _watermark_position(position, img.size, textwidth, textheight))
+def add_image_watermark(img: Image.Image, wm_path, position: str, opacity: float, scale: float):
+    # wm_path একটি ফাইল পাথ অথবা ওয়াটারমার্ক ছবির bytes হতে পারে
+    if not isinstance(wm_path, bytes):
+        if not wm_path or not os.path.exists(wm_path): return img
+        with open(wm_path, "rb") as fh: wm_path = fh.read()
+    tile = _image_watermark_tile(wm_path, max(1, int(img.width * float(scale))), float(opacity))
+    return _composite_tile(img, tile, _watermark_position(position, img.size, tile.width, tile.height))
+def make_pdf_from_images(pil_image_paths, out_pdf_path, layout=None):
+    # ইনপুট ফাইল পাথ বা এনকোড করা বাফার হতে পারে; JPEG (যেমন Image Studio-র PDF পেজ) write_pdf() ডিকোড ছাড়াই বসায়
+    layout = layout or parse_pdf_layout_options({}, default_page="a4")
+    if hasattr(out_pdf_path, 'write'): return write_pdf(pil_image_paths, out_pdf_path, layout)
+    with open(out_pdf_path, 'wb') as fh: return write_pdf(pil_image_paths, fh, layout)
+
+# --- নতুন সংযোজন: Image Studio-র কাজগুলো রুট থেকে আলাদা করা হয়েছে (sync রুট ও ব্যাকগ্রাউন্ড জব দুটোই ব্যবহার করে) ---
+def parse_studio_options(form):
+    opts = {
+        "resize_w": int(form.get("width") or 0), "resize_h": int(form.get("height") or 0),
+        "keep_aspect": form.get("keep_aspect") == "on", "watermark_text": (form.get("watermark_text") or "").strip(),
+        "wm_position": form.get("wm_position") or "bottom-right",
+        "text_opacity": float(form.get("text_opacity") or 0.5), "img_opacity": float(form.get("img_opacity") or 0.5),
+        "text_size": int(form.get("text_size") or 24), "image_scale": float(form.get("image_scale") or 0.2),
+        "output_format": (form.get("output_format") or "JPEG").upper(), "quality": int(form.get("quality") or 90),
+    }
+    if opts["output_format"] not in FORMAT_MAP: opts["output_format"] = "JPEG"
+    if opts["output_format"] == "PDF": opts["pdf_layout"] = parse_pdf_layout_options(form, default_page="a4")
+    opts["quality"] = max(1, min(100, opts["quality"]))
+    # খুব বড় ফন্ট/স্কেল মানে বিশাল টাইল (এবং টাইল ক্যাশে বিশাল এন্ট্রি), তাই সীমার ভেতরে আনা হয়
+    (min_size, max_size), (min_scale, max_scale) = app.config['WATERMARK_TEXT_SIZE_RANGE'], app.config['WATERMARK_IMAGE_SCALE_RANGE']
+    opts["text_size"] = max(min_size, min(max_size, opts["text_size"])); opts["image_scale"] = max(min_scale, min(max_scale, opts["image_scale"]))
+    opts["text_opacity"] = max(0.0, min(1.0, opts["text_opacity"])); opts["img_opacity"] = max(0.0, min(1.0, opts["img_opacity"]))
+    return opts
+# --- নতুন সংযোজন: রিসাইজ ইঞ্জিন — JPEG হলে ছোট স্কেলেই ডিকোড (draft), তারপর reduce + LANCZOS ---
+def studio_target_size(size, resize_w, resize_h, keep_aspect):
+    # ফাইনাল সাইজ; keep_aspect হলে thumbnail-এর মতো (বক্সে ফিট, বড় করা হয় না)
+    width, height = size
+    if not keep_aspect: return (resize_w or width, resize_h or height)
+    box_w, box_h = resize_w or width, resize_h or height
+    if width <= box_w and height <= box_h: return size
+    scale = min(box_w / width, box_h / height)
+    return (max(1, round(width * scale)), max(1, round(height * scale)))
+def studio_open_resized(data, resize_w=0, resize_h=0, keep_aspect=True, tool='image_studio'):
+    # রিটার্ন: লোড করা, EXIF অনুযায়ী ঘোরানো, রিসাইজ করা ছবি — আলফা থাকলে RGBA, নাহলে RGB (অপ্রয়োজনীয় RGBA কনভার্সন নেই)
+    gap = app.config['STUDIO_REDUCING_GAP']
+    im = Image.open(io.BytesIO(data))
+    orientation = im.getexif().get(0x0112, 1)
+    rotated = orientation in (5, 6, 7, 8)
+    target = None
+    if resize_w or resize_h:
+        oriented = (im.height, im.width) if rotated else im.size
+        target = studio_target_size(oriented, resize_w, resize_h, keep_aspect)
+        if im.format == "JPEG" and target != oriented:
+            # DCT স্কেলিং (1/2, 1/4, 1/8) দিয়ে ডিকোড, তবে সবসময় টার্গেটের অন্তত gap গুণ রেজোলিউশন রেখে
+            draft_size = (int(target[0] * gap), int(target[1] * gap))
+            im.draft(im.mode, draft_size[::-1] if rotated else draft_size)
+    with metrics.stage('decode', tool=tool):
+        im.load()
+        if orientation != 1: im = ImageOps.exif_transpose(im)
+        has_alpha = im.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in im.info
+        mode = "RGBA" if has_alpha else "RGB"
+        if im.mode != mode: im = im.convert(mode)
+    if target and target != im.size:
+        with metrics.stage('resize', tool=tool): im = im.resize(target, Image.LANCZOS, reducing_gap=gap)
+    return im
+def studio_process_image(data, opts, wm_data=None):
+    # সম্পূর্ণ মেমরিতে: আপলোডের bytes -> PIL -> এনকোড করা bytes; রিটার্ন: (extension, bytes)
+    # PDF হলে পেজটি এখানেই একবার JPEG হয় (max_dpi-র জন্য ছোট করাসহ) এবং write_pdf সেই DCT স্ট্রিম ডিকোড/রি-এনকোড ছাড়াই বসায়;
+    # PIL ছবি সরাসরি পাঠালে প্রসেস পুল থেকে কাঁচা পিক্সেল pickle হয়ে ফিরত। "image" পেজ সাইজে পেজের মাপ পিক্সেল থেকে আসে, তাই সেখানে ছোট করা write_pdf-এর কাজ
+    output_format = opts["output_format"]
+    with studio_open_resized(data, opts["resize_w"], opts["resize_h"], opts["keep_aspect"]) as im:
+        if wm_data or opts["watermark_text"]:
+            with metrics.stage('watermark', tool='image_studio'):
+                if wm_data: im = add_image_watermark(im, wm_data, opts["wm_position"], opts["img_opacity"], opts["image_scale"])
+                if opts["watermark_text"]: im = add_text_watermark(im, opts["watermark_text"], opts["wm_position"], opts["text_opacity"], opts["text_size"])
+        layout = opts.get("pdf_layout") or parse_pdf_layout_options({}, default_page="a4")
+        if output_format == "PDF" and layout["page_size"] != "image":
+            target = _pdf_downsample_target(_pdf_page_layout(im.width, im.height, 72.0, layout)[2], im.width, im.height, layout)
+            if target:
+                with metrics.stage('resize', tool='image_studio'):
+                    im = im.resize(studio_target_size(im.size, *target, True), Image.LANCZOS, reducing_gap=app.config['STUDIO_REDUCING_GAP'])
+        out = io.BytesIO()
+        with metrics.stage('encode', tool='image_studio', format=output_format):
+            if output_format == "PDF": im.convert("RGB").save(out, "JPEG", quality=opts["quality"]); ext = "jpg"
+            elif output_format == "JPEG": im.convert("RGB").save(out, "JPEG", quality=opts["quality"]); ext = "jpg"
+            else: im.save(out, output_format); ext = FORMAT_MAP.get(output_format, "jpg")
+    return ext, out.getvalue()
+def _peak_rss_reset():
+    # Linux: VmHWM রিসেট করে বর্তমান RSS ফেরত দেয়; অন্য OS-এ None
     try:
-        bbox = draw.textbbox((0, 0), text, font=font); textwidth = bbox[2] - bbox[0]; textheight = bbox[3] - bbox[1]
-    except AttributeError: textwidth, textheight = draw.textsize(text, font=font)
-    margin = max(10, int(min(base.size) * 0.02))
-    positions = {"bottom-right": (base.width - textwidth - margin, base.height - textheight - margin),"bottom-left": (margin, base.height - textheight - margin),"top-left": (margin, margin),"top-right": (base.width - textwidth - margin, margin),"center": ((base.width - textwidth) // 2, (base.height - textheight) // 2),}
-    x, y = positions.get(position, positions["bottom-right"]); fill = (255, 255, 255, int(255 * float(opacity))); draw.text((x, y), text, font=font, fill=fill)
-    combined = Image.alpha_composite(base, overlay); return combined.convert("RGB")
-def add_image_watermark(img: Image.Image, wm_path: str, position: str, opacity: float, scale: float):
-    if not wm_path or not os.path.exists(wm_path): return img
-    try: wm = Image.open(wm_path).convert("RGBA")
-    except Exception as e: raise RuntimeError(f"Watermark image load failed: {e}")
-    base = img.convert("RGBA"); target_w = max(1, int(base.width * float(scale))); ratio = target_w / wm.width; target_h = int(wm.height * ratio)
-    wm_resized = wm.resize((target_w, target_h), Image.LANCZOS)
-    if float(opacity) < 1.0:
-        alpha = wm_resized.split()[3]; alpha = ImageEnhance.Brightness(alpha).enhance(float(opacity)); wm_resized.putalpha(alpha)
-    margin = max(10, int(min(base.size) * 0.02))
-    pos_map = {"bottom-right": (base.width - wm_resized.width - margin, base.height - wm_resized.height - margin),"bottom-left": (margin, base.height - wm_resized.height - margin),"top-left": (margin, margin),"top-right": (base.width - wm_resized.width - margin, margin),"center": ((base.width - wm_resized.width) // 2, (base.height - wm_resized.height) // 2),}
-    pos = pos_map.get(position, pos_map["bottom-right"])
-    layer = Image.new("RGBA", base.size, (255, 255, 255, 0)); layer.paste(wm_resized, pos, wm_resized)
-    combined = Image.alpha_composite(base, layer); return combined.convert("RGB")
-def make_pdf_from_images(pil_image_paths, out_pdf_path):
-    c = canvas.Canvas(str(out_pdf_path), pagesize=A4); page_w, page_h = A4
-    for img_path in pil_image_paths:
+        with open("/proc/self/clear_refs", "w") as fh: fh.write("5")
+        return _proc_status_kb("VmRSS")
+    except OSError: return None
+def _proc_status_kb(field):
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith(field + ":"): return int(line.split()[1])
+@app.cli.command('bench-resize')
+@click.option('--image', 'image_path', type=click.Path(exists=True, dir_okay=False), help='নিজের JPEG; না দিলে সিনথেটিক ছবি')
+@click.option('--megapixels', default=24.0, show_default=True, help='সিনথেটিক ছবির সাইজ')
+@click.option('--width', default=800, show_default=True, help='টার্গেট প্রস্থ (keep aspect)')
+@click.option('--repeat', default=5, show_default=True)
+def bench_resize(image_path, megapixels, width, repeat):
+    """Image Studio রিসাইজ: আগের পথ (ফুল ডিকোড + RGBA + LANCZOS) বনাম draft/reduce ইঞ্জিন — থ্রুপুট ও প্রতি মেগাপিক্সেলে পিক মেমরি।"""
+    if image_path:
+        with open(image_path, "rb") as fh: data = fh.read()
+    else:
+        w = int((megapixels * 1e6 * 1.5) ** 0.5); h = int(w / 1.5)
+        gradient = Image.linear_gradient("L").resize((w, h)); noise = Image.effect_noise((w, h), 40)
+        buf = io.BytesIO(); Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT))).save(buf, "JPEG", quality=90); data = buf.getvalue()
+        del gradient, noise
+    with Image.open(io.BytesIO(data)) as probe: size = probe.size
+    mp = size[0] * size[1] / 1e6
+    def legacy():
+        with Image.open(io.BytesIO(data)) as im:
+            im = im.convert("RGBA"); im.thumbnail((width, im.height), Image.LANCZOS); return im.size
+    def engine():
+        with studio_open_resized(data, width, 0, True) as im: return im.size
+    click.echo(f"input {size[0]}x{size[1]} ({mp:.1f} MP, {len(data) // 1024} KiB JPEG) -> width {width}")
+    click.echo(f"{'path':<8} {'ms/img':>8} {'MP/s':>8} {'peak MiB':>9} {'MiB/MP':>7}  output")
+    for name, fn in (("legacy", legacy), ("engine", engine)):
+        gc.collect(); baseline = _peak_rss_reset(); out_size = fn()
+        peak = (_proc_status_kb("VmHWM") - baseline) / 1024 if baseline is not None else float("nan")
+        start = time.perf_counter()
+        for _ in range(repeat): fn()
+        elapsed = (time.perf_counter() - start) / repeat
+        click.echo(f"{name:<8} {elapsed * 1000:>8.1f} {mp / elapsed:>8.1f} {peak:>9.1f} {peak / mp:>7.2f}  {out_size[0]}x{out_size[1]}")
+class StudioOutputs:
+    # প্রসেস করা ছবিগুলো মেমরিতে রাখে; ব্যাচের মোট সাইজ STUDIO_SPILL_BYTES ছাড়ালে বাকিগুলো টেম্প ফাইলে যায়
+    def __init__(self, spill_bytes):
+        self.spill_bytes = spill_bytes; self.in_memory = 0; self.items = []
+    def add(self, arcname, data):
+        if self.in_memory + len(data) <= self.spill_bytes: buf = io.BytesIO(data); self.in_memory += len(data)
+        else: buf = tempfile.TemporaryFile(dir=app.config['PROCESSED_FOLDER']); buf.write(data); buf.seek(0)
+        self.items.append((arcname, buf))
+    def buffers(self): return [buf for _, buf in self.items]
+    def close(self):
+        for _, buf in self.items: buf.close()
+    def __len__(self): return len(self.items)
+    def __iter__(self): return iter(self.items)
+def _studio_process_item(args):
+    # প্রসেস পুলের ওয়ার্কারে চলে; এক্সেপশন না ছুড়ে (ok, value) রিটার্ন করে যাতে বাকি ছবিগুলো চলতে থাকে
+    # ধাপের টাইমিংগুলো (এই প্রসেসের মেট্রিক্সে নয়) রেজাল্টের সাথে ফেরত যায়, প্যারেন্ট merge করে
+    data, opts, wm_data = args
+    with metrics.collect() as samples:
+        try: result = True, studio_process_image(data, opts, wm_data)
+        except Exception as e: result = False, str(e)
+    return result + (samples,)
+_image_executor = None
+_image_executor_pid = None
+_image_executor_lock = threading.Lock()
+def get_image_executor():
+    # fork করা চাইল্ড প্রসেসে (যেমন জব ওয়ার্কার) প্যারেন্টের পুল ব্যবহারযোগ্য নয়, তাই তখন None
+    global _image_executor, _image_executor_pid
+    if app.config['IMAGE_WORKERS'] <= 1: return None
+    with _image_executor_lock:
+        if _image_executor is None:
+            _image_executor = ProcessPoolExecutor(max_workers=app.config['IMAGE_WORKERS']); _image_executor_pid = os.getpid()
+        return _image_executor if _image_executor_pid == os.getpid() else None
+def discard_image_executor(executor):
+    # কোনো ওয়ার্কার মারা গেলে (OOM-kill, segfault) পুলটি স্থায়ীভাবে ভাঙা থাকে; সেটি ফেলে দেওয়া হয়, পরের get_image_executor() নতুন পুল বানায়
+    global _image_executor
+    with _image_executor_lock:
+        if _image_executor is executor: _image_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+def studio_iter_outputs(items, opts, wm_data=None, errors=None, progress=None, parallel=True):
+    # items: [(display_name, upload_bytes)]; প্রতিটি ছবি শেষ হওয়ার সাথে সাথে (arcname, bytes) yield করে — কোনো মধ্যবর্তী ফাইল ডিস্কে লেখা হয় না
+    # ব্যাচ বড় হলে ছবিগুলো প্রসেস পুলে ছড়িয়ে দেওয়া হয়; map() আউটপুটের ক্রম ঠিক রাখে। ব্যর্থ ছবিগুলো errors লিস্টে যায়
+    # পুল ভেঙে গেলে (BrokenProcessPool) সেটি বদলে ফেলা হয় আর বাকি ছবিগুলো এই প্রসেসেই একটার পর একটা চলে — রিকোয়েস্ট ব্যর্থ হয় না
+    errors = errors if errors is not None else []
+    tasks = [(data, opts, wm_data) for _, data in items]
+    executor = get_image_executor() if parallel and len(items) >= app.config['IMAGE_PARALLEL_MIN_BATCH'] else None
+    results = None
+    if executor:
+        try: results = executor.map(_studio_process_item, tasks)
+        except BrokenProcessPool:
+            app.logger.warning("Image pool broken on submit; processing %d images serially", len(tasks)); discard_image_executor(executor)
+    if results is None: results = map(_studio_process_item, tasks)
+    try:
+        i = 0
+        while i < len(items):
+            try: ok, value, samples = next(results)
+            except BrokenProcessPool:
+                app.logger.warning("Image pool broken; processing remaining %d images serially", len(tasks) - i); discard_image_executor(executor)
+                results = map(_studio_process_item, tasks[i:]); continue
+            name = items[i][0]; i += 1
+            metrics.merge(samples)
+            if progress: progress(0.9 * i / len(items), "processing")
+            if ok: ext, data = value; yield f"{uuid.uuid4().hex}_out.{ext}", data
+            else: errors.append(f"{name}: processing failed ({value})")
+    except Exception as e: errors.append(f"Batch processing failed ({e})")
+def studio_process_files(items, opts, wm_data=None, errors=None, progress=None, parallel=True):
+    # সব আউটপুট একসাথে লাগলে (যেমন PDF): StudioOutputs-এ জমা করে রিটার্ন করে
+    outputs = StudioOutputs(app.config['STUDIO_SPILL_BYTES'])
+    for arcname, data in studio_iter_outputs(items, opts, wm_data, errors, progress, parallel): outputs.add(arcname, data)
+    return outputs
+def studio_make_pdf(outputs, layout=None):
+    # রিটার্ন: (output_buffer, download_name, mimetype); PDF একটি spooled বাফারে যায়, যা শুধু খুব বড় হলে ডিস্কে নামে
+    package = tempfile.SpooledTemporaryFile(max_size=app.config['STUDIO_SPILL_BYTES'], dir=app.config['PROCESSED_FOLDER'])
+    try:
+        with metrics.stage('archive', tool='pdf'): make_pdf_from_images(outputs.buffers(), package, layout)
+        package.seek(0)
+        return package, "MyGizmo_Converted.pdf", "application/pdf"
+    except Exception:
+        package.close(); raise
+    finally: outputs.close()
+def peek_outputs(entries):
+    # প্রথম সফল আউটপুট পর্যন্ত এগিয়ে দেখে; কিছুই না এলে None, নাহলে প্রথমটি সহ পুরো iterator
+    for first in entries: return itertools.chain([first], entries)
+    return None
+
+# --- নতুন সংযোজন: স্ট্রিমিং ZIP ---
+# zipfile একটি non-seekable sink-এ লেখে (data descriptor সহ), প্রতিটি এন্ট্রি লেখা হলেই জমা bytes ক্লায়েন্টে পাঠানো হয়।
+# তাই পুরো আর্কাইভ কখনো মেমরিতে থাকে না, প্রথম বাইটও দ্রুত পৌঁছায়।
+class _ZipChunkSink:
+    def __init__(self): self._chunks = []
+    def write(self, data): self._chunks.append(bytes(data)); return len(data)
+    def flush(self): pass
+    def drain(self):
+        data = b"".join(self._chunks); self._chunks.clear(); return data
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED, chunk_size=1024 * 1024):
+    # entries: (arcname, bytes অথবা file-like) এর iterator; ZIP-এর chunk গুলো yield করে
+    # archive স্টেজ = জেনারেটরের সক্রিয় সময় থেকে entries তৈরির (যেমন ছবি প্রসেসিং) সময় বাদ দিয়ে
+    upstream = [0.0]; active = 0.0
+    def timed_entries():
+        it = iter(entries)
+        while True:
+            started = time.perf_counter()
+            try: item = next(it)
+            except StopIteration: return
+            finally: upstream[0] += time.perf_counter() - started
+            yield item
+    chunks = _stream_zip(timed_entries(), compression, chunk_size)
+    try:
+        while True:
+            started = time.perf_counter()
+            try: chunk = next(chunks)
+            except StopIteration: break
+            finally: active += time.perf_counter() - started
+            yield chunk
+    finally:
+        chunks.close(); metrics.observe('stage_seconds', max(0.0, active - upstream[0]), stage='archive', tool='zip')
+def _stream_zip(entries, compression, chunk_size):
+    sink = _ZipChunkSink()
+    with zipfile.ZipFile(sink, "w", compression) as zf:
+        for arcname, data in entries:
+            with zf.open(arcname, "w") as dest:
+                if hasattr(data, "read"):
+                    data.seek(0)
+                    for block in iter(lambda: data.read(chunk_size), b""):
+                        dest.write(block)
+                        chunk = sink.drain()
+                        if chunk: yield chunk
+                else: dest.write(data)
+            chunk = sink.drain()
+            if chunk: yield chunk
+    chunk = sink.drain()
+    if chunk: yield chunk
+def streamed_download(chunks, download_name, mimetype, user=None, tool_name=None):
+    # chunk গুলো ক্লায়েন্টে যাওয়ার সময় (ইউজার লগইন থাকলে) একটি spooled কপিতেও লেখা হয়, শেষে save_user_file-এ যায়
+    def generate():
+        copy = tempfile.SpooledTemporaryFile(max_size=app.config['STUDIO_SPILL_BYTES'], dir=app.config['PROCESSED_FOLDER']) if user and user.is_authenticated else None
         try:
-            with Image.open(img_path) as im:
-                im = im.convert("RGB"); img_w_px, img_h_px = im.size; ratio = min(page_w / img_w_px, page_h / img_h_px)
-                draw_w = img_w_px * ratio; draw_h = img_h_px * ratio; x = (page_w - draw_w) / 2; y = (page_h - draw_h) / 2
-                b = io.BytesIO(); im.save(b, format="PNG"); b.seek(0); ir = ImageReader(b)
-                c.drawImage(ir, x, y, width=draw_w, height=draw_h, preserveAspectRatio=True, anchor='c'); c.showPage()
-        except Exception as e: print("make_pdf_from_images: failed to add", img_path, e)
-    c.save()
+            for chunk in chunks:
+                if copy: copy.write(chunk)
+                yield chunk
+            if copy: save_user_file(user, copy, download_name, tool_name)
+        finally:
+            if copy: copy.close()
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename="{download_name}"'})
+
+# --- নতুন সংযোজন: কনটেন্ট-অ্যাড্রেসড রেজাল্ট ক্যাশ ---
+# কী = ইনপুট ফাইলগুলোর sha256 + নরমালাইজ করা প্যারামিটার। হিট হলে PIL/pdf2image/rembg কিছুই চলে না, ডিস্ক থেকে সরাসরি ফাইল যায়।
+# ডিস্কে সাইজ-সীমিত LRU: প্রতিটি হিটে ফাইলের mtime আপডেট হয়, সীমা ছাড়ালে সবচেয়ে পুরনোগুলো মুছে যায়।
+def file_digest(source):
+    # bytes, ফাইল পাথ বা file-like (যেমন FileStorage) এর sha256; file-like এর পজিশন শুরুতে ফিরিয়ে দেয়
+    if isinstance(source, bytes): return hashlib.sha256(source).hexdigest()
+    h = hashlib.sha256()
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b""): h.update(block)
+        return h.hexdigest()
+    stream = getattr(source, "stream", source); stream.seek(0)
+    for block in iter(lambda: stream.read(1024 * 1024), b""): h.update(block)
+    stream.seek(0)
+    return h.hexdigest()
+class ResultCache:
+    # prefix ঠিক করে কোন কনফিগ কী (<prefix>_FOLDER/_ENABLED/_MAX_BYTES) ব্যবহার হবে — একই ক্লাস QR কোডের ডিস্ক ক্যাশেও চলে
+    def __init__(self, config, prefix='RESULT_CACHE'):
+        self.config = config; self.prefix = prefix; self._lock = threading.Lock(); self._size = None
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+    def _cfg(self, name): return self.config[f"{self.prefix}_{name}"]
+    @property
+    def folder(self): return self._cfg('FOLDER')
+    def key(self, tool, params, digests):
+        h = hashlib.sha256(tool.encode())
+        h.update(json.dumps(params, sort_keys=True, separators=(",", ":")).encode())
+        for digest in digests: h.update(b"|" + digest.encode())
+        return h.hexdigest()
+    def _paths(self, key):
+        bucket = os.path.join(self.folder, key[:2]); return bucket, os.path.join(bucket, key), os.path.join(bucket, key + ".json")
+    def _count(self, name, n=1):
+        with self._lock: self.counters[name] += n
+    def get(self, key):
+        # হিট হলে {"path", "download_name", "mimetype"}, নাহলে None
+        if not key or not self._cfg('ENABLED'): return None
+        _, data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as fh: meta = json.loads(fh.read())
+            os.utime(data_path) # LRU-এর জন্য "সম্প্রতি ব্যবহৃত" চিহ্ন
+        except (OSError, ValueError): self._count("misses"); return None
+        self._count("hits"); return dict(meta, path=data_path)
+    def _tmp_file(self):
+        tmp_dir = os.path.join(self.folder, "tmp"); os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir); return os.fdopen(fd, "wb"), tmp_path
+    def _commit(self, key, tmp_path, download_name, mimetype):
+        bucket, data_path, meta_path = self._paths(key); os.makedirs(bucket, exist_ok=True)
+        os.replace(tmp_path, data_path)
+        with open(meta_path + ".tmp", "w") as fh: fh.write(json.dumps({"download_name": download_name, "mimetype": mimetype}))
+        os.replace(meta_path + ".tmp", meta_path)
+        size = os.path.getsize(data_path)
+        with self._lock:
+            self.counters["stores"] += 1
+            self._size = None if self._size is None else self._size + size
+            over = self._size is None or self._size > self._cfg('MAX_BYTES')
+        if over: self.evict()
+    def put(self, key, source, download_name, mimetype):
+        if not key or not self._cfg('ENABLED'): return
+        try:
+            fh, tmp_path = self._tmp_file()
+            with fh:
+                if isinstance(source, bytes): fh.write(source)
+                elif isinstance(source, (str, Path)):
+                    with open(source, "rb") as src: shutil.copyfileobj(src, fh)
+                else: source.seek(0); shutil.copyfileobj(source, fh); source.seek(0)
+            self._commit(key, tmp_path, download_name, mimetype)
+        except Exception as e: print(f"Result cache store failed: {e}")
+    def store_stream(self, key, chunks, download_name, mimetype):
+        # স্ট্রিমিং রেসপন্সের chunk গুলো ক্লায়েন্টে যাওয়ার সময় ক্যাশেও লেখা হয়; পুরো স্ট্রিম শেষ হলেই কেবল কমিট হয়
+        if not key or not self._cfg('ENABLED'):
+            yield from chunks; return
+        fh, tmp_path = self._tmp_file(); completed = False
+        try:
+            for chunk in chunks: fh.write(chunk); yield chunk
+            completed = True
+        finally:
+            fh.close()
+            if completed: self._commit(key, tmp_path, download_name, mimetype)
+            elif os.path.exists(tmp_path): os.remove(tmp_path)
+    def evict(self):
+        # সবচেয়ে কম সাম্প্রতিক ফাইলগুলো মুছে সাইজ সীমার ৯০%-এ নামিয়ে আনে
+        entries = []
+        for bucket in os.listdir(self.folder):
+            bucket_path = os.path.join(self.folder, bucket)
+            if bucket == "tmp" or not os.path.isdir(bucket_path): continue
+            for name in os.listdir(bucket_path):
+                if name.endswith((".json", ".tmp")): continue
+                try: st = os.stat(os.path.join(bucket_path, name))
+                except OSError: continue
+                entries.append((st.st_mtime, st.st_size, os.path.join(bucket_path, name)))
+        total = sum(size for _, size, _ in entries); target = self._cfg('MAX_BYTES') * 0.9; evicted = 0
+        if total > self._cfg('MAX_BYTES'):
+            for _, size, path in sorted(entries):
+                if total <= target: break
+                for p in (path + ".json", path):
+                    try: os.remove(p)
+                    except OSError: pass
+                total -= size; evicted += 1
+        with self._lock: self._size = total; self.counters["evictions"] += evicted
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, hit_ratio=round(self.counters["hits"] / lookups, 3) if lookups else None,
+                        size_bytes=self._size, max_bytes=self._cfg('MAX_BYTES'), enabled=self._cfg('ENABLED'))
+result_cache = ResultCache(app.config)
+def studio_cache_key(opts, image_digests, wm_digest=None):
+    return result_cache.key("image_studio", opts, list(image_digests) + [wm_digest or "-"])
+def send_cached_result(hit, tool_name, download_name=None):
+    # ক্যাশ হিট: কোনো প্রসেসিং ছাড়াই ডিস্ক থেকে ফাইল পাঠান (ইউজারের ফাইল লিস্টেও যোগ হয়)
+    download_name = download_name or hit["download_name"]
+    save_user_file(current_user, hit["path"], download_name, tool_name)
+    response = send_file(hit["path"], as_attachment=True, download_name=download_name, mimetype=hit["mimetype"])
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+# --- নতুন সংযোজন: ব্যাকগ্রাউন্ড জব সাবসিস্টেম ---
+# রুটগুলো শুধু ইনপুট সেভ করে Job রো তৈরি করে; ভারী কাজ একটি লোকাল প্রসেস পুলে চলে।
+# চাইল্ড প্রসেস ডাটাবেস ছোঁয় না — অগ্রগতি (progress) জব ফোল্ডারের progress.json ফাইলে লেখে,
+# আর রেজাল্ট/স্ট্যাটাস প্যারেন্ট প্রসেসের callback ডাটাবেসে লেখে।
+JOB_TOOL_NAMES = {"image_studio": "Image Studio", "convert": "File Converter", "bg_remove": "AI Background Remover"}
+class JobProgress:
+    # host/pid: কোন প্রসেস জবটি চালাচ্ছে — রিস্টার্টের পর মৃত প্রসেসের 'running' জব চেনার জন্য (reset_stale_jobs)
+    def __init__(self, job_dir): self.path = os.path.join(job_dir, "progress.json")
+    def __call__(self, fraction, stage="running"):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as fh:
+            fh.write(json.dumps({"progress": round(float(fraction), 3), "stage": stage, "host": socket.gethostname(), "pid": os.getpid()}))
+        os.replace(tmp_path, self.path)
+def read_job_progress(job_dir):
+    try:
+        with open(os.path.join(job_dir, "progress.json")) as fh: return json.loads(fh.read())
+    except (OSError, ValueError): return None
+def _job_input_paths(job_dir, params, role):
+    return [(name, os.path.join(job_dir, rel)) for name, rel in params.get("inputs", {}).get(role, [])]
+def _store_job_result(job_dir, output, download_name, mimetype):
+    ext = os.path.splitext(download_name)[1] or ".bin"; result_filename = f"result{ext}"
+    result_path = os.path.join(job_dir, result_filename)
+    if isinstance(output, (str, Path)): shutil.move(str(output), result_path)
+    else:
+        output.seek(0)
+        with open(result_path, "wb") as fh: shutil.copyfileobj(output, fh)
+        output.close()
+    return {"result_filename": result_filename, "download_name": download_name, "mimetype": mimetype}
+def _store_job_stream(job_dir, chunks, download_name, mimetype):
+    ext = os.path.splitext(download_name)[1] or ".bin"; result_filename = f"result{ext}"
+    with open(os.path.join(job_dir, result_filename), "wb") as fh:
+        for chunk in chunks: fh.write(chunk)
+    return {"result_filename": result_filename, "download_name": download_name, "mimetype": mimetype}
+def _job_image_studio(job_dir, params, progress):
+    def read_bytes(path):
+        with open(path, "rb") as fh: return fh.read()
+    opts = params["options"]; wm = _job_input_paths(job_dir, params, "watermark")
+    wm_data = read_bytes(wm[0][1]) if wm else None
+    items = [(name, read_bytes(path)) for name, path in _job_input_paths(job_dir, params, "images")]
+    errors = list(params.get("errors", []))
+    # জব ওয়ার্কারগুলো নিজেরাই প্যারালাল চলে, তাই এখানে ভেতরে আরেকটি পুল নয়
+    if opts["output_format"] != "PDF":
+        entries = peek_outputs(studio_iter_outputs(items, opts, wm_data, errors, progress, parallel=False))
+        if entries is None: raise RuntimeError("No images were processed. " + "; ".join(errors[:5]))
+        result = _store_job_stream(job_dir, stream_zip(entries), f"MyGizmo_Images_{uuid.uuid4().hex}.zip", "application/zip")
+        return dict(result, errors=errors)
+    outputs = studio_process_files(items, opts, wm_data, errors, progress, parallel=False)
+    if not len(outputs): raise RuntimeError("No images were processed. " + "; ".join(errors[:5]))
+    progress(0.95, "packaging")
+    output, download_name, mimetype = studio_make_pdf(outputs, opts.get("pdf_layout"))
+    return dict(_store_job_result(job_dir, output, download_name, mimetype), errors=errors)
+def _job_convert(job_dir, params, progress):
+    paths = [p for _, p in _job_input_paths(job_dir, params, "file")]
+    if params["conversion_type"] == "jpg_to_pdf":
+        output_buffer = convert_jpg_to_pdf(paths, params.get("pdf_layout"))
+        if not output_buffer: raise RuntimeError("No valid JPG images found")
+        return _store_job_result(job_dir, output_buffer, "converted.pdf", "application/octet-stream")
+    try:
+        with open(paths[0], "rb") as fh: pages = convert_pdf_to_jpgs(fh, params.get("pdf_options"))
+    except Exception as e: raise RuntimeError(pdf_to_jpg_error(e)) from None
+    return _store_job_stream(job_dir, stream_zip(pages, zipfile.ZIP_STORED), "converted_images.zip", "application/octet-stream")
+# --- নতুন সংযোজন: AI Background Remover ইঞ্জিন ---
+# প্রতিটি প্রসেসে প্রতি মডেলের একটি মাত্র rembg সেশন তৈরি হয় এবং পুনরায় ব্যবহার হয়।
+# এটি ব্যাচিং নয়: রিকোয়েস্টগুলো ইনফারেন্স এক্সিকিউটরের কিউতে দাঁড়ায় এবং প্রতিটি ছবি আলাদা rembg.remove() কলে চলে।
+# একসাথে সর্বোচ্চ REMBG_WORKERS টি (0 হলে একটি) ইনফারেন্স চলে, তাই মডেলের মেমরি ও CPU ব্যবহার সীমিত থাকে।
+_rembg_sessions = {}
+_rembg_sessions_lock = threading.Lock()
+_rembg_intra_threads = 0
+def get_rembg_session(model):
+    with _rembg_sessions_lock:
+        session = _rembg_sessions.get(model)
+        if session is None:
+            sess_opts = None
+            if _rembg_intra_threads:
+                import onnxruntime as ort
+                sess_opts = ort.SessionOptions(); sess_opts.intra_op_num_threads = _rembg_intra_threads; sess_opts.inter_op_num_threads = 1
+            session = _rembg_sessions[model] = rembg.new_session(model, sess_opts=sess_opts)
+        return session
+def rembg_remove_image(data, model, max_side=0):
+    # বড় ছবির ক্ষেত্রে ছোট কপিতে মাস্ক বের করে আসল সাইজে বড় করা হয়; রিটার্ন: PNG bytes
+    session = get_rembg_session(model)
+    with Image.open(io.BytesIO(data)) as src: img = ImageOps.exif_transpose(src); img.load()
+    if max_side and max(img.size) > max_side:
+        small = img.copy(); small.thumbnail((max_side, max_side), Image.LANCZOS)
+        mask = rembg.remove(small, session=session, only_mask=True).resize(img.size, Image.BILINEAR)
+        cutout = img.convert("RGBA"); cutout.putalpha(mask)
+    else: cutout = rembg.remove(img, session=session)
+    out = io.BytesIO(); cutout.save(out, "PNG")
+    return out.getvalue()
+def _rembg_worker_init(models, intra_threads):
+    # ডেডিকেটেড ইনফারেন্স প্রসেস চালু হওয়ার সময় সেশনগুলো আগেই তৈরি করে রাখে
+    global _rembg_intra_threads
+    _rembg_intra_threads = intra_threads
+    for model in models: get_rembg_session(model)
+def _rembg_run(data, model, max_side):
+    # রিটার্ন: (output, error, inference_seconds); এক্সেপশন স্ট্রিং হিসেবে ফেরে যাতে প্রসেস পুলে pickle সমস্যা না হয়
+    started = time.perf_counter()
+    try: return rembg_remove_image(data, model, max_side), None, time.perf_counter() - started
+    except Exception as e: return None, str(e), time.perf_counter() - started
+class BackgroundRemovalEngine:
+    def __init__(self, config):
+        self.config = config; self._executor = None; self._pid = None
+        self._lock = threading.Lock(); self._stats = {}
+    def resolve_model(self, model=None):
+        if model and model in self.config['REMBG_MODELS']: return model
+        return self.config['REMBG_MODEL']
+    def warm_up(self):
+        for model in self.config['REMBG_MODELS']: get_rembg_session(model)
+    def _get_executor(self):
+        # fork-এর পর প্যারেন্টের এক্সিকিউটর (ও তার থ্রেড/প্রসেস) চাইল্ডে কাজ করে না, তাই pid বদলালে নতুন করে তৈরি হয়
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid(): return self._executor
+            workers = self.config['REMBG_WORKERS']
+            if workers > 0:
+                intra_threads = max(1, (os.cpu_count() or 1) // workers)
+                self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_rembg_worker_init, initargs=(self.config['REMBG_MODELS'], intra_threads))
+            else:
+                # একটি থ্রেডেই একটার পর একটা ছবি চলে; onnxruntime নিজেই সব কোর ব্যবহার করে, তাই মেমরি সীমিত থাকে
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rembg")
+            self._pid = os.getpid()
+            return self._executor
+    def _discard(self, executor):
+        # ইনফারেন্স প্রসেস মারা গেলে পুলটি ভাঙা থাকে; ফেলে দিলে পরের _get_executor() নতুন বানায়
+        with self._lock:
+            if self._executor is executor: self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+    def submit(self, data, model=None):
+        # রিটার্ন: একটি Future, যার result() হলো (output, error, inference_seconds)
+        model = self.resolve_model(model)
+        for attempt in range(2):
+            executor = self._get_executor()
+            try: future = executor.submit(_rembg_run, data, model, self.config['REMBG_MAX_SIDE']); break
+            except BrokenProcessPool:
+                self._discard(executor)
+                if attempt: raise
+        future.add_done_callback(partial(self._complete, model, time.perf_counter(), executor))
+        return future
+    def remove(self, data, model=None, timeout=None):
+        # কিউতে অপেক্ষা সহ timeout (ডিফল্ট REMBG_TIMEOUT_SECONDS) পেরোলে TimeoutError; তখনো শুরু না হলে কাজটি বাতিল হয়
+        future = self.submit(data, model)
+        try: output, error, _ = future.result(timeout=self.config['REMBG_TIMEOUT_SECONDS'] if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel(); raise TimeoutError("Background removal timed out")
+        if error is not None: raise RuntimeError(error)
+        return output
+    def _complete(self, model, submitted, executor, future):
+        if future.cancelled(): return self._record(model, time.perf_counter() - submitted, 0.0, False)
+        try: output, error, inference = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool): self._discard(executor)
+            return self._record(model, time.perf_counter() - submitted, 0.0, False)
+        self._record(model, time.perf_counter() - submitted, inference, error is None)
+        if error is None: metrics.observe('stage_seconds', inference, stage='rembg', model=model)
+    def _record(self, model, latency, inference, ok):
+        with self._lock:
+            st = self._stats.setdefault(model, {"requests": 0, "errors": 0, "latency": deque(maxlen=1000), "inference": deque(maxlen=1000)})
+            st["requests"] += 1; st["errors"] += 0 if ok else 1
+            st["latency"].append(latency); st["inference"].append(inference)
+    def stats(self):
+        def pct(values, q): return round(sorted(values)[min(len(values) - 1, int(q * len(values)))] * 1000, 1) if values else None
+        with self._lock:
+            return {model: {"requests": st["requests"], "errors": st["errors"],
+                            "latency_ms": {"p50": pct(st["latency"], 0.5), "p95": pct(st["latency"], 0.95), "max": pct(st["latency"], 1.0)},
+                            "inference_ms": {"p50": pct(st["inference"], 0.5), "p95": pct(st["inference"], 0.95)}}
+                    for model, st in self._stats.items()}
+bg_engine = BackgroundRemovalEngine(app.config)
+if app.config['REMBG_PRELOAD']: bg_engine.warm_up()
+def _submit_bg_remove_job(job_dir, params):
+    # async ব্যাকগ্রাউন্ড রিমুভাল জেনেরিক জব পুলে যায় না: প্রতিটি জব-প্রসেসে আলাদা ONNX সেশন (JOB_WORKERS কপি মডেল) হতো।
+    # এটি bg_engine-এর সীমিত এক্সিকিউটরে চলে (একই ওয়ার্কার সীমা ও stats); রিটার্ন: run_job-এর মতো রেজাল্ট dict দেওয়া Future
+    name, path = _job_input_paths(job_dir, params, "image_file")[0]
+    with open(path, "rb") as fh: data = fh.read()
+    job_future = Future()
+    def done(future):
+        try:
+            output, error, _ = future.result()
+            if error is not None: raise RuntimeError(error)
+            job_future.set_result(_store_job_result(job_dir, io.BytesIO(output), f"bg_removed_{name}.png", "image/png"))
+        except BaseException as e: job_future.set_exception(e)
+    bg_engine.submit(data, params.get("model")).add_done_callback(done)
+    return job_future
+
+JOB_HANDLERS = {"image_studio": _job_image_studio, "convert": _job_convert} # জব পুলের চাইল্ড প্রসেসে চলে
+ENGINE_JOBS = {"bg_remove": _submit_bg_remove_job} # নিজস্ব ইঞ্জিনের এক্সিকিউটরে চলে, প্যারেন্ট প্রসেস থেকে জমা হয়
+def run_job(kind, job_dir, params):
+    # এটি ওয়ার্কার প্রসেসে চলে; এখানে রেকর্ড হওয়া ধাপের টাইমিং চাইল্ডের মেট্রিক্সে হারিয়ে যেত, তাই রেজাল্টের "metrics"-এ
+    # (ব্যর্থ হলে এক্সেপশনের job_metrics অ্যাট্রিবিউটে) ফেরত যায় এবং _finish_job প্যারেন্টে merge করে
+    progress = JobProgress(job_dir); progress(0.0)
+    with metrics.collect() as samples:
+        try: result = JOB_HANDLERS[kind](job_dir, params, progress)
+        except Exception as e: e.job_metrics = samples; raise
+    progress(1.0, "done")
+    return dict(result, metrics=samples)
+
+_job_executor = None
+_job_executor_pid = None
+_job_recovered_pid = None
+_job_executor_lock = threading.Lock()
+def get_job_executor():
+    # pid-aware: fork হওয়া প্রসেসে প্যারেন্টের পুল চলে না, আর ভাঙা পুল discard_job_executor() ফেলে দিলে এখানে নতুন তৈরি হয়
+    # আটকে থাকা জব রিসেট ও কিউ রিকভারি প্রতি প্রসেসে শুধু প্রথম পুল তৈরির সময় একবার
+    global _job_executor, _job_executor_pid, _job_recovered_pid
+    with _job_executor_lock:
+        if _job_executor is None or _job_executor_pid != os.getpid():
+            _job_executor = ProcessPoolExecutor(max_workers=app.config['JOB_WORKERS']); _job_executor_pid = os.getpid()
+        executor = _job_executor
+        recover = _job_recovered_pid != os.getpid(); _job_recovered_pid = os.getpid()
+    if recover:
+        with app.app_context(): reset_stale_jobs()
+        recover_queued_jobs(); user_file_sweeper.start()
+    return executor
+def discard_job_executor(executor):
+    # কোনো জব-চাইল্ড মারা গেলে (যেমন OOM-kill হওয়া rembg বা pdftoppm) পুলটি স্থায়ীভাবে ভাঙা থাকে ও প্রতিটি submit-এ BrokenProcessPool দেয়;
+    # সেটি ফেলে দেওয়া হয়, পরের get_job_executor() নতুন পুল বানায়
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is executor: _job_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+def submit_job(kind, params, uploads, user=None, cache_key=None):
+    # uploads: {role: [FileStorage, ...]} — ফাইলগুলো জব ফোল্ডারে সেভ হয়, বাকি কাজ ওয়ার্কার করে
+    # cache_key দেওয়া থাকলে এবং রেজাল্ট ক্যাশে পাওয়া গেলে জবটি সাথে সাথেই 'done' হয়ে যায়
+    job_id = uuid.uuid4().hex; job_dir = os.path.join(app.config['JOBS_FOLDER'], job_id)
+    os.makedirs(job_dir)
+    user_id = user.id if user and user.is_authenticated else None
+    hit = result_cache.get(cache_key)
+    if hit:
+        result_filename = f"result{os.path.splitext(hit['download_name'])[1] or '.bin'}"
+        shutil.copyfile(hit["path"], os.path.join(job_dir, result_filename))
+        job = Job(id=job_id, kind=kind, status='done', params=json.dumps(dict(params, cache_key=cache_key)), user_id=user_id,
+                  result_filename=result_filename, download_name=hit["download_name"], mimetype=hit["mimetype"], finished_at=datetime.now(timezone.utc))
+        db.session.add(job); db.session.commit()
+        if user_id: save_user_file(user, hit["path"], hit["download_name"], JOB_TOOL_NAMES.get(kind, kind))
+        return job
+    os.makedirs(os.path.join(job_dir, "inputs"))
+    params = dict(params, inputs={}, cache_key=cache_key)
+    for role, storages in uploads.items():
+        for i, storage in enumerate(storages):
+            rel = os.path.join("inputs", f"{role}_{i}_{secure_filename(storage.filename) or 'upload'}")
+            storage.save(os.path.join(job_dir, rel)); params["inputs"].setdefault(role, []).append([storage.filename, rel])
+    job = Job(id=job_id, kind=kind, params=json.dumps(params), user_id=user_id)
+    db.session.add(job); db.session.commit()
+    dispatch_job(job_id)
+    return job
+def dispatch_job(job_id):
+    # queued -> running শর্তসাপেক্ষ আপডেট, যাতে একাধিক gunicorn ওয়ার্কার একই জব দুবার না চালায়
+    claimed = Job.query.filter_by(id=job_id, status='queued').update({'status': 'running'}); db.session.commit()
+    if not claimed: return
+    job = db.session.get(Job, job_id)
+    job_dir = os.path.join(app.config['JOBS_FOLDER'], job_id)
+    JobProgress(job_dir)(0.0, "waiting")
+    # ভাঙা পুলে submit হলে পুল বদলে একবার আবার চেষ্টা; তাও না হলে দাবি করা জবটি failed, যাতে 'running'-এ আটকে না থাকে
+    error = None
+    for _ in range(2):
+        executor = None
+        try:
+            if job.kind in ENGINE_JOBS: future = ENGINE_JOBS[job.kind](job_dir, json.loads(job.params))
+            else: executor = get_job_executor(); future = executor.submit(run_job, job.kind, job_dir, json.loads(job.params))
+        except BrokenProcessPool as e:
+            app.logger.warning("Job pool broken on submit of %s; rebuilding it", job_id)
+            if executor is not None: discard_job_executor(executor)
+            error = e; continue
+        except Exception as e: error = e; break
+        future.add_done_callback(partial(_finish_job, job_id, executor=executor)); return
+    app.logger.error("Could not submit job %s: %s", job_id, error)
+    Job.query.filter_by(id=job_id, status='running').update({'status': 'failed', 'error': f"Could not start the job: {error}"[:500], 'finished_at': datetime.now(timezone.utc)})
+    db.session.commit(); shutil.rmtree(os.path.join(job_dir, "inputs"), ignore_errors=True)
+def recover_queued_jobs():
+    # প্রসেস রিস্টার্টের আগে কিউতে থাকা জবগুলো আবার চালু করুন
+    with app.app_context():
+        for (job_id,) in db.session.query(Job.id).filter_by(status='queued').all(): dispatch_job(job_id)
+def _finish_job(job_id, future, executor=None):
+    # প্যারেন্ট প্রসেসে (executor-এর থ্রেডে) চলে, তাই আলাদা app context লাগে
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        if job is None: return
+        job_dir = os.path.join(app.config['JOBS_FOLDER'], job_id)
+        try: result = future.result(); metrics.merge(result.pop("metrics", ()))
+        except BrokenProcessPool:
+            # চাইল্ড প্রসেস মারা গেছে: পুলটি বদলে ফেলা হয়, যাতে পরের জবগুলো নতুন পুলে চলে
+            if executor is not None: discard_job_executor(executor)
+            job.status = 'failed'; job.error = 'The worker process stopped unexpectedly (out of memory?).'; result = None
+            app.logger.warning("Job %s (%s) lost its worker process", job_id, job.kind)
+        except Exception as e:
+            job.status = 'failed'; job.error = str(e)[:500]; result = None; metrics.merge(getattr(e, 'job_metrics', ()))
+            print(f"Job {job_id} ({job.kind}) failed: {e}")
+        else:
+            job.status = 'done'; job.result_filename = result["result_filename"]
+            job.download_name = result["download_name"]; job.mimetype = result["mimetype"]
+            if result.get("errors"): job.warnings = json.dumps(result["errors"])
+        job.finished_at = datetime.now(timezone.utc); db.session.commit()
+        shutil.rmtree(os.path.join(job_dir, "inputs"), ignore_errors=True)
+        if result: result_cache.put(json.loads(job.params).get("cache_key"), os.path.join(job_dir, job.result_filename), job.download_name, job.mimetype)
+        if result and job.user_id:
+            save_user_file(db.session.get(User, job.user_id), os.path.join(job_dir, job.result_filename), job.download_name, JOB_TOOL_NAMES.get(job.kind, job.kind))
+def _job_owner_alive(info):
+    # একই হোস্টে হলে pid দিয়ে সরাসরি দেখা যায়; অন্য হোস্টের প্রসেস সম্পর্কে কিছু জানা নেই, তাই তখন শুধু বয়স দেখা হয়
+    if not info or info.get("host") != socket.gethostname() or not info.get("pid"): return None
+    try: os.kill(info["pid"], 0)
+    except ProcessLookupError: return False
+    except OSError: pass
+    return True
+def reset_stale_jobs():
+    # প্রসেস ক্র্যাশ/রিস্টার্টে 'running' জবের callback আর কখনো আসে না। মালিক প্রসেস মৃত হলে, অথবা
+    # JOB_STALE_SECONDS ধরে progress.json না বদলালে জবটি failed হয় (আবার কিউতে দিলে একই ক্র্যাশ বারবার হতে পারে)
+    now = time.time(); stale = []
+    for job_id, created_at in db.session.query(Job.id, Job.created_at).filter_by(status='running').all():
+        job_dir = os.path.join(app.config['JOBS_FOLDER'], job_id)
+        try: last_seen = os.path.getmtime(os.path.join(job_dir, "progress.json"))
+        except OSError: last_seen = _as_utc(created_at).timestamp()
+        alive = _job_owner_alive(read_job_progress(job_dir))
+        if alive is False or (now - last_seen > app.config['JOB_STALE_SECONDS']): stale.append(job_id)
+    if not stale: return 0
+    reset = (Job.query.filter(Job.id.in_(stale), Job.status == 'running')
+             .update({'status': 'failed', 'error': 'Interrupted: the worker stopped before the job finished.', 'finished_at': datetime.now(timezone.utc)},
+                     synchronize_session=False))
+    db.session.commit()
+    for job_id in stale: shutil.rmtree(os.path.join(app.config['JOBS_FOLDER'], job_id, "inputs"), ignore_errors=True)
+    return reset
+def expire_jobs(batch=200):
+    # JOB_RETENTION_HOURS-এর বেশি আগে শেষ হওয়া (done/failed) জবের রো ও ফোল্ডার মুছে ফেলে; রিটার্ন: কতগুলো মোছা হলো
+    hours = app.config['JOB_RETENTION_HOURS']
+    if not hours: return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours); removed = 0
+    while True:
+        ids = [i for (i,) in db.session.query(Job.id).filter(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff).limit(batch)]
+        if not ids: return removed
+        Job.query.filter(Job.id.in_(ids)).delete(synchronize_session=False); db.session.commit(); removed += len(ids)
+        # রো আগে মোছা হয়, যাতে মাঝপথে থামলেও কোনো রো এমন ফোল্ডারের দিকে না দেখায় যা আর নেই
+        for job_id in ids: shutil.rmtree(os.path.join(app.config['JOBS_FOLDER'], job_id), ignore_errors=True)
+def wants_async():
+    return (request.values.get("async") or "").lower() in ("1", "true", "on", "yes")
+def job_accepted_response(job):
+    return jsonify({'job_id': job.id, 'status': job.status, 'status_url': url_for('job_status', job_id=job.id), 'result_url': url_for('job_result', job_id=job.id)}), 202
+
+# --- নতুন সংযোজন: QR কোড ইঞ্জিন ---
+QR_ERROR_LEVELS = ("L", "M", "Q", "H") # qrcode.constants.ERROR_CORRECT_<level>, রেন্ডারের সময় দেখা হয় যাতে qrcode আগেভাগে লোড না হয়
+QR_MIMETYPES = {"png": "image/png", "svg": "image/svg+xml"}
+def parse_qr_options(values):
+    # ফর্ম/কোয়েরি থেকে (size, ec, fmt); ভুল মান হলে ডিফল্টে ফিরে যায়
+    try: size = max(50, min(int(values.get("size") or app.config['QR_DEFAULT_SIZE']), app.config['QR_MAX_SIZE']))
+    except ValueError: size = app.config['QR_DEFAULT_SIZE']
+    ec = (values.get("ec") or "M").upper(); fmt = (values.get("format") or "png").lower()
+    return size, ec if ec in QR_ERROR_LEVELS else "M", fmt if fmt in QR_MIMETYPES else "png"
+def _qr_matrix(payload, ec):
+    qr = qrcode.QRCode(error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{ec}"), border=4)
+    qr.add_data(payload); qr.make(fit=True)
+    return qr.get_matrix() # বর্ডারসহ True/False এর গ্রিড
+def _qr_svg_path(matrix, scale, ox=0, oy=0):
+    # প্রতিটি সারির টানা কালো মডিউলগুলো একটি করে আয়তক্ষেত্র — আলাদা আলাদা <rect> এর চেয়ে অনেক ছোট SVG
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0; n = len(row)
+        while x < n:
+            if not row[x]: x += 1; continue
+            start = x
+            while x < n and row[x]: x += 1
+            parts.append(f"M{ox + start * scale:g} {oy + y * scale:g}h{(x - start) * scale:g}v{scale:g}h-{(x - start) * scale:g}z")
+    return "".join(parts)
+def render_qr(payload, size, ec, fmt):
+    matrix = _qr_matrix(payload, ec); n = len(matrix)
+    if fmt == "svg":
+        scale = size / n
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+                f'<rect width="100%" height="100%" fill="#fff"/><path fill="#000" d="{_qr_svg_path(matrix, scale)}"/></svg>').encode()
+    # box_size = size // n: প্রতিটি মডিউল ঠিক box×box পিক্সেল (পূর্ণসংখ্যা গুণে NEAREST হুবহু), বাকি জায়গা সাদা প্যাডিং;
+    # কোড size এর চেয়ে বড় হলে (অনেক বড় payload) প্রতি মডিউলে ১ পিক্সেল রেখে ছবিটাই বড় হয়। 1-bit PNG খুব ছোট ও দ্রুত এনকোড হয়
+    box = max(1, size // n); side = max(size, n * box); offset = (side - n * box) // 2
+    img = Image.new("1", (n, n), 1); img.putdata([0 if cell else 1 for row in matrix for cell in row])
+    canvas = Image.new("1", (side, side), 1); canvas.paste(img.resize((n * box, n * box), Image.NEAREST), (offset, offset))
+    out = io.BytesIO(); canvas.save(out, format="PNG"); return out.getvalue()
+class QRCodeEngine:
+    # (payload, size, ec, fmt) -> bytes এর থ্রেড-সেফ LRU; digest দিয়ে হ্যাশড URL তৈরি হয়, যা কখনো বদলায় না।
+    # disk (ResultCache) হলো সব ওয়ার্কারের শেয়ার করা দ্বিতীয় স্তর — URL এ শুধু digest থাকে, payload নয়
+    def __init__(self, config, disk):
+        self.config = config; self.disk = disk; self._lock = threading.Lock(); self._cache = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0}
+    @staticmethod
+    def digest(payload, size, ec, fmt):
+        return hashlib.sha256(json.dumps([payload, size, ec, fmt], separators=(",", ":")).encode()).hexdigest()[:32]
+    def _remember(self, key, data):
+        with self._lock:
+            self._cache[key] = data; self._cache.move_to_end(key)
+            while len(self._cache) > self.config['QR_CACHE_ENTRIES']: self._cache.popitem(last=False)
+    def get(self, payload, size, ec, fmt, cache=True):
+        key = self.digest(payload, size, ec, fmt)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None: self._cache.move_to_end(key); self.counters["hits"] += 1
+            else: self.counters["misses"] += 1
+        if data is None:
+            data = render_qr(payload, size, ec, fmt)
+            if cache: self._remember(key, data)
+        # ডিস্কে না থাকলে (বা evict হয়ে গেলে) আবার লেখা হয়, যাতে ফেরত দেওয়া URL অন্য ওয়ার্কারেও মেলে
+        if cache and self.disk.get(key) is None: self.disk.put(key, data, f"my_qr_code.{fmt}", QR_MIMETYPES[fmt])
+        return key, data
+    def peek(self, key, fmt):
+        # digest -> bytes: আগে LRU, তারপর ডিস্ক; কোনোটিতে না থাকলে None
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                # digest এ fmt ধরা আছে; ভুল এক্সটেনশন (.svg দিয়ে PNG চাওয়া) হলে মিস
+                if data.startswith(b"<svg") != (fmt == "svg"): return None
+                self._cache.move_to_end(key); self.counters["hits"] += 1; return data
+        hit = self.disk.get(key)
+        if hit is None or hit["mimetype"] != QR_MIMETYPES[fmt]: return None
+        try:
+            with open(hit["path"], "rb") as fh: data = fh.read()
+        except OSError: return None
+        self._remember(key, data); return data
+    def stats(self):
+        with self._lock: return dict(self.counters, entries=len(self._cache), max_entries=self.config['QR_CACHE_ENTRIES'])
+qr_disk_cache = ResultCache(app.config, 'QR_DISK_CACHE')
+qr_engine = QRCodeEngine(app.config, qr_disk_cache)
+def qr_url(payload, size, ec, fmt):
+    # URL এ শুধু আগেই হিসাব করা digest — payload (যা লম্বা বা ব্যক্তিগত হতে পারে) লগ/রেফারারে যায় না
+    key, _ = qr_engine.get(payload, size, ec, fmt)
+    return url_for('qr_image', digest=key, fmt=fmt)
+def read_qr_csv(storage, limit):
+    # প্রথম কলাম = QR এর কন্টেন্ট, দ্বিতীয় (ঐচ্ছিক) = ফাইলের নাম/লেবেল; খালি সারি বাদ
+    rows = []
+    for row in csv.reader(io.TextIOWrapper(storage.stream, encoding="utf-8-sig", errors="replace")):
+        if not row or not row[0].strip(): continue
+        if len(rows) >= limit: raise ValueError(f"CSV has more than {limit} rows.")
+        rows.append((row[0].strip(), (row[1].strip() if len(row) > 1 else "")))
+    return rows
+def qr_bulk_zip_entries(rows, size, ec, fmt):
+    # বাল্ক কোড LRU-তে রাখা হয় না, যাতে হাজারো এককালীন কোড সাধারণ ট্রাফিকের ক্যাশ সরিয়ে না দেয়
+    used = set()
+    for i, (payload, label) in enumerate(rows, start=1):
+        name = secure_filename(label) or f"qr_{i:05d}"
+        if name in used: name = f"{name}_{i}"
+        used.add(name)
+        yield f"{name}.{fmt}", qr_engine.get(payload, size, ec, fmt, cache=False)[1]
+def qr_svg_sheet(rows, size, ec, columns=6, gap=24, label_height=18):
+    # সব কোড একটি SVG পাতায় গ্রিড আকারে; সারি ধরে ধরে stream হয়
+    cell_w = size + gap; cell_h = size + label_height + gap
+    total_rows = (len(rows) + columns - 1) // columns
+    width = columns * cell_w + gap; height = total_rows * cell_h + gap
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" shape-rendering="crispEdges">'
+           f'<rect width="100%" height="100%" fill="#fff"/>').encode()
+    for i, (payload, label) in enumerate(rows):
+        ox = gap + (i % columns) * cell_w; oy = gap + (i // columns) * cell_h
+        matrix = _qr_matrix(payload, ec); scale = size / len(matrix)
+        piece = f'<path fill="#000" d="{_qr_svg_path(matrix, scale, ox, oy)}"/>'
+        piece += f'<text x="{ox + size / 2:g}" y="{oy + size + label_height - 4:g}" font-family="sans-serif" font-size="12" text-anchor="middle">{escape((label or payload)[:40])}</text>'
+        yield piece.encode()
+    yield b"</svg>"
+
+# --- নতুন সংযোজন: Slug হেল্পার ---
+@lru_cache(maxsize=65536)
+def make_slug(text, separator='-', lowercase=True, remove_numbers=False):
+    # একই টাইটেল/অপশনের জন্য slugify আবার চলে না (CMS ইমপোর্টে একই টাইটেল বারবার আসে)
+    final_slug = slugify(text, separator=separator, lowercase=lowercase)
+    if remove_numbers:
+        final_slug = "".join(c for c in final_slug if not c.isdigit()); final_slug = final_slug.replace(separator * 2, separator)
+    return final_slug
+def unique_slugs(slugs, taken=None):
+    # Post টেবিলে আগে থেকে থাকা বা এই ব্যাচেই আগে আসা slug-এ create_post-এর মতো একটি ছোট ইউনিক আইডি যোগ হয়
+    # প্রতিটি আইটেমের জন্য আলাদা কোয়েরি নয় — প্রতি SLUG_QUERY_CHUNK টিতে একটি IN (...) কোয়েরি
+    # taken: স্ট্রিমিং রিকোয়েস্টে আগের চাংকগুলোর slug, যাতে পুরো স্ট্রিম জুড়ে ইউনিক থাকে
+    taken = set() if taken is None else taken; chunk = app.config['SLUG_QUERY_CHUNK']
+    wanted = list(dict.fromkeys(s for s in slugs if s and s not in taken))
+    for i in range(0, len(wanted), chunk):
+        taken.update(slug for (slug,) in db.session.query(Post.slug).filter(Post.slug.in_(wanted[i:i + chunk])))
+    result = []
+    for slug in slugs:
+        if slug and slug in taken: slug = f"{slug}-{uuid.uuid4().hex[:6]}"
+        taken.add(slug); result.append(slug)
+    return result
+def slug_separator(value):
+    # ছোট একটি স্ট্রিং হতে হবে (JSON এ লিস্ট/অবজেক্ট এলে make_slug-এর lru_cache-ও ভেঙে যেত); ভুল হলে ValueError -> 400
+    if value is None or value == '': return '-'
+    if not isinstance(value, str) or len(value) > app.config['SLUG_SEPARATOR_MAX_LENGTH']:
+        raise ValueError(f"separator must be a string of at most {app.config['SLUG_SEPARATOR_MAX_LENGTH']} characters.")
+    return value
+def slug_options(values):
+    def flag(name, default):
+        value = values.get(name, default)
+        return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "on", "yes")
+    return {"separator": slug_separator(values.get('separator')), "lowercase": flag('lowercase', True), "remove_numbers": flag('remove_numbers', False)}, flag('unique', True)
+def _ndjson_text(line):
+    # NDJSON এর প্রতিটি লাইন একটি JSON মান: {"text": "..."} অবজেক্ট বা সরাসরি স্ট্রিং
+    item = json.loads(line)
+    text = item.get('text') if isinstance(item, dict) else item
+    if not isinstance(text, str): raise ValueError("each line must be a JSON string or an object with a 'text' string")
+    return text
+
+# --- নতুন সংযোজন: রেন্ডার করা পেজের ক্যাশ ---
+class PageCache:
+    # (namespace, path+query, vary) -> রেন্ডার করা HTML (শুধু লগআউট অবস্থার পেজ); namespace-এর generation বদলালে পুরনো এন্ট্রি বাতিল
+    def __init__(self, config):
+        self.config = config; self._lock = threading.Lock(); self._entries = OrderedDict(); self._generations = {}
+        self.counters = {"hits": 0, "misses": 0, "not_modified": 0}
+    def _gen_path(self, ns): return os.path.join(self.config['PAGE_CACHE_FOLDER'], f"{ns}.gen")
+    def generation(self, ns):
+        # generation ফাইলটি প্রতি PAGE_CACHE_CHECK_SECONDS-এ একবার পড়া হয়, প্রতিটি রিকোয়েস্টে নয়
+        now = time.monotonic(); cached = self._generations.get(ns)
+        if cached and now - cached[1] < self.config['PAGE_CACHE_CHECK_SECONDS']: return cached[0]
+        try:
+            with open(self._gen_path(ns)) as fh: gen = fh.read().strip()
+        except OSError: gen = "0"
+        self._generations[ns] = (gen, now); return gen
+    def bump(self, ns):
+        # কন্টেন্ট বদলালে ডাকুন; এই প্রসেসে সাথে সাথে, অন্য প্রসেসে পরের চেকে কার্যকর হয়
+        gen = uuid.uuid4().hex; tmp_path = f"{self._gen_path(ns)}.{gen}.tmp"
+        with open(tmp_path, "w") as fh: fh.write(gen)
+        os.replace(tmp_path, self._gen_path(ns)); self._generations[ns] = (gen, time.monotonic())
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == ns]: del self._entries[key]
+    def get(self, key, gen):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["generation"] != gen: self.counters["misses"] += 1; return None
+            self._entries.move_to_end(key); self.counters["hits"] += 1; return entry
+    def put(self, key, gen, body, last_modified):
+        # কমপ্রেশন এন্ট্রি তৈরির সময় একবারই হয়; প্রতিটি হিটে শুধু ঠিক বডিটি বেছে নেওয়া হয়
+        encoded = {}
+        if len(body) >= self.config['PAGE_CACHE_COMPRESS_MIN']:
+            encoded["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli: encoded["br"] = brotli.compress(body, quality=11)
+        entry = {"body": body, "encoded": encoded, "etag": hashlib.sha1(body).hexdigest(), "last_modified": last_modified, "generation": gen}
+        with self._lock:
+            self._entries[key] = entry; self._entries.move_to_end(key)
+            while len(self._entries) > self.config['PAGE_CACHE_ENTRIES']: self._entries.popitem(last=False)
+        return entry
+    def stats(self):
+        with self._lock: return dict(self.counters, entries=len(self._entries), max_entries=self.config['PAGE_CACHE_ENTRIES'])
+page_cache = PageCache(app.config)
+def cached_page(ns, render, vary=()):
+    # render() -> (html, last_modified); লগইন করা ইউজারের পেজে নাম ইত্যাদি থাকতে পারে (যেমন tools.html-এর "Welcome, ..."),
+    # আর ফ্ল্যাশ মেসেজ থাকলে পেজটি ইউজার-নির্দিষ্ট — এ দুই ক্ষেত্রে ক্যাশ হয় না, প্রতিবার রেন্ডার হয়
+    # vary: টেমপ্লেটের আউটপুট বদলায় এমন বাড়তি ইনপুট (যেমন Stripe কী)
+    if not app.config['PAGE_CACHE_ENABLED'] or current_user.is_authenticated or session.get('_flashes'):
+        html, last_modified = render(); entry = {"body": html.encode(), "encoded": {}, "etag": None, "last_modified": last_modified}
+    else:
+        # generation রেন্ডারের আগে পড়া হয়, যাতে রেন্ডারের মাঝে invalidation হলে পুরনো পেজ নতুন হিসেবে সেভ না হয়
+        key = (ns, request.full_path, tuple(vary)); gen = page_cache.generation(ns)
+        entry = page_cache.get(key, gen)
+        if entry is None:
+            html, last_modified = render(); entry = page_cache.put(key, gen, html.encode(), last_modified)
+    encoding = next((e for e in ("br", "gzip") if e in entry["encoded"] and request.accept_encodings[e]), None)
+    response = Response(entry["encoded"][encoding] if encoding else entry["body"], mimetype='text/html')
+    if encoding: response.headers['Content-Encoding'] = encoding
+    if entry["encoded"]: response.vary.add('Accept-Encoding')
+    # আলাদা এনকোডিং = আলাদা রিপ্রেজেন্টেশন, তাই ETag-ও আলাদা
+    if entry["etag"]: response.set_etag(f'{entry["etag"]}-{encoding}' if encoding else entry["etag"])
+    if entry["last_modified"]: response.last_modified = entry["last_modified"]
+    # ব্রাউজার/প্রক্সি রাখতে পারে, তবে প্রতিবার যাচাই করে নেবে (নতুন পোস্ট সাথে সাথে দেখা যায়)
+    response.headers['Cache-Control'] = 'private, no-cache' if current_user.is_authenticated else 'public, no-cache'
+    response.vary.add('Cookie')
+    response.make_conditional(request)
+    if response.status_code == 304: page_cache.counters["not_modified"] += 1
+    return response
+def render_cached(template, vary=(), **context):
+    # স্ট্যাটিক/মার্কেটিং ও টুলের ল্যান্ডিং পেজ: লগআউট অবস্থায় আউটপুট শুধু vary-র ওপর নির্ভর করে, তাই হিটে Jinja চলে না
+    return cached_page('pages', lambda: (render_template(template, **context), None), vary)
+def _as_utc(value):
+    # SQLite থেকে naive datetime আসে; Last-Modified হেডারের জন্য UTC ধরে নেওয়া হয়
+    return value.replace(tzinfo=timezone.utc) if value and value.tzinfo is None else value
+
+# --- নতুন সংযোজন: হ্যাশড স্ট্যাটিক অ্যাসেট পাইপলাইন ---
+ASSET_IMAGE_EXT = {'.png', '.jpg', '.jpeg'}
+ASSET_COMPRESSIBLE_EXT = {'.css', '.js', '.svg', '.json', '.txt', '.xml', '.ico'}
+ASSET_IMAGE_VARIANTS = (('avif', 'image/avif', {'quality': 60, 'speed': 8}), ('webp', 'image/webp', {'quality': 82, 'method': 4}))
+class AssetManifest:
+    # static/ এর প্রতিটি ফাইল -> কন্টেন্ট হ্যাশসহ নাম (main_logo.<hash>.png); কপি, AVIF/WebP ও .gz ভ্যারিয়েন্ট ASSET_BUILD_FOLDER এ থাকে
+    # বিল্ড হয় শুধু ডিপ্লয়ের সময় (`flask assets build`); চালু অ্যাপ কেবল manifest.json পড়ে, static/ হ্যাশ বা এনকোড করে না
+    def __init__(self, config):
+        self.config = config; self.entries = {}; self.by_hashed = {}
+    @property
+    def folder(self): return self.config['ASSET_BUILD_FOLDER']
+    def _write(self, name, write):
+        # টেম্প ফাইলে লিখে os.replace, যাতে একাধিক ওয়ার্কার একসাথে বিল্ড করলেও অর্ধেক লেখা ফাইল সার্ভ না হয়
+        target = os.path.join(self.folder, name)
+        if os.path.exists(target): return True
+        os.makedirs(os.path.dirname(target), exist_ok=True); tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        try: write(tmp_path); os.replace(tmp_path, target); return True
+        except Exception as e:
+            print(f"Asset build failed for {name}: {e}")
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            return False
+    def _build_one(self, rel, path):
+        stem, ext = os.path.splitext(rel); ext = ext.lower()
+        hashed = f"{stem}.{file_digest(path)[:12]}{ext}"
+        if not self._write(hashed, lambda tmp: shutil.copyfile(path, tmp)): return None
+        entry = {"hashed": hashed, "size": os.path.getsize(path), "variants": {}, "gzip": None}
+        if ext in ASSET_COMPRESSIBLE_EXT:
+            name = f"{hashed}.gz"
+            def compress(tmp):
+                with open(path, "rb") as src, gzip.GzipFile(tmp, "wb", compresslevel=9, mtime=0) as dest: shutil.copyfileobj(src, dest)
+            if self._write(name, compress): entry["gzip"] = name
+        return entry
+    def _build_variants(self, entries):
+        for rel, entry in entries.items():
+            if os.path.splitext(rel)[1].lower() not in ASSET_IMAGE_EXT: continue
+            source = os.path.join(self.folder, entry["hashed"])
+            for fmt, mimetype, save_args in ASSET_IMAGE_VARIANTS:
+                name = f"{entry['hashed']}.{fmt}"
+                def encode(tmp, fmt=fmt, save_args=save_args):
+                    with Image.open(source) as img: img.save(tmp, format=fmt.upper(), **save_args)
+                # মূল ফাইলের চেয়ে ছোট হলেই ভ্যারিয়েন্টটি ব্যবহার হয়
+                if self._write(name, encode) and os.path.getsize(os.path.join(self.folder, name)) < entry["size"]: entry["variants"][mimetype] = name
+    def _write_manifest(self, entries):
+        manifest_path = os.path.join(self.folder, "manifest.json"); tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as fh: json.dump(entries, fh, indent=1, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    def build(self):
+        # হ্যাশড ফাইল আগে থেকে থাকলে আর কপি/এনকোড হয় না, তাই পুনরায় বিল্ডে শুধু হ্যাশিংয়ের খরচ
+        started = time.perf_counter(); entries = {}; os.makedirs(self.folder, exist_ok=True)
+        for root, dirs, files in os.walk(STATIC_FOLDER):
+            # ইউজারের আপলোড/আউটপুট ফোল্ডার অ্যাসেট নয়
+            dirs[:] = [d for d in dirs if d not in self.config['ASSET_SKIP_DIRS'] and not d.startswith('.')]
+            for name in files:
+                if name.startswith('.'): continue
+                path = os.path.join(root, name); rel = os.path.relpath(path, STATIC_FOLDER).replace(os.sep, '/')
+                entry = self._build_one(rel, path)
+                if entry: entries[rel] = entry
+        self._build_variants(entries); self._write_manifest(entries)
+        self.entries = entries; self.by_hashed = {e["hashed"]: e for e in entries.values()}
+        print(f"Asset manifest: {len(entries)} files in {time.perf_counter() - started:.2f}s")
+        return entries
+    def load(self):
+        # ম্যানিফেস্ট না থাকলে (বিল্ড চালানো হয়নি) সাধারণ static URL-এ ফিরে যায়
+        try:
+            with open(os.path.join(self.folder, "manifest.json")) as fh: entries = json.load(fh)
+        except FileNotFoundError:
+            print("Asset manifest not found; serving plain static URLs (run `flask assets build`)"); entries = {}
+        self.entries = entries; self.by_hashed = {e["hashed"]: e for e in entries.values()}
+        return entries
+    def url(self, filename):
+        entry = self.entries.get(filename)
+        if not entry: return url_for('static', filename=filename) # ম্যানিফেস্টে নেই (বা পাইপলাইন বন্ধ) হলে সাধারণ static URL
+        return url_for('hashed_asset', filename=entry["hashed"])
+asset_manifest = AssetManifest(app.config)
+app.jinja_env.globals['asset_url'] = asset_manifest.url
+if app.config['ASSET_PIPELINE_ENABLED']:
+    try: asset_manifest.load()
+    except (OSError, ValueError) as e: print(f"Asset manifest unreadable, falling back to plain static URLs: {e}")
+
+@app.cli.group('assets')
+def assets_cli():
+    """হ্যাশড স্ট্যাটিক অ্যাসেট (ডিপ্লয়ের ধাপ)।"""
+@assets_cli.command('build')
+def build_assets_command():
+    """static/ ফোল্ডারের হ্যাশড অ্যাসেট, ভ্যারিয়েন্ট ও manifest.json তৈরি করে; ডিপ্লয়ের সময় অ্যাপ চালুর আগে চালাতে হবে।"""
+    asset_manifest.build()
+
+# --- নতুন সংযোজন: Stripe ওয়েবহুক ইভেন্ট প্রসেসিং ---
+# রিকোয়েস্ট শুধু ইভেন্টটি StripeEvent টেবিলে সেভ করে 200 দেয়; স্ট্যাটাস বদলানোর কাজ এই ব্যাকগ্রাউন্ড ওয়ার্কার ব্যাচে করে
+STRIPE_STATUS_EVENTS = {'checkout.session.completed', 'customer.subscription.created', 'customer.subscription.updated', 'customer.subscription.deleted'}
+def stripe_event_status(event_type, obj):
+    # ইভেন্ট থেকে ইউজারের নতুন subscription_status; সংশ্লিষ্ট না হলে None
+    if event_type == 'checkout.session.completed': return 'active'
+    if event_type == 'customer.subscription.deleted': return 'inactive'
+    if event_type in ('customer.subscription.created', 'customer.subscription.updated'): return obj.get('status')
+    return None
+def ingest_stripe_event(event):
+    # event: পার্স করা JSON dict; একই event id দ্বিতীয়বার এলে (Stripe রিট্রাই) কিছুই হয় না। রিটার্ন: নতুন হলে True
+    obj = (event.get('data') or {}).get('object') or {}
+    row = StripeEvent(event_id=event['id'], type=event.get('type', ''), customer_id=obj.get('customer'), payload=json.dumps(event),
+                      event_created=event.get('created'), status='pending' if event.get('type') in STRIPE_STATUS_EVENTS else 'ignored')
+    db.session.add(row)
+    try: db.session.commit()
+    except IntegrityError:
+        db.session.rollback(); return False
+    if row.status == 'pending': stripe_event_worker.wake()
+    return True
+def apply_stripe_events(worker_id=None):
+    # pending ইভেন্টের একটি ব্যাচ দাবি করে প্রয়োগ করে; কতগুলো প্রসেস হলো তা রিটার্ন করে
+    # দাবি করা একটি শর্তসাপেক্ষ UPDATE, তাই একাধিক ওয়ার্কার প্রসেস একই ইভেন্ট দুবার নেয় না
+    worker_id = worker_id or uuid.uuid4().hex
+    ids = [i for (i,) in db.session.query(StripeEvent.id).filter_by(status='pending').order_by(StripeEvent.id).limit(app.config['STRIPE_EVENT_BATCH_SIZE'])]
+    if not ids: return 0
+    StripeEvent.query.filter(StripeEvent.id.in_(ids), StripeEvent.status == 'pending').update(
+        {'status': 'processing', 'claimed_by': worker_id, 'claimed_at': datetime.now(timezone.utc)}, synchronize_session=False)
+    db.session.commit()
+    events = StripeEvent.query.filter_by(status='processing', claimed_by=worker_id).all()
+    # একই কাস্টমারের একাধিক ইভেন্ট থাকলে Stripe-এর created সময় অনুযায়ী সর্বশেষটিই টেকে; বাকিগুলো superseded
+    latest = {}; competing = set()
+    for ev in sorted(events, key=lambda e: (e.event_created or 0, e.id)):
+        status = stripe_event_status(ev.type, (json.loads(ev.payload).get('data') or {}).get('object') or {})
+        if ev.customer_id and status: latest[ev.customer_id] = (ev.event_created or 0, status, ev.id); competing.add(ev.id)
+    users = {}; applied_at = {}
+    if latest:
+        users = {u.stripe_customer_id: u for u in User.query.filter(User.stripe_customer_id.in_(list(latest)))}
+        # আগের কোনো ব্যাচে এর চেয়ে নতুন ইভেন্ট প্রয়োগ হয়ে থাকলে (Stripe ক্রম নিশ্চিত করে না) পুরনোটি বাদ
+        applied_at = dict(db.session.query(StripeEvent.customer_id, func.max(StripeEvent.event_created))
+                          .filter(StripeEvent.customer_id.in_(list(latest)), StripeEvent.status == 'applied').group_by(StripeEvent.customer_id))
+    now = datetime.now(timezone.utc)
+    for customer_id, (created, status, _) in latest.items():
+        user = users.get(customer_id)
+        if user and created >= (applied_at.get(customer_id) or 0) and user.subscription_status != status:
+            user.subscription_status = status; print(f"User {user.email} status updated to {status}.")
+    for ev in events:
+        if ev.customer_id not in users: ev.status = 'unmatched'
+        elif (ev.event_created or 0) < (applied_at.get(ev.customer_id) or 0): ev.status = 'superseded'
+        elif ev.id in competing and latest[ev.customer_id][2] != ev.id: ev.status = 'superseded' # একই ব্যাচে একই কাস্টমারের নতুনতর ইভেন্ট আছে
+        else: ev.status = 'applied'
+        ev.processed_at = now
+    # ইউজার ক্যাশ session-এর commit হুকেই বাতিল হয়
+    db.session.commit()
+    return len(events)
+class StripeEventWorker:
+    def __init__(self, config):
+        self.config = config; self._wake = threading.Event(); self._thread = None; self._lock = threading.Lock(); self._pid = None
+    def start(self):
+        # fork হওয়া প্রসেসে থ্রেড উত্তরাধিকারসূত্রে আসে না, তাই pid দেখে আবার চালু করা হয়
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid(): return
+            self._pid = os.getpid(); self._thread = threading.Thread(target=self._run, daemon=True, name="stripe-events"); self._thread.start()
+    def wake(self):
+        self.start(); self._wake.set()
+    def _run(self):
+        worker_id = uuid.uuid4().hex
+        with app.app_context():
+            # আগের প্রসেস ক্র্যাশ করলে 'processing'-এ আটকে থাকা ইভেন্টগুলো আবার কিউতে
+            stale = datetime.now(timezone.utc) - timedelta(seconds=self.config['STRIPE_EVENT_STALE_SECONDS'])
+            StripeEvent.query.filter(StripeEvent.status == 'processing', StripeEvent.claimed_at < stale).update({'status': 'pending', 'claimed_by': None}, synchronize_session=False)
+            db.session.commit()
+        while True:
+            self._wake.wait(self.config['STRIPE_EVENT_POLL_SECONDS']); self._wake.clear()
+            # একটু অপেক্ষা করে বার্স্টের ইভেন্টগুলো একই ব্যাচে জমতে দেওয়া হয়
+            time.sleep(self.config['STRIPE_EVENT_BATCH_WINDOW_MS'] / 1000)
+            with app.app_context():
+                try:
+                    while apply_stripe_events(worker_id): pass
+                except Exception as e:
+                    db.session.rollback(); print(f"Stripe event worker error: {e}")
+                finally: db.session.remove()
+stripe_event_worker = StripeEventWorker(app.config)
+
+@app.cli.command('stripe-replay')
+@click.argument('paths', nargs=-1, type=click.Path(exists=True))
+def stripe_replay_command(paths):
+    """রেকর্ড করা Stripe ইভেন্ট (JSON ফাইল বা ফোল্ডার) নেটওয়ার্ক ছাড়াই ইনটেক ও ওয়ার্কারের মধ্য দিয়ে চালায়।"""
+    files = []
+    for path in paths or [os.path.join(BASE_DIR, 'fixtures', 'stripe')]:
+        files += sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.json')) if os.path.isdir(path) else [path]
+    for path in files:
+        with open(path) as fh: event = json.load(fh)
+        print(f"{os.path.basename(path)}: {event['type']} {'stored' if ingest_stripe_event(event) else 'duplicate'}")
+    processed = 0
+    while True:
+        n = apply_stripe_events()
+        if not n: break
+        processed += n
+    print(f"Applied {processed} events.")
+
+# --- নতুন সংযোজন: বিলিং ক্লায়েন্ট ও ব্যাকগ্রাউন্ডে Stripe কাস্টমার তৈরি ---
+class StripeBillingClient:
+    # আসল Stripe API; প্রতিটি কলের টাইমআউট STRIPE_TIMEOUT_SECONDS, রিট্রাই CustomerProvisioner নিজে করে
+    def __init__(self, config): self.config = config; self._configured = False
+    def _api(self):
+        # stripe মডিউল প্রথম কলেই লোড ও কনফিগার হয়, অ্যাপ চালু হওয়ার সময় নয়
+        if not self._configured:
+            stripe.api_key = self.config['STRIPE_SECRET_KEY']
+            stripe.default_http_client = stripe.RequestsClient(timeout=self.config['STRIPE_TIMEOUT_SECONDS']); stripe.max_network_retries = 0
+            self._configured = True
+        return stripe
+    def create_customer(self, email, name, idempotency_key=None):
+        # একই idempotency key দিয়ে রিট্রাই করলে Stripe দ্বিতীয় কাস্টমার তৈরি করে না
+        return self._api().Customer.create(email=email, name=name, idempotency_key=idempotency_key).id
+    def create_checkout_session(self, **params): return self._api().checkout.Session.create(**params)
+    def create_portal_session(self, **params): return self._api().billing_portal.Session.create(**params)
+class StubBillingClient:
+    # নেটওয়ার্ক ছাড়া লোকাল স্টাব (লোড টেস্ট/ডেভেলপমেন্ট); BILLING_STUB_LATENCY_MS ও BILLING_STUB_FAILURE_RATE দিয়ে ধীর/অস্থির Stripe অনুকরণ করা যায়
+    def __init__(self, config): self.config = config
+    def _call(self):
+        if self.config['BILLING_STUB_LATENCY_MS']: time.sleep(self.config['BILLING_STUB_LATENCY_MS'] / 1000)
+        if random.random() < self.config['BILLING_STUB_FAILURE_RATE']: raise ConnectionError("stub billing failure")
+    def create_customer(self, email, name, idempotency_key=None):
+        self._call(); return f"cus_stub_{hashlib.sha1((idempotency_key or email).encode()).hexdigest()[:14]}"
+    def create_checkout_session(self, **params):
+        self._call(); return SimpleNamespace(id=f"cs_stub_{uuid.uuid4().hex[:14]}", url=params.get('success_url'))
+    def create_portal_session(self, **params):
+        self._call(); return SimpleNamespace(id=f"bps_stub_{uuid.uuid4().hex[:14]}", url=params.get('return_url'))
+BILLING_CLIENTS = {'stripe': StripeBillingClient, 'stub': StubBillingClient}
+billing_client = BILLING_CLIENTS[app.config['BILLING_CLIENT']](app.config)
+
+class CircuitOpenError(Exception):
+    pass
+class CircuitBreaker:
+    # পরপর failure_threshold বার ব্যর্থ হলে reset_seconds পর্যন্ত কল না করেই ব্যর্থ; তারপর একটি পরীক্ষামূলক কল (half-open)
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold; self.reset_seconds = reset_seconds
+        self._lock = threading.Lock(); self._failures = 0; self._opened_at = None; self._probing = False
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None: return 'closed'
+            return 'half-open' if time.monotonic() - self._opened_at >= self.reset_seconds else 'open'
+    def call(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._opened_at is not None:
+                if time.monotonic() - self._opened_at < self.reset_seconds or self._probing: raise CircuitOpenError("billing API circuit is open")
+                self._probing = True
+        try: result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failures += 1; self._probing = False
+                if self._failures >= self.failure_threshold or self._opened_at is not None: self._opened_at = time.monotonic()
+            raise
+        with self._lock: self._failures = 0; self._opened_at = None; self._probing = False
+        return result
+    def stats(self):
+        state = self.state
+        with self._lock: return {"state": state, "consecutive_failures": self._failures}
+billing_breaker = CircuitBreaker(app.config['BILLING_BREAKER_FAILURES'], app.config['BILLING_BREAKER_RESET_SECONDS'])
+
+def _create_customer_for(user):
+    customer_id = billing_breaker.call(billing_client.create_customer, user.email, user.username, idempotency_key=f"mygizmo-customer-{user.id}")
+    user.stripe_customer_id = customer_id; db.session.commit()
+    return customer_id
+class CustomerProvisioner:
+    # সাইনআপের পরে Stripe কাস্টমার তৈরি ব্যাকগ্রাউন্ড থ্রেডে, এক্সপোনেনশিয়াল ব্যাকঅফসহ রিট্রাই
+    def __init__(self, config):
+        self.config = config; self._executor = None; self._lock = threading.Lock(); self._pending = set()
+        self.counters = {"created": 0, "failed": 0, "retries": 0}
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None: self._executor = ThreadPoolExecutor(max_workers=self.config['BILLING_WORKERS'], thread_name_prefix="billing")
+            return self._executor
+    def schedule(self, user_id):
+        with self._lock:
+            if user_id in self._pending: return
+            self._pending.add(user_id)
+        self._get_executor().submit(self._provision, user_id)
+    def _provision(self, user_id):
+        delay = self.config['BILLING_RETRY_BASE_SECONDS']
+        try:
+            for attempt in range(1, self.config['BILLING_MAX_ATTEMPTS'] + 1):
+                with app.app_context():
+                    try:
+                        user = db.session.get(User, user_id)
+                        if user is None or user.stripe_customer_id: return
+                        _create_customer_for(user)
+                        with self._lock: self.counters["created"] += 1
+                        return
+                    except Exception as e:
+                        db.session.rollback(); print(f"Stripe customer for user {user_id} failed (attempt {attempt}): {e}")
+                    finally: db.session.remove()
+                if attempt < self.config['BILLING_MAX_ATTEMPTS']:
+                    with self._lock: self.counters["retries"] += 1
+                    time.sleep(delay); delay *= 2
+            # সব চেষ্টা ব্যর্থ: পরের লগইন বা চেকআউটে ensure_stripe_customer আবার চেষ্টা করবে
+            with self._lock: self.counters["failed"] += 1
+        finally:
+            with self._lock: self._pending.discard(user_id)
+    def stats(self):
+        with self._lock: return dict(self.counters, pending=len(self._pending), breaker=billing_breaker.stats(), client=self.config['BILLING_CLIENT'])
+customer_provisioner = CustomerProvisioner(app.config)
+def ensure_stripe_customer(user_id):
+    # চেকআউট/পোর্টালের আগে: কাস্টমার না থাকলে এখনই (টাইমআউট ও সার্কিট ব্রেকারসহ, একবার) তৈরি করা হয়
+    user = db.session.get(User, user_id)
+    return user.stripe_customer_id or _create_customer_for(user)
 
 # --- প্রধান রুট (Main Routes) ---
 @app.route('/')
 def home():
-    return render_template('home.html', stripe_key=app.config['STRIPE_PUBLISHABLE_KEY'])
+    return render_cached('home.html', vary=(app.config['STRIPE_PUBLISHABLE_KEY'],), stripe_key=app.config['STRIPE_PUBLISHABLE_KEY'])
 @app.route('/tools')
 def tools():
-    return render_template('tools.html')
+    return render_cached('tools.html')
 
 # --- স্ট্যাটিক পেইজ রুট (আগের মতোই) ---
 @app.route('/features')
-def features(): return render_template('features.html')
+def features(): return render_cached('features.html')
 @app.route('/about')
-def about_us(): return render_template('about.html')
+def about_us(): return render_cached('about.html')
 @app.route('/contact')
-def contact(): return render_template('contact.html')
+def contact(): return render_cached('contact.html')
 @app.route('/privacy')
-def privacy_policy(): return render_template('privacy.html')
+def privacy_policy(): return render_cached('privacy.html')
 @app.route('/terms')
-def terms_of_service(): return render_template('terms.html')
+def terms_of_service(): return render_cached('terms.html')
 
 # --- পরিবর্তন: Blog রুট (নতুন) ---
 @app.route('/blog')
 def blog():
-    # পোস্টগুলো ডাটাবেস থেকে তারিখ অনুযায়ী降序 (descending) অর্ডারে নিন
-    posts = Post.query.order_by(Post.date_posted.desc()).all()
-    return render_template('blog.html', title='Blog', posts=posts)
+    return cached_page('blog', render_blog_page)
+def render_blog_page():
+    # পোস্টগুলো তারিখ অনুযায়ী降序 (descending) অর্ডারে, keyset পেজিনেশন: ?cursor=<date_posted>|<id> এর পরের পোস্টগুলো
+    # লিস্টিংয়ে content কলামটি লোড হয় না; লেখকের নাম একই কোয়েরির JOIN-এ আসে
+    query = (Post.query.options(load_only(Post.id, Post.title, Post.slug, Post.excerpt, Post.date_posted),
+                                joinedload(Post.author).load_only(User.username))
+             .order_by(Post.date_posted.desc(), Post.id.desc()))
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_date, cursor_id = cursor.rsplit('|', 1); cursor_date = datetime.fromisoformat(cursor_date); cursor_id = int(cursor_id)
+        except ValueError: abort(400)
+        query = query.filter(or_(Post.date_posted < cursor_date, and_(Post.date_posted == cursor_date, Post.id < cursor_id)))
+    page_size = app.config['BLOG_PAGE_SIZE']
+    posts = query.limit(page_size + 1).all()
+    next_cursor = None
+    if len(posts) > page_size:
+        posts = posts[:page_size]; next_cursor = f"{posts[-1].date_posted.isoformat()}|{posts[-1].id}"
+    last_modified = _as_utc(max((p.date_posted for p in posts), default=None))
+    return render_template('blog.html', title='Blog', posts=posts, next_cursor=next_cursor, is_first_page=not cursor), last_modified
 
 @app.route('/blog/new', methods=['GET', 'POST'])
 @login_required # শুধু অ্যাডমিন বা লগইন করা ইউজাররাই পোস্ট করতে পারবে
@@ -295,22 +2542,19 @@ def create_post():
     form = PostForm()
     if form.validate_on_submit():
         try:
-            # ইউনিক slug তৈরি করুন
-            post_slug = slugify(form.title.data)
-            existing_post = Post.query.filter_by(slug=post_slug).first()
-            if existing_post:
-                # যদি একই নামের পোস্ট আগে থাকে, তবে একটি ইউনিক আইডি যোগ করুন
-                post_slug = f"{post_slug}-{uuid.uuid4().hex[:6]}"
+            # ইউনিক slug তৈরি করুন (একই নামের পোস্ট আগে থাকলে unique_slugs একটি ইউনিক আইডি যোগ করে)
+            post_slug = unique_slugs([make_slug(form.title.data)])[0]
 
             post = Post(
                 title=form.title.data,
                 slug=post_slug,
                 excerpt=form.excerpt.data,
                 content=form.content.data,
-                author=current_user 
+                user_id=current_user.id # current_user এখন ক্যাশ করা কপি, তাই সম্পর্কের বদলে id
             )
             db.session.add(post)
             db.session.commit()
+            page_cache.bump('blog') # লিস্টিং ও পোস্ট পেজের ক্যাশ বাতিল
             flash('Your post has been created!', 'success')
             return redirect(url_for('blog'))
         except Exception as e:
@@ -320,9 +2564,11 @@ def create_post():
 
 @app.route('/blog/post/<string:slug>')
 def post(slug):
-    # slug দিয়ে পোস্টটি খুঁজুন, না পেলে 404 দেখাবে
-    post = Post.query.filter_by(slug=slug).first_or_404()
-    return render_template('post.html', title=post.title, post=post)
+    def render():
+        # slug দিয়ে পোস্টটি খুঁজুন, না পেলে 404 দেখাবে (404 ক্যাশ হয় না)
+        post = Post.query.options(joinedload(Post.author)).filter_by(slug=slug).first_or_404()
+        return render_template('post.html', title=post.title, post=post), _as_utc(post.date_posted)
+    return cached_page('blog', render)
 
 # --- Auth Routes (আগের মতোই) ---
 @app.route('/register', methods=['GET', 'POST'])
@@ -331,13 +2577,16 @@ def register():
     form = RegistrationForm()
     if form.validate_on_submit():
         try:
-            customer = stripe.Customer.create(email=form.email.data, name=form.username.data)
-            user = User(username=form.username.data, email=form.email.data, password=form.password.data, stripe_customer_id=customer.id)
+            # ইউজার সাথে সাথে কমিট হয়; Stripe কাস্টমার ব্যাকগ্রাউন্ডে তৈরি হয় (সাইনআপ আর Stripe-এর গতির ওপর নির্ভর করে না)
+            user = User(username=form.username.data, email=form.email.data, password=form.password.data)
             db.session.add(user); db.session.commit()
+            customer_provisioner.schedule(user.id)
             flash('Your account has been created! You are now able to log in', 'success')
             return redirect(url_for('login'))
-        except stripe.error.StripeError as e: flash(f'Error creating Stripe customer: {e}', 'danger'); return render_template('register.html', title='Register', form=form)
-        except Exception as e: flash(f'An error occurred: {e}', 'danger'); return render_template('register.html', title='Register', form=form)
+        except PasswordHashBusy:
+            flash('We are handling a lot of sign-ups right now. Please try again in a moment.', 'warning')
+            return render_template('register.html', title='Register', form=form), 503
+        except Exception as e: db.session.rollback(); flash(f'An error occurred: {e}', 'danger'); return render_template('register.html', title='Register', form=form)
     return render_template('register.html', title='Register', form=form)
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -345,8 +2594,14 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and user.verify_password(form.password.data):
+        try: verified = user is not None and user.verify_password(form.password.data)
+        except PasswordHashBusy:
+            flash('We are handling a lot of logins right now. Please try again in a moment.', 'warning')
+            return render_template('login.html', title='Login', form=form), 503
+        if verified:
+            if db.session.dirty: db.session.commit() # রিহ্যাশ হয়ে থাকলে
             login_user(user); flash('Login Successful!', 'success')
+            if not user.stripe_customer_id: customer_provisioner.schedule(user.id) # সাইনআপের সময় ব্যর্থ হয়ে থাকলে
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('tools'))
         else:
@@ -361,9 +2616,25 @@ def logout():
 @app.route('/dashboard')
 @login_required # ড্যাশবোর্ড শুধু লগইন করা ইউজাররাই দেখবে
 def dashboard():
-    # --- নতুন সংযোজন: ইউজারের ফাইলগুলো ডাটাবেস থেকে লোড করুন ---
-    files = UserFile.query.filter_by(user_id=current_user.id).order_by(UserFile.created_at.desc()).limit(10).all()
-    return render_template('dashboard.html', title='Dashboard', files=files)
+    # --- পরিবর্তন: ফাইল লাইব্রেরি — টাইপ ফিল্টার ও keyset পেজিনেশন ---
+    file_type = request.args.get('file_type') or None
+    try: files, next_cursor = user_file_page(current_user.id, file_type, cursor=request.args.get('cursor'))
+    except ValueError: abort(400)
+    user_file_sweeper.start()
+    return render_template('dashboard.html', title='Dashboard', files=files, next_cursor=next_cursor, file_type=file_type,
+                           file_types=user_file_types(current_user.id), storage=user_storage(current_user.id))
+
+# --- নতুন সংযোজন: ফাইল লাইব্রেরি API ---
+# GET /api/files?file_type=...&q=...&limit=...&cursor=... — next_cursor না থাকলে শেষ পেজ; প্রথম পেজে টাইপ অনুযায়ী গণনাও আসে
+@app.route('/api/files')
+@login_required
+def api_files():
+    cursor = request.args.get('cursor')
+    try: files, next_cursor = user_file_page(current_user.id, request.args.get('file_type'), (request.args.get('q') or '').strip(), cursor, request.args.get('limit', type=int))
+    except ValueError: return jsonify(error="Invalid cursor."), 400
+    result = {"files": [user_file_json(f) for f in files], "next_cursor": next_cursor, "storage": user_storage(current_user.id)}
+    if not cursor: result["file_types"] = user_file_types(current_user.id)
+    return jsonify(result)
 
 # --- নতুন সংযোজন: ফাইল ডাউনলোড রুট ---
 @app.route('/download_file/<filename>')
@@ -373,6 +2644,8 @@ def download_file(filename):
     file_record = UserFile.query.filter_by(saved_filename=filename, user_id=current_user.id).first_or_404()
     
     # ইউজারকে ফাইলটি ডাউনলোড করতে দিন
+    if file_record.blob_hash:
+        return send_file(blob_path(file_record.blob_hash), as_attachment=True, download_name=file_record.original_filename)
     return send_from_directory(
         app.config['USER_FILES_FOLDER'],
         filename,
@@ -385,8 +2658,8 @@ def download_file(filename):
 @login_required 
 def create_checkout_session():
     try:
-        checkout_session = stripe.checkout.Session.create(
-            customer=current_user.stripe_customer_id, payment_method_types=['card'],
+        checkout_session = billing_breaker.call(billing_client.create_checkout_session,
+            customer=ensure_stripe_customer(current_user.id), payment_method_types=['card'],
             line_items=[{'price': app.config['STRIPE_PRICE_ID'], 'quantity': 1,}],
             mode='subscription', allow_promotion_codes=True,
             success_url=url_for('success', _external=True) + '?session_id={CHECKOUT_SESSION_ID}',
@@ -408,8 +2681,8 @@ def cancel():
 @login_required 
 def create_portal_session():
     try:
-        portal_session = stripe.billing_portal.Session.create(
-            customer=current_user.stripe_customer_id, return_url=url_for('dashboard', _external=True),
+        portal_session = billing_breaker.call(billing_client.create_portal_session,
+            customer=ensure_stripe_customer(current_user.id), return_url=url_for('dashboard', _external=True),
         )
         return jsonify({'url': portal_session.url})
     except Exception as e: return jsonify(error=str(e)), 403
@@ -417,55 +2690,120 @@ def create_portal_session():
 @app.route('/stripe-webhook', methods=['POST'])
 def stripe_webhook():
     payload = request.get_data(as_text=True); sig_header = request.headers.get('Stripe-Signature')
-    try: event = stripe.Event.construct_from(json.loads(payload), stripe.api_key)
+    try:
+        if app.config['STRIPE_WEBHOOK_SECRET']: stripe.Webhook.construct_event(payload, sig_header, app.config['STRIPE_WEBHOOK_SECRET'])
+        event = json.loads(payload)
     except ValueError as e: return 'Invalid payload', 400
     except stripe.error.SignatureVerificationError as e: return 'Invalid signature', 400
-    event_type = event['type']; data = event['data']['object']
-    if event_type == 'checkout.session.completed':
-        customer_id = data.get('customer'); user = User.query.filter_by(stripe_customer_id=customer_id).first()
-        if user: user.subscription_status = 'active'; db.session.commit(); print(f"User {user.email} is now ACTIVE.")
-    elif event_type == 'customer.subscription.deleted':
-        customer_id = data.get('customer'); user = User.query.filter_by(stripe_customer_id=customer_id).first()
-        if user: user.subscription_status = 'inactive'; db.session.commit(); print(f"User {user.email} is now INACTIVE.")
-    elif event_type == 'customer.subscription.updated':
-        customer_id = data.get('customer'); user = User.query.filter_by(stripe_customer_id=customer_id).first()
-        if user: user.subscription_status = data.get('status'); db.session.commit(); print(f"User {user.email} status updated to {data.get('status')}.")
-    else: print(f"Unhandled Stripe event type: {event_type}")
+    if not isinstance(event, dict) or not event.get('id'): return 'Invalid payload', 400
+    # শুধু সেভ করে সাথে সাথে উত্তর; স্ট্যাটাস বদলায় stripe_event_worker (ডুপ্লিকেট ইভেন্টও 200 পায়, যাতে Stripe আর রিট্রাই না করে)
+    if not ingest_stripe_event(event): return 'OK (duplicate)', 200
     return 'OK', 200
 
 # --- টুলসের রুট (এখন লগইন ছাড়াও চলবে) ---
 
 @app.route('/qr-generator', methods=['GET', 'POST'])
 def qr_generator():
-    qr_image_path = None
+    qr_image_url = None; qr_download_url = None
+    size, ec, fmt = parse_qr_options(request.values)
     if request.method == 'POST':
         url = request.form['url']
         if url:
-            img = qrcode.make(url); qr_filename = 'qr_code_generated.png'
-            qr_image_path_full = os.path.join(STATIC_FOLDER, qr_filename); img.save(qr_image_path_full)
-            qr_image_path = qr_filename
-    return render_template('qr_generator.html', qr_image_path=qr_image_path)
-    
+            # প্রতিটি রিকোয়েস্টের নিজস্ব হ্যাশড URL — একাধিক ইউজার আর একে অপরের কোড ওভাররাইট করে না
+            qr_image_url = qr_url(url, size, ec, fmt)
+            qr_download_url = qr_image_url + "?download=1"
+    if request.method == 'GET': return render_cached('qr_generator.html', qr_image_url=None, qr_download_url=None, qr_format=fmt, qr_size=size, qr_ec=ec)
+    return render_template('qr_generator.html', qr_image_url=qr_image_url, qr_download_url=qr_download_url, qr_format=fmt, qr_size=size, qr_ec=ec)
+
+@app.route('/qr/<digest>.<fmt>')
+def qr_image(digest, fmt):
+    if fmt not in QR_MIMETYPES: abort(404)
+    data = qr_engine.peek(digest, fmt)
+    if data is None: abort(404)
+    response = Response(data, mimetype=QR_MIMETYPES[fmt])
+    # কন্টেন্ট digest দিয়ে নির্ধারিত, তাই URL টি চিরকাল একই বাইট দেয়
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['ETag'] = f'"{digest}"'
+    if request.args.get("download"): response.headers['Content-Disposition'] = f'attachment; filename="my_qr_code.{fmt}"'
+    return response
+
+@app.route('/qr-generator/bulk', methods=['POST'])
+def qr_generator_bulk():
+    csv_file = request.files.get('csv_file')
+    if not csv_file or not csv_file.filename:
+        flash('Please upload a CSV file.', 'warning'); return redirect(url_for('qr_generator'))
+    size, ec, fmt = parse_qr_options(request.form); output = request.form.get('output') or 'zip'
+    try: rows = read_qr_csv(csv_file, app.config['QR_BULK_MAX_ROWS'])
+    except (ValueError, UnicodeError, csv.Error) as e:
+        flash(f'Could not read CSV: {e}', 'danger'); return redirect(url_for('qr_generator'))
+    if not rows:
+        flash('The CSV file has no rows.', 'warning'); return redirect(url_for('qr_generator'))
+    if output == 'sheet':
+        return streamed_download(qr_svg_sheet(rows, size, ec), "MyGizmo_QR_Sheet.svg", "image/svg+xml", current_user, "QR Generator")
+    # PNG আগে থেকেই কমপ্রেসড, তাই ZIP_STORED; SVG টেক্সট ভালো কমপ্রেস হয়
+    compression = zipfile.ZIP_STORED if fmt == 'png' else zipfile.ZIP_DEFLATED
+    return streamed_download(stream_zip(qr_bulk_zip_entries(rows, size, ec, fmt), compression=compression), "MyGizmo_QR_Codes.zip", "application/zip", current_user, "QR Generator")
+
 @app.route('/calculator')
-def calculator(): return render_template('calculator.html')
+def calculator(): return render_cached('calculator.html')
 
 @app.route('/slug-generator')
-def slug_generator(): return render_template('slug_generator.html')
+def slug_generator(): return render_cached('slug_generator.html')
 
 @app.route('/generate-slug', methods=['POST'])
 def generate_slug():
-    data = request.json; text = data.get('text', ''); separator = data.get('separator', '-')
+    data = request.json; text = data.get('text', '')
+    try: separator = slug_separator(data.get('separator', '-'))
+    except ValueError as e: return jsonify(error=str(e)), 400
     remove_numbers = data.get('remove_numbers', False); lowercase = data.get('lowercase', True) 
-    final_slug = slugify(text, separator=separator, lowercase=lowercase)
-    if remove_numbers:
-        final_slug = "".join(c for c in final_slug if not c.isdigit()); final_slug = final_slug.replace(separator * 2, separator)
+    final_slug = make_slug(text, separator=separator, lowercase=bool(lowercase), remove_numbers=bool(remove_numbers))
     return jsonify({'slug': final_slug})
 
+# --- নতুন সংযোজন: ব্যাচ Slug API ---
+# JSON: {"texts": [...], "separator": "-", "lowercase": true, "remove_numbers": false, "unique": true} অথবা শুধু [...] অ্যারে
+# text/plain: প্রতি লাইনে একটি টাইটেল; application/x-ndjson: প্রতি লাইনে {"text": "..."} (বা JSON স্ট্রিং)
+# দুটোতেই অপশন কোয়েরি স্ট্রিংয়ে, উত্তরও একই ফরম্যাটে লাইন ধরে stream হয় (NDJSON এ {"slug": ...} বা ভুল লাইনে {"error": ..., "line": n})
+@app.route('/generate-slugs', methods=['POST'])
+def generate_slugs():
+    if request.is_json:
+        data = request.get_json(silent=True)
+        texts = data if isinstance(data, list) else (data or {}).get('texts')
+        if not isinstance(texts, list): return jsonify(error="Send a JSON array or {'texts': [...]}."), 400
+        if len(texts) > app.config['SLUG_BATCH_MAX']: return jsonify(error=f"At most {app.config['SLUG_BATCH_MAX']} texts per request."), 413
+        try: opts, unique = slug_options(request.args.to_dict() | (data if isinstance(data, dict) else {}))
+        except ValueError as e: return jsonify(error=str(e)), 400
+        slugs = [make_slug(str(t or ''), **opts) for t in texts]
+        if unique: slugs = unique_slugs(slugs)
+        return jsonify({'slugs': slugs, 'count': len(slugs)})
+    try: opts, unique = slug_options(request.args)
+    except ValueError as e: return jsonify(error=str(e)), 400
+    ndjson = request.mimetype == 'application/x-ndjson'; taken = set()
+    def parsed_lines():
+        # (লাইন নম্বর, টাইটেল বা None, ত্রুটি); NDJSON এ খালি লাইন বাদ
+        for n, raw in enumerate(request.stream, start=1):
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            if not ndjson: yield n, line, None; continue
+            if not line.strip(): continue
+            try: yield n, _ndjson_text(line), None
+            except ValueError as e: yield n, None, str(e)
+    def generate():
+        lines = parsed_lines()
+        while True:
+            batch = list(itertools.islice(lines, app.config['SLUG_QUERY_CHUNK']))
+            if not batch: break
+            slugs = [make_slug(text, **opts) if error is None else None for _, text, error in batch]
+            if unique:
+                done = iter(unique_slugs([slug for slug in slugs if slug is not None], taken))
+                slugs = [None if slug is None else next(done) for slug in slugs]
+            if not ndjson: yield "".join(slug + "\n" for slug in slugs); continue
+            yield "".join(json.dumps({"slug": slug} if error is None else {"error": error, "line": n}) + "\n" for (n, _, error), slug in zip(batch, slugs))
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson' if ndjson else 'text/plain')
+
 @app.route('/list-randomizer')
-def list_randomizer(): return render_template('list_randomizer.html')
+def list_randomizer(): return render_cached('list_randomizer.html')
 
 @app.route('/file-converter')
-def file_converter(): return render_template('file_converter.html')
+def file_converter(): return render_cached('file_converter.html')
 
 @app.route('/convert', methods=['POST'])
 def handle_conversion():
@@ -474,29 +2812,48 @@ def handle_conversion():
         flash("No selected file", "danger"); return redirect(url_for('file_converter'))
     conversion_type = request.form['conversion_type']
     
-    output_buffer = None
-    download_name = "download"
-    
-    if conversion_type == 'jpg_to_pdf':
-        try:
-            output_buffer = convert_jpg_to_pdf(files)
-            download_name = "converted.pdf"
-            if not output_buffer:
-                flash("No valid JPG images found", "danger"); return redirect(url_for('file_converter'))
-        except Exception as e:
-            flash(f"Error during JPG to PDF conversion: {e}", "danger"); return redirect(url_for('file_converter'))
-    elif conversion_type == 'pdf_to_jpg':
-        try:
-            if len(files) > 1:
-                flash("Please upload only one PDF for PDF-to-JPG conversion.", "danger"); return redirect(url_for('file_converter'))
-            output_buffer = convert_pdf_to_jpgs(files[0])
-            download_name = "converted_images.zip"
-            if not output_buffer:
-                flash("Error during PDF to JPG conversion. Did you install Poppler?", "danger"); return redirect(url_for('file_converter'))
-        except Exception as e:
-            flash(f"Error during PDF to JPG conversion: {e}. (Did you install Poppler?)", "danger"); return redirect(url_for('file_converter'))
-    else:
+    if conversion_type not in ('jpg_to_pdf', 'pdf_to_jpg'):
+        if wants_async(): return jsonify(error="Invalid conversion type"), 400
         flash("Invalid conversion type", "danger"); return redirect(url_for('file_converter'))
+    if conversion_type == 'pdf_to_jpg' and len(files) > 1:
+        if wants_async(): return jsonify(error="Please upload only one PDF for PDF-to-JPG conversion."), 400
+        flash("Please upload only one PDF for PDF-to-JPG conversion.", "danger"); return redirect(url_for('file_converter'))
+    try: pdf_options = parse_pdf_options(request.form); pdf_layout = parse_pdf_layout_options(request.form)
+    except PageRangeError as e:
+        if wants_async(): return jsonify(error=pdf_to_jpg_error(e)), 400
+        flash(pdf_to_jpg_error(e), "danger"); return redirect(url_for('file_converter'))
+    except ValueError as e:
+        if wants_async(): return jsonify(error=f"Invalid form data: {e}"), 400
+        flash(f"Invalid form data: {e}", "danger"); return redirect(url_for('file_converter'))
+
+    # --- নতুন সংযোজন: একই ইনপুট + একই অপশন হলে ক্যাশ থেকে রেজাল্ট ---
+    if conversion_type == 'jpg_to_pdf': cache_key = result_cache.key('jpg_to_pdf', pdf_layout, [file_digest(f) for f in files])
+    else: cache_key = result_cache.key('pdf_to_jpg', pdf_options, [file_digest(files[0])])
+
+    # --- নতুন সংযোজন: async=1 হলে কাজটি ব্যাকগ্রাউন্ড জবে পাঠিয়ে সাথে সাথে job id রিটার্ন করুন ---
+    if wants_async():
+        job = submit_job("convert", {"conversion_type": conversion_type, "pdf_options": pdf_options, "pdf_layout": pdf_layout}, {"file": files}, current_user, cache_key)
+        return job_accepted_response(job)
+
+    hit = result_cache.get(cache_key)
+    if hit: return send_cached_result(hit, "File Converter")
+
+    if conversion_type == 'pdf_to_jpg':
+        try: pages = convert_pdf_to_jpgs(files[0], pdf_options)
+        except Exception as e:
+            flash(pdf_to_jpg_error(e), "danger"); return redirect(url_for('file_converter'))
+        # --- পরিবর্তন: প্রতিটি পেজ এনকোড হওয়ার সাথে সাথে ZIP স্ট্রিম করা হয় (এবং ক্যাশে লেখা হয়) ---
+        chunks = result_cache.store_stream(cache_key, stream_zip(pages, zipfile.ZIP_STORED), "converted_images.zip", 'application/octet-stream')
+        return streamed_download(chunks, "converted_images.zip", 'application/octet-stream', current_user, "File Converter")
+
+    try:
+        output_buffer = convert_jpg_to_pdf(files, pdf_layout)
+        download_name = "converted.pdf"
+        if not output_buffer:
+            flash("No valid JPG images found", "danger"); return redirect(url_for('file_converter'))
+    except Exception as e:
+        flash(f"Error during JPG to PDF conversion: {e}", "danger"); return redirect(url_for('file_converter'))
+    result_cache.put(cache_key, output_buffer, download_name, 'application/octet-stream')
 
     # --- নতুন সংযোজন: ফাইল সেভ করুন ---
     save_user_file(current_user, output_buffer, download_name, "File Converter")
@@ -509,90 +2866,62 @@ def handle_conversion():
     )
 
 @app.route("/image-studio")
-def image_studio(): return render_template("image_studio.html")
+def image_studio(): return render_cached("image_studio.html")
 
 @app.route("/process", methods=["POST"])
 def process_images():
     files = request.files.getlist("images")
     if not files or not files[0].filename:
         flash("Please select at least one image.", "error"); return redirect(url_for("image_studio"))
-    try:
-        resize_w = int(request.form.get("width") or 0); resize_h = int(request.form.get("height") or 0)
-        keep_aspect = request.form.get("keep_aspect") == "on"; watermark_text = (request.form.get("watermark_text") or "").strip()
-        wm_position = request.form.get("wm_position") or "bottom-right"
-        text_opacity = float(request.form.get("text_opacity") or 0.5); img_opacity = float(request.form.get("img_opacity") or 0.5)
-        text_size = int(request.form.get("text_size") or 24); image_scale = float(request.form.get("image_scale") or 0.2)
-        output_format = (request.form.get("output_format") or "JPEG").upper(); quality = int(request.form.get("quality") or 90)
+    try: opts = parse_studio_options(request.form)
     except Exception as e:
         flash(f"Invalid form data: {e}", "error"); return redirect(url_for("image_studio"))
-    if output_format not in FORMAT_MAP: output_format = "JPEG"
-    quality = max(1, min(100, quality)); wm_path = None
+    output_format = opts["output_format"]
     wm_file = request.files.get("watermark_image")
-    if wm_file and wm_file.filename and allowed_file(wm_file.filename):
-        wm_name = secure_filename(wm_file.filename)
-        wm_path = os.path.join(app.config['UPLOAD_FOLDER'], f"wm_{uuid.uuid4().hex}_{wm_name}")
-        try: wm_file.save(wm_path)
-        except Exception as e: print("Watermark save failed:", e); wm_path = None
-    processed_paths = []; errors = []
+    has_wm = bool(wm_file and wm_file.filename and allowed_file(wm_file.filename))
+    valid_files = []; errors = []
     for f in files:
         if not f or not f.filename or not allowed_file(f.filename):
             errors.append(f"{f.filename or 'Unknown file'}: unsupported type"); continue
-        safe = secure_filename(f.filename); in_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{safe}")
-        try:
-            f.save(in_path)
-            with Image.open(in_path) as im:
-                im = im.convert("RGBA")
-                if resize_w or resize_h:
-                    if keep_aspect: target = (resize_w or im.width, resize_h or im.height); im.thumbnail(target, Image.LANCZOS)
-                    else: new_w = resize_w or im.width; new_h = resize_h or im.height; im = im.resize((new_w, new_h), Image.LANCZOS)
-                if wm_path: im = add_image_watermark(im, str(wm_path), wm_position, img_opacity, image_scale)
-                if watermark_text: im = add_text_watermark(im, watermark_text, wm_position, text_opacity, text_size)
-                ext = FORMAT_MAP.get(output_format, "jpg"); out_file_name = f"{uuid.uuid4().hex}_out.{ext}"
-                out_path = os.path.join(app.config['PROCESSED_FOLDER'], out_file_name)
-                if output_format == "PDF":
-                    out_temp = os.path.join(app.config['PROCESSED_FOLDER'], f"{uuid.uuid4().hex}_pdfimg.png")
-                    im.convert("RGB").save(out_temp, "PNG"); processed_paths.append(out_temp)
-                elif output_format == "JPEG": im.convert("RGB").save(out_path, "JPEG", quality=quality); processed_paths.append(out_path)
-                else: im.save(out_path, output_format); processed_paths.append(out_path)
-        except Exception as e: errors.append(f"{safe}: processing failed ({e})")
-        finally:
-            if os.path.exists(in_path):
-                try: os.remove(in_path)
-                except Exception as e: print(f"Failed to remove temp file {in_path}: {e}")
-    if not processed_paths:
+        valid_files.append(f)
+    # --- নতুন সংযোজন: async মোড — ইনপুট জব ফোল্ডারে রেখে job id রিটার্ন ---
+    if wants_async():
+        if not valid_files: return jsonify(error="No images were processed.", errors=errors[:5]), 400
+        uploads = {"images": valid_files}
+        if has_wm: uploads["watermark"] = [wm_file]
+        cache_key = studio_cache_key(opts, [file_digest(f) for f in valid_files], file_digest(wm_file) if has_wm else None)
+        job = submit_job("image_studio", {"options": opts, "errors": errors}, uploads, current_user, cache_key)
+        return job_accepted_response(job)
+    # আপলোডগুলো মেমরিতেই পড়া হয়, UPLOAD_FOLDER/PROCESSED_FOLDER-এ কোনো টেম্প ফাইল লেখা হয় না
+    wm_data = wm_file.read() if has_wm else None
+    items = [(secure_filename(f.filename), f.read()) for f in valid_files]
+    # --- নতুন সংযোজন: রেজাল্ট ক্যাশ ---
+    cache_key = studio_cache_key(opts, [file_digest(data) for _, data in items], file_digest(wm_data) if wm_data else None) if items else None
+    hit = result_cache.get(cache_key)
+    if hit: return send_cached_result(hit, "Image Studio")
+    if output_format != "PDF":
+        # --- পরিবর্তন: প্রতিটি ছবি শেষ হলেই ZIP-এর অংশ ক্লায়েন্টে স্ট্রিম হয় ---
+        entries = peek_outputs(studio_iter_outputs(items, opts, wm_data, errors))
+        if entries is None:
+            flash("No images were processed. " + ("; ".join(errors[:5]) if errors else ""), "error")
+            return redirect(url_for("image_studio"))
+        download_name = f"MyGizmo_Images_{uuid.uuid4().hex}.zip"
+        chunks = result_cache.store_stream(cache_key, stream_zip(entries), download_name, "application/zip")
+        return streamed_download(chunks, download_name, "application/zip", current_user, "Image Studio")
+    outputs = studio_process_files(items, opts, wm_data, errors)
+    if not len(outputs):
         flash("No images were processed. " + ("; ".join(errors[:5]) if errors else ""), "error")
-        if wm_path and os.path.exists(wm_path): os.remove(wm_path)
         return redirect(url_for("image_studio"))
     
-    output_path = None
-    download_name = "download"
-    mimetype = "application/octet-stream"
-
-    if output_format == "PDF":
-        pdf_file = os.path.join(app.config['PROCESSED_FOLDER'], f"batch_{uuid.uuid4().hex}.pdf")
-        try:
-            make_pdf_from_images(processed_paths, pdf_file)
-            download_name = "MyGizmo_Converted.pdf"; mimetype = "application/pdf"; output_path = pdf_file
-        except Exception as e:
-            flash(f"PDF generation failed: {e}", "error"); return redirect(url_for("image_studio"))
-        finally:
-            for p in processed_paths:
-                if os.path.exists(p): os.remove(p)
-    else:
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-            for p in processed_paths: zf.write(p, arcname=os.path.basename(p))
-        zip_buffer.seek(0)
-        for p in processed_paths:
-            if os.path.exists(p): os.remove(p)
-        download_name = f"MyGizmo_Images_{uuid.uuid4().hex}.zip"; mimetype = "application/zip"; output_path = zip_buffer
-    
-    if wm_path and os.path.exists(wm_path): os.remove(wm_path)
+    try: output_buffer, download_name, mimetype = studio_make_pdf(outputs, opts.get("pdf_layout"))
+    except Exception as e:
+        flash(f"PDF generation failed: {e}", "error"); return redirect(url_for("image_studio"))
+    result_cache.put(cache_key, output_buffer, download_name, mimetype)
     
     # --- নতুন সংযোজন: ফাইল সেভ করুন ---
-    save_user_file(current_user, output_path, download_name, "Image Studio")
+    save_user_file(current_user, output_buffer, download_name, "Image Studio")
     
-    return send_file(output_path, as_attachment=True, download_name=download_name, mimetype=mimetype)
+    return send_file(output_buffer, as_attachment=True, download_name=download_name, mimetype=mimetype)
 
 
 @app.route('/ai-background-remover', methods=['GET', 'POST'])
@@ -605,27 +2934,169 @@ def ai_background_remover():
         if not allowed_file(file.filename):
             flash('Invalid file type. Please upload a JPG, PNG, or WEBP image.', 'error')
             return redirect(url_for('ai_background_remover'))
+        # --- নতুন সংযোজন: async মোড ---
+        model = bg_engine.resolve_model(request.form.get('model'))
+        # --- নতুন সংযোজন: একই ছবি + একই মডেল হলে rembg না চালিয়ে ক্যাশ থেকে ---
+        cache_key = result_cache.key("bg_remove", {"model": model, "max_side": app.config['REMBG_MAX_SIDE']}, [file_digest(file)])
+        if wants_async():
+            job = submit_job("bg_remove", {"model": model}, {"image_file": [file]}, current_user, cache_key)
+            return job_accepted_response(job)
+        hit = result_cache.get(cache_key)
+        if hit: return send_cached_result(hit, "AI Background Remover", f'bg_removed_{file.filename}.png')
         try:
             input_bytes = file.read()
-            output_bytes = remove(input_bytes)
+            started = time.perf_counter()
+            output_bytes = bg_engine.remove(input_bytes, model)
+            elapsed_ms = (time.perf_counter() - started) * 1000
             output_buffer = io.BytesIO(output_bytes)
             output_buffer.seek(0)
             
             download_name = f'bg_removed_{file.filename}.png'
+            result_cache.put(cache_key, output_bytes, download_name, 'image/png')
             
             # --- নতুন সংযোজন: ফাইল সেভ করুন ---
             save_user_file(current_user, output_buffer, download_name, "AI Background Remover")
             
-            return send_file(
+            response = send_file(
                 output_buffer,
                 as_attachment=True,
                 download_name=download_name,
                 mimetype='image/png'
             )
+            response.headers['Server-Timing'] = f'rembg;dur={elapsed_ms:.1f}'
+            return response
+        except TimeoutError:
+            flash('Background removal is taking too long right now. Please try again in a moment.', 'danger')
+            return render_template('ai_background_remover.html', models=app.config['REMBG_MODELS'], default_model=app.config['REMBG_MODEL']), 503
         except Exception as e:
             flash(f'Error during background removal: {e}', 'danger')
             return redirect(url_for('ai_background_remover'))
-    return render_template('ai_background_remover.html')
+    return render_cached('ai_background_remover.html', models=app.config['REMBG_MODELS'], default_model=app.config['REMBG_MODEL'])
+
+# --- নতুন সংযোজন: হ্যাশড অ্যাসেট রুট ---
+@app.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    entry = asset_manifest.by_hashed.get(filename)
+    if entry is None: abort(404)
+    folder = asset_manifest.folder; path = os.path.join(folder, filename); mimetype = None; encoding = None
+    # ব্রাউজার স্পষ্টভাবে AVIF/WebP চাইলে ছোট ভ্যারিয়েন্টটি (শুধু image/* ওয়াইল্ডকার্ড যথেষ্ট নয়)
+    accepted = {m for m, q in request.accept_mimetypes if q > 0}
+    for variant_mimetype, name in sorted(entry["variants"].items()):
+        if variant_mimetype in accepted: path = os.path.join(folder, name); mimetype = variant_mimetype; break
+    if not mimetype and entry["gzip"] and request.accept_encodings['gzip']:
+        path = os.path.join(folder, entry["gzip"]); encoding = 'gzip'
+    response = send_file(path, mimetype=mimetype, download_name=os.path.basename(filename), max_age=app.config['ASSET_MAX_AGE'], conditional=True, etag=True)
+    if encoding: response.headers['Content-Encoding'] = encoding
+    if entry["variants"]: response.vary.add('Accept')
+    if entry["gzip"]: response.vary.add('Accept-Encoding')
+    # কন্টেন্ট হ্যাশ URL-এ আছে, তাই ফাইলটি কখনো বদলাবে না — ব্রাউজার আর যাচাই করতেও আসবে না
+    response.headers['Cache-Control'] = f"public, max-age={app.config['ASSET_MAX_AGE']}, immutable"
+    return response
+
+# --- নতুন সংযোজন: Prometheus মেট্রিক্স (ধাপের হিস্টোগ্রাম + সব কম্পোনেন্টের stats() এক জায়গায়; আলাদা JSON stats রুট নেই) ---
+def _prom_gauges(prefix, values, lines):
+    # stats() ডিকশনারির সংখ্যাগুলো gauge হিসেবে; নেস্টেড ডিকশনারির কী নামের সাথে জুড়ে যায়, স্ট্রিং/None বাদ
+    for key, value in values.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict): _prom_gauges(name, value, lines)
+        elif isinstance(value, (bool, int, float)): lines += [f"# TYPE {name} gauge", f"{name} {int(value) if isinstance(value, bool) else value}"]
+def _metrics_allowed():
+    # টোকেন সেট থাকলে Bearer টোকেন মিলতে হবে; না থাকলে শুধু লোকালহোস্ট থেকে সরাসরি (প্রক্সি ছাড়া) আসা রিকোয়েস্ট
+    token = app.config['METRICS_TOKEN']
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        return supplied.startswith('Bearer ') and hmac.compare_digest(supplied[7:].encode(), token.encode())
+    return request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+@app.route('/metrics')
+def prometheus_metrics():
+    if not _metrics_allowed(): abort(403)
+    lines = metrics.render()
+    report = query_stats.report(); routes = report["routes"]
+    for metric, field, scale in (("db_requests_total", "requests", 1), ("db_queries_total", "queries", 1), ("db_seconds_total", "db_ms", 1000), ("db_over_budget_total", "over_budget", 1)):
+        lines.append(f"# TYPE mygizmo_{metric} counter")
+        lines += [f'mygizmo_{metric}{{endpoint="{_prom_escape(endpoint)}"}} {r[field] / scale if scale != 1 else r[field]}' for endpoint, r in routes.items()]
+    for metric, field, scale in (("db_max_queries", "max_queries", 1), ("db_max_seconds", "max_db_ms", 1000)):
+        lines.append(f"# TYPE mygizmo_{metric} gauge")
+        lines += [f'mygizmo_{metric}{{endpoint="{_prom_escape(endpoint)}"}} {r[field] / scale if scale != 1 else r[field]}' for endpoint, r in routes.items()]
+    lines += ["# TYPE mygizmo_db_query_budget gauge", f"mygizmo_db_query_budget {report['budget']}"]
+    models = bg_engine.stats()
+    for metric, field in (("rembg_requests_total", "requests"), ("rembg_errors_total", "errors")):
+        lines.append(f"# TYPE mygizmo_{metric} counter")
+        lines += [f'mygizmo_{metric}{{model="{_prom_escape(model)}"}} {st[field]}' for model, st in models.items()]
+    for metric, field in (("rembg_latency_seconds", "latency_ms"), ("rembg_inference_seconds", "inference_ms")):
+        # সাম্প্রতিক ১০০০ রিকোয়েস্টের পার্সেন্টাইল (হিস্টোগ্রাম stage_seconds{stage="rembg"}-এও আছে)
+        lines.append(f"# TYPE mygizmo_{metric} gauge")
+        lines += [f'mygizmo_{metric}{{model="{_prom_escape(model)}",quantile="{q}"}} {value / 1000}'
+                  for model, st in models.items() for q, value in (("0.5", st[field]["p50"]), ("0.95", st[field]["p95"]), ("1", st[field].get("max"))) if value is not None]
+    for prefix, values in (("user_cache", user_cache.stats()), ("result_cache", result_cache.stats()), ("page_cache", page_cache.stats()),
+                           ("qr_cache", qr_engine.stats()), ("qr_disk_cache", qr_disk_cache.stats()), ("watermark_cache", watermark_tiles.stats()), ("password_hash", password_hasher.stats()), ("billing", customer_provisioner.stats()),
+                           ("file_sweeper", user_file_sweeper.stats())):
+        _prom_gauges(f"mygizmo_{prefix}", values, lines)
+    lines += ["# TYPE mygizmo_billing_breaker_open gauge", f"mygizmo_billing_breaker_open {int(billing_breaker.state == 'open')}"]
+    try: lines += ["# TYPE mygizmo_process_resident_memory_bytes gauge", f"mygizmo_process_resident_memory_bytes {_proc_status_kb('VmRSS') * 1024}"]
+    except OSError: pass
+    lines += ["# TYPE mygizmo_process_peak_resident_memory_bytes gauge", f"mygizmo_process_peak_resident_memory_bytes {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}",
+              "# TYPE mygizmo_process_boot_seconds gauge", f"mygizmo_process_boot_seconds {_boot_seconds:.4f}", "# TYPE mygizmo_lazy_module_loaded gauge"]
+    lines += [f'mygizmo_lazy_module_loaded{{module="{m.__name__}"}} {int(not isinstance(m, LazyModule) or m.loaded)}' for modules in LAZY_BACKENDS.values() for m in modules]
+    lines += ["# TYPE mygizmo_lazy_module_load_seconds gauge"] + [f'mygizmo_lazy_module_load_seconds{{module="{name}"}} {seconds:.4f}' for name, seconds in LAZY_IMPORT_TIMINGS.items()]
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+# --- নতুন সংযোজন: স্টার্টআপ টাইমিং ---
+@app.cli.command('startup-report')
+@click.option('--top', default=25, show_default=True, help='কয়টি সবচেয়ে ধীর import দেখানো হবে')
+@click.option('--preload', default='', help="তুলনার জন্য PRELOAD_BACKENDS (যেমন 'all')")
+def startup_report(top, preload):
+    """নতুন প্রসেসে `import app` চালিয়ে মোট সময়, পিক RSS ও প্রতিটি import-এর সময় (python -X importtime)।"""
+    env = dict(os.environ, PRELOAD_BACKENDS=preload)
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode: raise click.ClickException(proc.stderr[-2000:])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line: continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    peak_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    click.echo(f"import app: {wall:.2f}s wall, peak RSS {peak_kb / 1024:.1f} MiB, {len(rows)} modules (PRELOAD_BACKENDS={preload or '-'})")
+    click.echo(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        click.echo(f"{cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f} {name}")
+
+# --- নতুন সংযোজন: ব্যাকগ্রাউন্ড জবের স্ট্যাটাস ও রেজাল্ট রুট ---
+def _get_job_or_404(job_id):
+    job = db.session.get(Job, job_id)
+    # অন্য ইউজারের জব দেখা যাবে না; লগইন ছাড়া জমা দেওয়া জবের ক্ষেত্রে job id নিজেই অ্যাক্সেস টোকেন
+    if job is None or (job.user_id and (not current_user.is_authenticated or current_user.id != job.user_id)): abort(404)
+    return job
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = _get_job_or_404(job_id)
+    progress = 1.0 if job.status == 'done' else 0.0; stage = job.status
+    if job.status == 'running':
+        info = read_job_progress(os.path.join(app.config['JOBS_FOLDER'], job.id))
+        if info: progress = info.get('progress', 0.0); stage = info.get('stage', stage)
+        else: stage = 'waiting'
+    data = {'job_id': job.id, 'kind': job.kind, 'status': job.status, 'stage': stage, 'progress': progress,
+            'created_at': job.created_at.isoformat(), 'finished_at': job.finished_at.isoformat() if job.finished_at else None}
+    if job.error: data['error'] = job.error
+    if job.warnings: data['warnings'] = json.loads(job.warnings)
+    if job.status == 'done': data['result_url'] = url_for('job_result', job_id=job.id)
+    return jsonify(data)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = _get_job_or_404(job_id)
+    if job.status != 'done': return jsonify(error=f"Job is {job.status}", status=job.status), 409
+    result_path = os.path.join(app.config['JOBS_FOLDER'], job.id, job.result_filename)
+    if not os.path.exists(result_path): abort(410)
+    # ডিস্ক থেকে সরাসরি স্ট্রিম করা হয়, পুরো ফাইল মেমরিতে লোড হয় না
+    return send_file(result_path, as_attachment=True, download_name=job.download_name, mimetype=job.mimetype)
+
+# --- নতুন সংযোজন: ঐচ্ছিক প্রিলোড (gunicorn --preload হলে মাস্টারে একবার, ওয়ার্কাররা copy-on-write-এ শেয়ার করে) ---
+if app.config['PRELOAD_BACKENDS']: preload_backends(app.config['PRELOAD_BACKENDS'])
+_boot_seconds = time.perf_counter() - _boot_started
 
 # --- অ্যাপ রান করুন ---
 if __name__ == '__main__':
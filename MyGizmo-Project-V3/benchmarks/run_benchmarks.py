@@ -0,0 +1,318 @@
+"""MyGizmo বেঞ্চমার্ক ও লোড-টেস্ট স্যুট।
+
+সিনথেটিক ফিক্সচার (বিভিন্ন মেগাপিক্সেলের JPEG, মাল্টি-পেজ PDF) তৈরি করে Flask টেস্ট ক্লায়েন্ট দিয়ে প্রতিটি টুল
+এন্ডপয়েন্ট এবং হেল্পার ফাংশনগুলো সরাসরি চালায়। Stripe (BILLING_CLIENT=stub) ও rembg মডেল লোকালি স্টাব করা থাকে,
+তাই নেটওয়ার্ক বা মডেল ডাউনলোড লাগে না। প্রতিটি সিনারিওর throughput, p50/p99 ল্যাটেন্সি ও পিক RSS JSON-এ যায়,
+যাতে দুটি কমিটের ফলাফল তুলনা করা যায়:
+
+    python benchmarks/run_benchmarks.py --out before.json
+    git checkout <other-commit>
+    python benchmarks/run_benchmarks.py --out after.json --compare before.json
+
+--quick ছোট ফিক্সচার ও কম রিপিটে দ্রুত একটি স্মোক রান দেয়; --only <substring> দিয়ে নির্দিষ্ট সিনারিও বাছা যায়।
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", help="ফলাফলের JSON ফাইল (না দিলে stdout)")
+    parser.add_argument("--compare", help="আগের রানের JSON; p50 ও throughput-এর পরিবর্তন দেখায়, আর সেখানে ok থাকা কোনো সিনারিও এখন error হলে exit code 1")
+    parser.add_argument("--fail-threshold", type=float, default=0.0, help="যেমন 0.2: কোনো সিনারিওর p50 ২০%%-এর বেশি বাড়লে exit code 1")
+    parser.add_argument("--only", action="append", default=[], help="শুধু যেসব সিনারিওর নামে এই অংশ আছে")
+    parser.add_argument("--repeat", type=int, default=None, help="প্রতিটি সিনারিও কতবার (ডিফল্ট: সিনারিও অনুযায়ী)")
+    parser.add_argument("--quick", action="store_true", help="ছোট ফিক্সচার ও কম রিপিট")
+    parser.add_argument("--image-workers", type=int, default=1, help="IMAGE_WORKERS; 1 = সব কাজ এই প্রসেসে (RSS মাপা সহজ)")
+    parser.add_argument("--rembg-latency-ms", type=float, default=50.0, help="স্টাব rembg মডেলের প্রতি ছবির কৃত্রিম ইনফারেন্স সময়")
+    parser.add_argument("--bcrypt-cost", type=int, default=None, help="BCRYPT_LOG_ROUNDS (ডিফল্ট: অ্যাপের কনফিগ)")
+    parser.add_argument("--with-result-cache", action="store_true", help="রেজাল্ট ক্যাশ চালু রেখে মাপা (ডিফল্ট: বন্ধ, যাতে প্রতিবার আসল প্রসেসিং হয়)")
+    parser.add_argument("--workdir", help="DB/ক্যাশ/ফিক্সচারের ফোল্ডার (ডিফল্ট: টেম্প, শেষে মুছে যায়)")
+    return parser.parse_args(argv)
+
+
+# --- পরিবেশ: অ্যাপ import করার আগেই সেট করতে হয় ---
+def configure_environment(args, workdir):
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+    os.environ["BILLING_CLIENT"] = "stub"
+    os.environ["BILLING_STUB_LATENCY_MS"] = "0"
+    os.environ["IMAGE_WORKERS"] = str(args.image_workers)
+    os.environ["REMBG_WORKERS"] = "0" # স্টাব মডেলটি এই প্রসেসেই চলে
+    os.environ["REMBG_PRELOAD"] = "0"
+    os.environ["RESULT_CACHE_ENABLED"] = "1" if args.with_result_cache else "0"
+    os.environ["PRELOAD_BACKENDS"] = ""
+    if args.bcrypt_cost: os.environ["BCRYPT_LOG_ROUNDS"] = str(args.bcrypt_cost)
+    # অ্যাপ import এর সময়েই ফোল্ডার পড়ে (ও তৈরি করে), তাই পরে config.update করলে রিপোর ফোল্ডারে ডেটা লেখা হয়ে যেত
+    for key, name in (("RESULT_CACHE_FOLDER", "result_cache"), ("JOBS_FOLDER", "job_queue"), ("USER_FILES_FOLDER", "user_files"),
+                      ("PAGE_CACHE_FOLDER", "page_cache"), ("ASSET_BUILD_FOLDER", "asset_build"), ("PROCESSED_FOLDER", "processed"),
+                      ("QR_DISK_CACHE_FOLDER", "qr_cache"), ("METRICS_PROFILE_FOLDER", "profiles")):
+        os.environ[key] = os.path.join(workdir, name)
+
+
+def load_app(args, workdir):
+    sys.path.insert(0, BASE_DIR)
+    import app as A
+    A.app.config.update(WTF_CSRF_ENABLED=False, TESTING=True, METRICS_PROFILE_RATE=0)
+    for key in ("RESULT_CACHE_FOLDER", "JOBS_FOLDER", "USER_FILES_FOLDER", "PAGE_CACHE_FOLDER", "PROCESSED_FOLDER"):
+        if not A.app.config[key].startswith(workdir): raise RuntimeError(f"{key} is outside the benchmark workdir")
+        os.makedirs(A.app.config[key], exist_ok=True)
+    stub_rembg(A, args.rembg_latency_ms / 1000)
+    with A.app.app_context(): A.db.drop_all(); A.db.create_all()
+    return A
+
+
+def stub_rembg(A, latency):
+    # আসল মডেলের বদলে: কৃত্রিম ইনফারেন্স সময় + উপবৃত্তাকার মাস্ক; ইঞ্জিনের ব্যাচিং, কিউ ও PNG এনকোড আসল পথেই চলে
+    from PIL import Image, ImageDraw
+    def remove(img, session=None, only_mask=False):
+        time.sleep(latency)
+        mask = Image.new("L", img.size, 0); ImageDraw.Draw(mask).ellipse((img.width // 8, img.height // 8, img.width * 7 // 8, img.height * 7 // 8), fill=255)
+        if only_mask: return mask
+        out = img.convert("RGBA"); out.putalpha(mask); return out
+    A.rembg = SimpleNamespace(remove=remove, new_session=lambda model, sess_opts=None: SimpleNamespace(model=model))
+
+
+# --- সিনথেটিক ফিক্সচার ---
+class Fixtures:
+    def __init__(self, workdir):
+        self.folder = os.path.join(workdir, "fixtures"); os.makedirs(self.folder, exist_ok=True); self._cache = {}
+    def jpeg(self, megapixels, seed=0, quality=90):
+        # মসৃণ গ্রেডিয়েন্ট + নয়েজ: আসল ছবির কাছাকাছি JPEG সাইজ ও ডিকোড খরচ; একই seed = একই বাইট
+        key = ("jpeg", megapixels, seed, quality)
+        if key not in self._cache:
+            import numpy as np
+            from PIL import Image
+            width = int((megapixels * 1e6 * 4 / 3) ** 0.5); height = int(width * 3 / 4)
+            rng = np.random.default_rng(seed)
+            x = np.linspace(0, 1, width, dtype=np.float32)[None, :]; y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+            base = np.stack([x * 200 + y * 40, (1 - x) * 120 + y * 100, x * 0 + y * 180 + 30], axis=-1)
+            pixels = np.clip(base + rng.normal(0, 12, (height, width, 3)), 0, 255).astype(np.uint8)
+            buf = io.BytesIO(); Image.fromarray(pixels, "RGB").save(buf, "JPEG", quality=quality)
+            self._cache[key] = buf.getvalue()
+        return self._cache[key]
+    def png_logo(self):
+        if "logo" not in self._cache:
+            from PIL import Image, ImageDraw
+            logo = Image.new("RGBA", (600, 300), (0, 0, 0, 0)); draw = ImageDraw.Draw(logo)
+            draw.rounded_rectangle((10, 10, 590, 290), 40, fill=(242, 108, 36, 220)); draw.ellipse((220, 60, 380, 240), fill=(255, 255, 255, 255))
+            buf = io.BytesIO(); logo.save(buf, "PNG"); self._cache["logo"] = buf.getvalue()
+        return self._cache["logo"]
+    def pdf(self, pages, megapixels=1.0):
+        # প্রতিটি পেজে টেক্সট ও একটি ছবি সহ মাল্টি-পেজ PDF
+        key = ("pdf", pages, megapixels)
+        if key not in self._cache:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.utils import ImageReader
+            from reportlab.pdfgen import canvas
+            buf = io.BytesIO(); c = canvas.Canvas(buf, pagesize=A4); image = ImageReader(io.BytesIO(self.jpeg(megapixels, seed=99)))
+            for page in range(pages):
+                c.setFont("Helvetica", 14); c.drawString(72, 770, f"MyGizmo benchmark page {page + 1}")
+                for line in range(30): c.drawString(72, 740 - line * 14, "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 2)
+                c.drawImage(image, 72, 72, width=450, height=250); c.showPage()
+            c.save(); self._cache[key] = buf.getvalue()
+        return self._cache[key]
+
+
+# --- মাপজোখ ---
+def _percentile(values, q):
+    ordered = sorted(values); return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+def _rss_reset():
+    # Linux-এ VmHWM রিসেট করে বর্তমান RSS (KiB); অন্যত্র None
+    try:
+        with open("/proc/self/clear_refs", "w") as fh: fh.write("5")
+        return _status_kb("VmRSS")
+    except OSError: return None
+def _status_kb(field):
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith(field + ":"): return int(line.split()[1])
+
+
+def measure(name, fn, repeat, kind, params, items=1, megapixels=None):
+    fn() # ওয়ার্ম-আপ (lazy import, ফন্ট/টাইল ক্যাশ, সেশন) — মাপের বাইরে
+    baseline = _rss_reset(); latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(); latencies.append(time.perf_counter() - t)
+    total = time.perf_counter() - started
+    peak_kb = _status_kb("VmHWM") - baseline if baseline is not None else None
+    result = {"name": name, "kind": kind, "params": params, "iterations": repeat, "status": "ok",
+              "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3), "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+              "mean_ms": round(total / repeat * 1000, 3), "throughput_per_s": round(repeat / total, 3), "items_per_s": round(repeat * items / total, 3),
+              "peak_rss_delta_mib": round(peak_kb / 1024, 2) if peak_kb is not None else None}
+    if megapixels: result["megapixels_per_s"] = round(repeat * items * megapixels / total, 3)
+    return result
+
+
+# --- সিনারিওগুলো ---
+def scenarios(A, fx, quick):
+    # প্রতিটি আইটেম: (name, kind, params, repeat, items, megapixels, factory) — factory() একটি কল করার মতো ফাংশন দেয়
+    from PIL import Image
+    client = A.app.test_client(); sizes = (1, 4) if quick else (2, 12, 24); batches = (1, 4) if quick else (1, 4, 16)
+    def post(path, data, expect=(200,), content_type=None):
+        def call():
+            r = client.post(path, data=data() if callable(data) else data, content_type=content_type or ("multipart/form-data" if callable(data) else None))
+            body = r.get_data(); r.close()
+            if r.status_code not in expect: raise RuntimeError(f"{path} -> {r.status_code}: {body[:200]!r}")
+        return call
+    def get(path):
+        def call():
+            r = client.get(path); r.get_data(); r.close()
+            if r.status_code != 200: raise RuntimeError(f"{path} -> {r.status_code}")
+        return call
+    def uploads(blobs, name="image.jpg"):
+        return [(io.BytesIO(b), f"{i}_{name}") for i, b in enumerate(blobs)]
+    items = []
+    # হেল্পার ফাংশন সরাসরি
+    # ফিক্সচারগুলো factory() চলার সময় তৈরি হয়, যাতে --only দিয়ে বাদ পড়া সিনারিওর বড় ছবি বানাতে না হয়
+    studio_opts = A.parse_studio_options({"width": "800", "keep_aspect": "on", "watermark_text": "© MyGizmo", "output_format": "JPEG"})
+    def studio(mp):
+        data = fx.jpeg(mp); return lambda: A.studio_process_image(data, studio_opts, fx.png_logo())
+    def watermarks(mp):
+        with Image.open(io.BytesIO(fx.jpeg(mp))) as im: frame = im.convert("RGB")
+        return lambda: A.add_text_watermark(A.add_image_watermark(frame.copy(), fx.png_logo(), "bottom-right", 0.5, 0.2), "© MyGizmo", "center", 0.5, 48)
+    def jpg_to_pdf(batch):
+        blobs = [fx.jpeg(2, seed=i) for i in range(batch)]; return lambda: A.convert_jpg_to_pdf([io.BytesIO(b) for b in blobs])
+    def pdf_from_images(batch):
+        blobs = [fx.jpeg(2, seed=i) for i in range(batch)]; return lambda: A.make_pdf_from_images([io.BytesIO(b) for b in blobs], io.BytesIO())
+    for mp in sizes:
+        items.append((f"helper.studio_process_image[{mp}MP]", "helper", {"megapixels": mp, "width": 800, "watermark": "text+image"}, 3 if mp >= 12 else 10, 1, mp,
+                      lambda mp=mp: studio(mp)))
+    for mp in sizes[:2]:
+        items.append((f"helper.add_watermarks[{mp}MP]", "helper", {"megapixels": mp}, 20, 1, mp, lambda mp=mp: watermarks(mp)))
+    for batch in batches:
+        items.append((f"helper.convert_jpg_to_pdf[batch={batch}]", "helper", {"batch": batch, "megapixels": 2}, 5, batch, 2, lambda batch=batch: jpg_to_pdf(batch)))
+        items.append((f"helper.make_pdf_from_images[batch={batch}]", "helper", {"batch": batch, "megapixels": 2}, 5, batch, 2, lambda batch=batch: pdf_from_images(batch)))
+    items.append(("helper.render_qr[png,300]", "helper", {"size": 300}, 50, 1, None, lambda: (lambda: A.render_qr(f"https://example.com/{time.perf_counter_ns()}", 300, "M", "png"))))
+    def slug_batch():
+        titles = [f"Benchmark title number {i} — ঢাকা" for i in range(1000)]
+        def call():
+            with A.app.app_context(): A.unique_slugs([A.make_slug(t) for t in titles])
+        return call
+    items.append(("helper.unique_slugs[1000]", "helper", {"titles": 1000}, 10, 1000, None, slug_batch))
+    # এন্ডপয়েন্ট (টেস্ট ক্লায়েন্ট): প্রতিটি রিকোয়েস্টে পুরো বডি পড়া হয়, তাই স্ট্রিমিং ZIP-এর কাজও মাপের ভেতরে
+    for mp in sizes[:2]:
+        for batch in batches:
+            for fmt in ("JPEG", "PDF"):
+                form = lambda mp=mp, batch=batch, fmt=fmt: {"images": uploads([fx.jpeg(mp, seed=i) for i in range(batch)]), "watermark_image": (io.BytesIO(fx.png_logo()), "logo.png"),
+                                                     "watermark_text": "© MyGizmo", "width": "1200", "keep_aspect": "on", "output_format": fmt}
+                items.append((f"POST /process[{fmt},{mp}MP,batch={batch}]", "endpoint", {"format": fmt, "megapixels": mp, "batch": batch}, 3 if batch * mp >= 48 else 5,
+                              batch, mp, lambda form=form: post("/process", form)))
+    for batch in batches:
+        items.append((f"POST /convert[jpg_to_pdf,batch={batch}]", "endpoint", {"batch": batch, "megapixels": 2}, 5, batch, 2,
+                      lambda batch=batch: post("/convert", lambda: {"conversion_type": "jpg_to_pdf", "file": uploads([fx.jpeg(2, seed=i) for i in range(batch)])})))
+    pages = 4 if quick else 20
+    items.append((f"POST /convert[pdf_to_jpg,pages={pages}]", "endpoint", {"pages": pages, "dpi": 150}, 3, pages, None,
+                  lambda: post("/convert", lambda: {"conversion_type": "pdf_to_jpg", "dpi": "150", "file": [(io.BytesIO(fx.pdf(pages)), "doc.pdf")]})))
+    for mp in sizes[:2]:
+        items.append((f"POST /ai-background-remover[{mp}MP,stub]", "endpoint", {"megapixels": mp, "rembg": "stub"}, 5, 1, mp,
+                      lambda mp=mp: post("/ai-background-remover", lambda: {"image_file": (io.BytesIO(fx.jpeg(mp)), "photo.jpg")})))
+    items.append(("POST /qr-generator", "endpoint", {}, 30, 1, None, lambda: post("/qr-generator", {"url": "https://example.com/qr", "size": "300"})))
+    def qr_csv():
+        out = io.StringIO(); writer = csv.writer(out)
+        for i in range(100): writer.writerow([f"https://example.com/item/{i}", f"item-{i}"])
+        return out.getvalue().encode()
+    items.append(("POST /qr-generator/bulk[100]", "endpoint", {"rows": 100}, 5, 100, None,
+                  lambda: post("/qr-generator/bulk", lambda: {"csv_file": (io.BytesIO(qr_csv()), "codes.csv"), "format": "png"})))
+    items.append(("POST /generate-slugs[1000]", "endpoint", {"titles": 1000}, 10, 1000, None,
+                  lambda: post("/generate-slugs", json.dumps({"texts": [f"Hello world {i}" for i in range(1000)]}), content_type="application/json")))
+    for path in ("/", "/tools", "/blog", "/about"):
+        items.append((f"GET {path}", "endpoint", {}, 50, 1, None, lambda path=path: get(path)))
+    counter = iter(range(10 ** 9))
+    def register_login():
+        def call():
+            n = next(counter); email = f"bench{n}@example.com"
+            post("/register", {"username": f"bench{n:06d}", "email": email, "password": "secret123", "confirm_password": "secret123"}, (302,))()
+            post("/login", {"email": email, "password": "secret123"}, (302,))(); get_logout()
+        return call
+    def get_logout(): r = client.get("/logout"); r.close()
+    items.append(("POST /register+/login[stub billing]", "endpoint", {"bcrypt_cost": A.app.config["BCRYPT_LOG_ROUNDS"]}, 5, 1, None, register_login))
+    events = [open(os.path.join(BASE_DIR, "fixtures", "stripe", f), "rb").read() for f in sorted(os.listdir(os.path.join(BASE_DIR, "fixtures", "stripe")))]
+    def webhook():
+        def call():
+            for raw in events:
+                event = json.loads(raw); event["id"] = f"{event['id']}_{time.perf_counter_ns()}"
+                r = client.post("/stripe-webhook", data=json.dumps(event)); r.close()
+                if r.status_code != 200: raise RuntimeError(f"/stripe-webhook -> {r.status_code}")
+        return call
+    items.append(("POST /stripe-webhook[4 events]", "endpoint", {"events": len(events)}, 20, len(events), None, webhook))
+    return items
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="mygizmo-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    configure_environment(args, workdir)
+    A = load_app(args, workdir); fx = Fixtures(workdir)
+    results = []
+    try:
+        for name, kind, params, repeat, items, megapixels, factory in scenarios(A, fx, args.quick):
+            if args.only and not any(part in name for part in args.only): continue
+            repeat = args.repeat or (max(1, repeat // 3) if args.quick else repeat)
+            print(f"{name} ...", end=" ", file=sys.stderr, flush=True)
+            try: result = measure(name, factory(), repeat, kind, params, items, megapixels)
+            except Exception as e: result = {"name": name, "kind": kind, "params": params, "status": "error", "error": f"{type(e).__name__}: {e}"[:300]}
+            print(f"error ({result['error']})" if result["status"] != "ok" else f"p50 {result['p50_ms']} ms", file=sys.stderr)
+            results.append(result)
+    finally:
+        if not args.workdir: shutil.rmtree(workdir, ignore_errors=True)
+    return {"meta": metadata(A, args), "results": results}
+
+
+def metadata(A, args):
+    try: commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError: commit = None
+    import PIL
+    return {"commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "pillow": PIL.__version__, "quick": args.quick,
+            "image_workers": args.image_workers, "result_cache": args.with_result_cache, "rembg_latency_ms": args.rembg_latency_ms,
+            "bcrypt_cost": A.app.config["BCRYPT_LOG_ROUNDS"], "process_peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def compare(current, baseline_path, threshold):
+    # রিটার্ন: রিগ্রেশনের সংখ্যা — p50 বৃদ্ধি > threshold, অথবা baseline-এ ok ছিল এমন সিনারিও এখন error (threshold যাই হোক)
+    with open(baseline_path) as fh: baseline = {r["name"]: r for r in json.load(fh)["results"] if r.get("status") == "ok"}
+    regressions = 0
+    print(f"\n{'scenario':<48} {'p50 ms':>10} {'Δ p50':>8} {'ops/s':>9} {'Δ ops/s':>8}")
+    for r in current["results"]:
+        old = baseline.get(r["name"])
+        if r.get("status") != "ok":
+            if old: regressions += 1; print(f"{r['name']:<48} {'error':>10}  <-- was ok in baseline: {r.get('error')}")
+            continue
+        if not old: print(f"{r['name']:<48} {r['p50_ms']:>10.1f} {'new':>8} {r['throughput_per_s']:>9.2f}"); continue
+        d_p50 = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] if old["p50_ms"] else 0.0
+        d_ops = (r["throughput_per_s"] - old["throughput_per_s"]) / old["throughput_per_s"] if old["throughput_per_s"] else 0.0
+        flag = ""
+        if threshold and d_p50 > threshold: regressions += 1; flag = "  <-- regression"
+        print(f"{r['name']:<48} {r['p50_ms']:>10.1f} {d_p50:>+8.1%} {r['throughput_per_s']:>9.2f} {d_ops:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh: fh.write(text + "\n")
+    else: print(text)
+    regressions = compare(report, args.compare, args.fail_threshold) if args.compare else 0
+    # অ্যাপের ব্যাকগ্রাউন্ড থ্রেড/পুল (জব ওয়ার্কার, অ্যাসেট বিল্ড) অপেক্ষা না করে বের হওয়া
+    sys.stdout.flush(); sys.stderr.flush()
+    os._exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
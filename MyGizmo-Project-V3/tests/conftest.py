@@ -0,0 +1,79 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pytest
+from PIL import Image
+
+# অ্যাপ import এর সময়েই কনফিগ ও ফোল্ডার পড়ে, তাই env আগে সেট করতে হয়: DB ও সব রানটাইম ফোল্ডার একটি টেম্প ফোল্ডারে,
+# Stripe কাস্টমার তৈরি স্টাব ক্লায়েন্টে, bcrypt কম cost-এ
+WORKDIR = tempfile.mkdtemp(prefix="mygizmo-tests-")
+os.environ.update({
+    "DATABASE_URL": "sqlite:///" + os.path.join(WORKDIR, "test.db"),
+    "BILLING_CLIENT": "stub", "BILLING_STUB_LATENCY_MS": "0", "STRIPE_WEBHOOK_SECRET": "",
+    "BCRYPT_LOG_ROUNDS": "4", "JOB_WORKERS": "1", "IMAGE_WORKERS": "1", "REMBG_PRELOAD": "0", "REMBG_WORKERS": "0", "PRELOAD_BACKENDS": "",
+})
+for key, name in (("RESULT_CACHE_FOLDER", "result_cache"), ("JOBS_FOLDER", "job_queue"), ("USER_FILES_FOLDER", "user_files"),
+                  ("PAGE_CACHE_FOLDER", "page_cache"), ("ASSET_BUILD_FOLDER", "asset_build"), ("PROCESSED_FOLDER", "processed"),
+                  ("QR_DISK_CACHE_FOLDER", "qr_cache"), ("METRICS_PROFILE_FOLDER", "profiles")):
+    os.environ[key] = os.path.join(WORKDIR, name)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import app as mygizmo  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(mygizmo.__file__), "fixtures")
+
+
+@pytest.fixture
+def A(monkeypatch):
+    # প্রতিটি টেস্টে খালি DB ও খালি ইন-মেমরি পেজ ক্যাশ; Stripe ওয়ার্কার থ্রেড চালু হয় না, টেস্ট নিজে apply_stripe_events ডাকে।
+    # টেস্টের পুরো সময় app context খোলা রাখা হয় না: তাহলে ক্লায়েন্টের রিকোয়েস্টগুলো একই g শেয়ার করত (Flask-Login এর ইউজারসহ),
+    # তাই সরাসরি DB কাজ টেস্টে `with A.app.app_context():` ব্লকে হয়
+    mygizmo.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    monkeypatch.setattr(mygizmo.stripe_event_worker, "wake", lambda: None)
+    with mygizmo.app.app_context():
+        mygizmo.db.drop_all(); mygizmo.db.create_all()
+    mygizmo.page_cache._entries.clear(); mygizmo.user_cache._local.clear() # নতুন DB-তে একই id আবার আসে
+    return mygizmo
+
+
+@pytest.fixture
+def client(A):
+    return A.app.test_client()
+
+
+@pytest.fixture
+def make_user(A):
+    # রিটার্ন: নতুন ইউজারের id
+    def make(username="alice", stripe_customer_id=None, subscription_status="inactive"):
+        with A.app.app_context():
+            user = A.User(username=username, email=f"{username}@example.com", password="secret123",
+                          stripe_customer_id=stripe_customer_id, subscription_status=subscription_status)
+            A.db.session.add(user); A.db.session.commit()
+            return user.id
+    return make
+
+
+def image_bytes(mode, size, fmt, color):
+    buf = io.BytesIO(); Image.new(mode, size, color).save(buf, fmt); return buf.getvalue()
+
+
+def login(client, user_id):
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id); sess["_fresh"] = True
+
+
+def wait_for_job(client, status_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = client.get(status_url).get_json()
+        if data["status"] in ("done", "failed"): return data
+        time.sleep(0.1)
+    pytest.fail(f"job did not finish: {data}")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
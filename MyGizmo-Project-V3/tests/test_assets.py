@@ -0,0 +1,50 @@
+import gzip
+import json
+import os
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def manifest(A, tmp_path, monkeypatch):
+    # নিজস্ব ছোট static/ ফোল্ডার ও বিল্ড ফোল্ডার; রুটগুলো এই ম্যানিফেস্টই দেখে
+    static = tmp_path / "static"; (static / "css").mkdir(parents=True); (static / "uploads_studio").mkdir()
+    (static / "css" / "site.css").write_text("body { color: black; }\n" * 200)
+    Image.effect_noise((64, 64), 60).convert("RGB").save(static / "logo.png")
+    (static / "uploads_studio" / "user.png").write_bytes(b"not an asset")
+    monkeypatch.setattr(A, "STATIC_FOLDER", str(static))
+    manifest = A.AssetManifest(dict(A.app.config, ASSET_BUILD_FOLDER=str(tmp_path / "build")))
+    monkeypatch.setattr(A, "asset_manifest", manifest)
+    return manifest
+
+
+def test_build_writes_hashed_files_and_manifest(A, manifest):
+    entries = manifest.build()
+    assert sorted(entries) == ["css/site.css", "logo.png"] # ইউজারের আপলোড ফোল্ডার বাদ
+    css = entries["css/site.css"]
+    assert css["hashed"].startswith("css/site.") and css["hashed"] != "css/site.css" and css["gzip"] == css["hashed"] + ".gz"
+    with gzip.open(os.path.join(manifest.folder, css["gzip"])) as fh: assert fh.read() == b"body { color: black; }\n" * 200
+    with open(os.path.join(manifest.folder, "manifest.json")) as fh: assert json.load(fh) == entries
+    assert manifest.build() == entries # পুনরায় বিল্ডে একই নাম
+
+
+def test_load_reads_manifest_or_falls_back(A, manifest):
+    with A.app.test_request_context():
+        assert manifest.load() == {} and manifest.url("logo.png") == "/static/logo.png"
+        manifest.build(); fresh = A.AssetManifest(manifest.config)
+        assert fresh.load() == manifest.entries
+        assert fresh.url("logo.png") == "/assets/" + manifest.entries["logo.png"]["hashed"]
+
+
+def test_hashed_asset_route(A, client, manifest):
+    entries = manifest.build()
+    url = "/assets/" + entries["css/site.css"]["hashed"]
+    r = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip" and "immutable" in r.headers["Cache-Control"]
+    assert client.get(url).data == b"body { color: black; }\n" * 200
+    logo = entries["logo.png"]
+    for mimetype in logo["variants"]:
+        assert client.get("/assets/" + logo["hashed"], headers={"Accept": mimetype}).mimetype == mimetype
+    assert client.get("/assets/" + logo["hashed"], headers={"Accept": "image/*"}).mimetype == "image/png"
+    assert client.get("/assets/css/site.css").status_code == 404
@@ -0,0 +1,78 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from conftest import image_bytes, wait_for_job
+
+
+@pytest.fixture
+def rembg(A, monkeypatch):
+    # আসল মডেলের বদলে: পুরো ছবির আলফা অর্ধেক; new_session কতবার ডাকা হলো গোনা হয়
+    sessions = []
+    def remove(img, session=None, only_mask=False):
+        if only_mask: return Image.new("L", img.size, 128)
+        out = img.convert("RGBA"); out.putalpha(128); return out
+    def new_session(model, sess_opts=None):
+        sessions.append(model); return SimpleNamespace(model=model)
+    monkeypatch.setattr(A, "rembg", SimpleNamespace(remove=remove, new_session=new_session))
+    monkeypatch.setattr(A, "_rembg_sessions", {})
+    A.app.config["RESULT_CACHE_ENABLED"] = False
+    yield sessions
+    A.app.config["RESULT_CACHE_ENABLED"] = True
+
+
+def requests_made(A):
+    return A.bg_engine.stats().get(A.app.config["REMBG_MODEL"], {}).get("requests", 0)
+
+
+def post_image(client, query=""):
+    data = {"image_file": (io.BytesIO(image_bytes("RGB", (60, 40), "JPEG", (0, 200, 0))), "photo.jpg")}
+    return client.post("/ai-background-remover" + query, data=data, content_type="multipart/form-data")
+
+
+def test_sync_removal_returns_png_and_reuses_session(A, client, rembg):
+    before = requests_made(A)
+    for _ in range(2):
+        r = post_image(client)
+        assert r.status_code == 200 and r.mimetype == "image/png" and "rembg;dur=" in r.headers["Server-Timing"]
+        with Image.open(io.BytesIO(r.data)) as img: assert img.mode == "RGBA" and img.size == (60, 40)
+    assert requests_made(A) == before + 2
+    assert rembg == [A.app.config["REMBG_MODEL"]] # প্রতি মডেলে একটি সেশন
+
+
+def test_async_job_runs_on_engine_not_job_pool(A, client, rembg, monkeypatch):
+    def no_pool(): raise AssertionError("bg_remove must not use the job pool")
+    monkeypatch.setattr(A, "get_job_executor", no_pool)
+    before = requests_made(A)
+    r = post_image(client, "?async=1")
+    assert r.status_code == 202
+    job = r.get_json()
+    assert wait_for_job(client, job["status_url"])["status"] == "done"
+    result = client.get(job["result_url"])
+    assert result.status_code == 200 and result.data.startswith(b"\x89PNG")
+    assert requests_made(A) == before + 1
+
+
+def test_async_job_failure_is_reported(A, client, rembg, monkeypatch):
+    def broken(img, session=None, only_mask=False): raise ValueError("model exploded")
+    monkeypatch.setattr(A.rembg, "remove", broken)
+    job = post_image(client, "?async=1").get_json()
+    data = wait_for_job(client, job["status_url"])
+    assert data["status"] == "failed" and "model exploded" in data["error"]
+
+
+def test_timeout_returns_503(A, client, rembg, monkeypatch):
+    def slow(data, model=None, timeout=None): raise TimeoutError("Background removal timed out")
+    monkeypatch.setattr(A.bg_engine, "remove", slow)
+    assert post_image(client).status_code == 503
+
+
+def test_engine_timeout_raises(A, rembg, monkeypatch):
+    release = A.threading.Event()
+    def remove(img, session=None, only_mask=False): release.wait(5); return img.convert("RGBA")
+    monkeypatch.setattr(A.rembg, "remove", remove)
+    try:
+        with pytest.raises(TimeoutError): A.bg_engine.remove(image_bytes("RGB", (10, 10), "PNG", (0, 0, 0)), timeout=0.05)
+    finally: release.set()
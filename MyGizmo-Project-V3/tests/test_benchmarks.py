@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import run_benchmarks  # noqa: E402
+
+
+def write_report(path, *results):
+    with open(path, "w") as fh: json.dump({"meta": {}, "results": list(results)}, fh)
+    return str(path)
+
+
+def ok(name, p50, ops=10.0):
+    return {"name": name, "status": "ok", "p50_ms": p50, "throughput_per_s": ops}
+
+
+def test_compare_counts_regressions(tmp_path, capsys):
+    baseline = write_report(tmp_path / "before.json", ok("fast", 10.0), ok("broken", 5.0), {"name": "still_broken", "status": "error", "error": "x"})
+    current = {"results": [ok("fast", 12.5), {"name": "broken", "status": "error", "error": "boom"}, {"name": "still_broken", "status": "error", "error": "x"}, ok("added", 1.0)]}
+    # ok থেকে error সবসময় রিগ্রেশন; p50 বৃদ্ধি (২৫%) শুধু threshold পেরোলে; নতুন বা আগেও ভাঙা সিনারিও নয়
+    assert run_benchmarks.compare(current, baseline, 0.0) == 1
+    assert run_benchmarks.compare(current, baseline, 0.3) == 1
+    assert run_benchmarks.compare(current, baseline, 0.2) == 2
+    out = capsys.readouterr().out
+    assert "was ok in baseline: boom" in out and "regression" in out and "new" in out
+
+
+def test_measure_reports_latency_and_throughput():
+    calls = []
+    result = run_benchmarks.measure("noop", lambda: calls.append(1), 4, "helper", {}, items=10, megapixels=2)
+    assert len(calls) == 5 # ওয়ার্ম-আপ সহ
+    assert result["status"] == "ok" and result["iterations"] == 4
+    assert result["items_per_s"] == pytest.approx(result["throughput_per_s"] * 10, rel=0.01)
+    assert result["megapixels_per_s"] == pytest.approx(result["items_per_s"] * 2, rel=0.01)
+    assert 0 <= result["p50_ms"] <= result["p99_ms"]
+
+
+@pytest.mark.parametrize("baseline_p50, exit_code", [(1e6, 0), (1e-6, 1)])
+def test_script_exit_code(tmp_path, baseline_p50, exit_code):
+    name = "helper.render_qr[png,300]"
+    baseline = write_report(tmp_path / "before.json", ok(name, baseline_p50))
+    out = tmp_path / "after.json"
+    proc = subprocess.run([sys.executable, os.path.join(BENCHMARKS_DIR, "run_benchmarks.py"), "--quick", "--repeat", "2", "--only", name,
+                           "--out", str(out), "--compare", baseline, "--fail-threshold", "0.5", "--workdir", str(tmp_path / "work")],
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode == exit_code, proc.stderr[-2000:]
+    report = json.loads(out.read_text())
+    assert [(r["name"], r["status"], r["iterations"]) for r in report["results"]] == [(name, "ok", 2)]
+    assert report["meta"]["quick"] is True
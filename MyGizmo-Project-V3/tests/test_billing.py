@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+
+def test_circuit_breaker_opens_probes_and_closes(A):
+    breaker = A.CircuitBreaker(failure_threshold=2, reset_seconds=0.05); calls = []
+    def failing(): calls.append("fail"); raise ConnectionError("down")
+    for _ in range(2):
+        with pytest.raises(ConnectionError): breaker.call(failing)
+    assert breaker.state == "open"
+    with pytest.raises(A.CircuitOpenError): breaker.call(failing)
+    assert len(calls) == 2 # খোলা অবস্থায় কল হয়ই না
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    with pytest.raises(ConnectionError): breaker.call(failing) # পরীক্ষামূলক কল ব্যর্থ: আবার খোলা
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_success_resets_failure_count(A):
+    breaker = A.CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    with pytest.raises(ValueError): breaker.call(lambda: int("x"))
+    breaker.call(lambda: None)
+    with pytest.raises(ValueError): breaker.call(lambda: int("x"))
+    assert breaker.state == "closed"
+
+
+@pytest.fixture
+def billing(A, monkeypatch):
+    # প্রতিটি টেস্টে নতুন ব্রেকার ও প্রোভিশনার; রিট্রাইয়ের মাঝে অপেক্ষা নেই
+    monkeypatch.setattr(A, "billing_breaker", A.CircuitBreaker(5, 30))
+    provisioner = A.CustomerProvisioner(dict(A.app.config, BILLING_RETRY_BASE_SECONDS=0, BILLING_MAX_ATTEMPTS=3))
+    monkeypatch.setattr(A, "customer_provisioner", provisioner)
+    return provisioner
+
+
+def wait_for_provisioning(provisioner, timeout=10):
+    deadline = time.monotonic() + timeout
+    while provisioner.stats()["pending"] and time.monotonic() < deadline: time.sleep(0.01)
+    assert not provisioner.stats()["pending"]
+
+
+def customer_id(A, username):
+    with A.app.app_context(): return A.User.query.filter_by(username=username).one().stripe_customer_id
+
+
+def test_register_creates_customer_out_of_band(A, client, billing):
+    form = {"username": "judy", "email": "judy@example.com", "password": "secret123", "confirm_password": "secret123"}
+    assert client.post("/register", data=form).status_code == 302
+    wait_for_provisioning(billing)
+    assert customer_id(A, "judy").startswith("cus_stub_") and billing.counters["created"] == 1
+
+
+def test_provisioning_retries_transient_failures(A, billing, make_user, monkeypatch):
+    make_user("kim"); attempts = []
+    real = A.billing_client.create_customer
+    def flaky(*args, **kwargs):
+        attempts.append(kwargs["idempotency_key"])
+        if len(attempts) < 3: raise ConnectionError("timeout")
+        return real(*args, **kwargs)
+    monkeypatch.setattr(A.billing_client, "create_customer", flaky)
+    with A.app.app_context(): user_id = A.User.query.filter_by(username="kim").one().id
+    billing.schedule(user_id); wait_for_provisioning(billing)
+    assert customer_id(A, "kim") and len(set(attempts)) == 1 # একই idempotency key, তাই Stripe-এ একটিই কাস্টমার
+    assert billing.counters == {"created": 1, "failed": 0, "retries": 2}
+
+
+def test_provisioning_gives_up_and_checkout_retries(A, billing, make_user, monkeypatch):
+    user_id = make_user("liam"); outage = [True]
+    real = A.billing_client.create_customer
+    def down(*args, **kwargs):
+        if outage: raise ConnectionError("down")
+        return real(*args, **kwargs)
+    monkeypatch.setattr(A.billing_client, "create_customer", down)
+    billing.schedule(user_id); wait_for_provisioning(billing)
+    assert customer_id(A, "liam") is None and billing.counters["failed"] == 1
+    outage.clear()
+    with A.app.app_context(): assert A.ensure_stripe_customer(user_id).startswith("cus_stub_")
@@ -0,0 +1,60 @@
+import html
+import re
+from datetime import datetime, timedelta, timezone
+
+from conftest import login
+
+
+def add_posts(A, author_id, count, start=datetime(2026, 1, 1)):
+    with A.app.app_context():
+        for i in range(count):
+            A.db.session.add(A.Post(title=f"Post number {i}", slug=f"post-{i}", content="Body", user_id=author_id, date_posted=start + timedelta(days=i)))
+        A.db.session.commit()
+
+
+def titles(r): return re.findall(r"Post number \d+", r.get_data(as_text=True))
+
+
+def next_page(r):
+    match = re.search(r'href="(/blog\?cursor=[^"]+)"', r.get_data(as_text=True))
+    return html.unescape(match.group(1)) if match else None
+
+
+def test_blog_is_paginated_by_keyset(A, client, make_user):
+    add_posts(A, make_user("carol"), 5)
+    A.app.config["BLOG_PAGE_SIZE"] = 2
+    try:
+        pages = []; url = "/blog"
+        while url:
+            r = client.get(url); pages.append(titles(r)); url = next_page(r)
+    finally: A.app.config["BLOG_PAGE_SIZE"] = 10
+    assert pages == [["Post number 4", "Post number 3"], ["Post number 2", "Post number 1"], ["Post number 0"]]
+    assert client.get("/blog?cursor=garbage").status_code == 400
+
+
+def test_blog_cache_is_invalidated_by_new_post(A, client, make_user):
+    author_id = make_user("carol")
+    assert b"Cached post title" not in client.get("/blog").data
+    with A.app.app_context():
+        A.db.session.add(A.Post(title="Cached post title", slug="cached-post-title", content="Body", user_id=author_id)); A.db.session.commit()
+    assert b"Cached post title" not in client.get("/blog").data # bump ছাড়া পুরনো কপি
+    A.page_cache.bump("blog")
+    assert b"Cached post title" in client.get("/blog").data
+
+
+def test_creating_a_post_refreshes_cached_pages(A, client, make_user):
+    assert b"Fresh from the form" not in client.get("/blog").data
+    author = A.app.test_client(); login(author, make_user("erin"))
+    assert author.post("/blog/new", data={"title": "Fresh from the form", "excerpt": "Short", "content": "Long body"}).status_code == 302
+    assert b"Fresh from the form" in client.get("/blog").data
+    assert b"Long body" in client.get("/blog/post/fresh-from-the-form").data
+
+
+def test_post_page_is_cached_with_last_modified(A, client, make_user):
+    add_posts(A, make_user("carol"), 1)
+    first = client.get("/blog/post/post-0")
+    assert first.last_modified == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    hits = A.page_cache.counters["hits"]
+    assert client.get("/blog/post/post-0").data == first.data and A.page_cache.counters["hits"] == hits + 1
+    assert client.get("/blog/post/missing").status_code == 404
+    assert client.get("/blog/post/missing").status_code == 404 and A.page_cache.counters["hits"] == hits + 1
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import sqlalchemy as sa
+
+
+def test_migrations_match_models(A, tmp_path):
+    # খালি ডাটাবেসে `flask db upgrade` এর পর টেবিল, কলাম ও ইনডেক্স মডেলের সাথে হুবহু মেলে
+    url = "sqlite:///" + str(tmp_path / "migrated.db")
+    env = dict(os.environ, DATABASE_URL=url, FLASK_APP="app")
+    root = os.path.dirname(A.__file__)
+    subprocess.run([sys.executable, "-m", "flask", "db", "upgrade"], cwd=root, env=env, check=True, capture_output=True, timeout=120)
+    inspector = sa.inspect(sa.create_engine(url))
+    assert set(inspector.get_table_names()) - {"alembic_version"} == set(A.db.metadata.tables)
+    for name, table in A.db.metadata.tables.items():
+        assert {c["name"] for c in inspector.get_columns(name)} == {c.name for c in table.columns}, name
+        assert {i["name"] for i in inspector.get_indexes(name)} == {i.name for i in table.indexes}, name
+
+
+def test_sqlite_connections_use_wal(A):
+    with A.app.app_context():
+        assert A.db.session.execute(sa.text("PRAGMA journal_mode")).scalar() == "wal"
+        assert A.db.session.execute(sa.text("PRAGMA busy_timeout")).scalar() == A.app.config["DB_BUSY_TIMEOUT_MS"]
+
+
+def test_queries_are_counted_per_route(A, client, make_user):
+    make_user("carol")
+    A.app.config["DB_QUERY_BUDGET"], budget = 0, A.app.config["DB_QUERY_BUDGET"]
+    try: r = client.get("/blog?fresh=1")
+    finally: A.app.config["DB_QUERY_BUDGET"] = budget
+    assert "db;dur=" in r.headers["Server-Timing"]
+    blog = A.query_stats.report()["routes"]["blog"]
+    assert blog["requests"] >= 1 and blog["max_queries"] >= 1 and blog["over_budget"] >= 1
+
+
+def test_query_stats_report(A):
+    stats = A.QueryStats({"DB_QUERY_BUDGET": 2})
+    stats.record("home", 1, 2.0); stats.record("home", 3, 4.0)
+    assert stats.report() == {"budget": 2, "routes": {"home": {"requests": 2, "queries": 4, "max_queries": 3, "db_ms": 6.0, "max_db_ms": 4.0,
+                                                               "over_budget": 1, "avg_queries": 2.0, "avg_db_ms": 3.0}}}
@@ -0,0 +1,82 @@
+import io
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture
+def sweeper(A, monkeypatch):
+    # টেস্ট নিজেই sweep() ডাকে; save_user_file-এর start()/wake() ব্যাকগ্রাউন্ড থ্রেড চালালে একই লক নিয়ে টানাটানি হতো
+    monkeypatch.setattr(A.user_file_sweeper, "start", lambda: None); monkeypatch.setattr(A.user_file_sweeper, "wake", lambda: None)
+    monkeypatch.setitem(A.app.config, "FILE_SWEEP_PAUSE_MS", 0)
+    def sweep():
+        with A.app.app_context(): return A.user_file_sweeper.sweep()
+    return sweep
+
+
+def save(A, user_id, size, name):
+    with A.app.app_context(): A.save_user_file(A.db.session.get(A.User, user_id), io.BytesIO(os.urandom(size)), name, "File Converter")
+
+
+def saved_names(A, user_id):
+    with A.app.app_context(): return [f.original_filename for f in A.UserFile.query.filter_by(user_id=user_id).order_by(A.UserFile.id)]
+
+
+def storage(A, user_id):
+    with A.app.app_context(): return A.user_storage(user_id)
+
+
+def test_retention_and_quota_are_off_by_default(A, make_user, sweeper):
+    alice = make_user("alice")
+    save(A, alice, 1000, "a.bin")
+    assert storage(A, alice) == {"used_bytes": 1000, "file_count": 1, "quota_bytes": None, "retention_days": None}
+    with A.app.app_context():
+        A.UserFile.query.update({"created_at": datetime.now(timezone.utc) - timedelta(days=3650)}); A.db.session.commit()
+    result = sweeper()
+    assert result["expired"] == 0 and result["evicted"] == 0 and saved_names(A, alice) == ["a.bin"]
+
+
+def test_retention_expires_old_files(A, make_user, sweeper, monkeypatch):
+    monkeypatch.setitem(A.app.config, "USER_FILE_RETENTION_DAYS", 30)
+    alice = make_user("alice")
+    save(A, alice, 100, "old.bin"); save(A, alice, 100, "new.bin")
+    with A.app.app_context():
+        A.UserFile.query.filter_by(original_filename="old.bin").update({"created_at": datetime.now(timezone.utc) - timedelta(days=31)}); A.db.session.commit()
+    assert sweeper()["expired"] == 1
+    assert saved_names(A, alice) == ["new.bin"] and storage(A, alice)["used_bytes"] == 100
+
+
+def test_quota_evicts_oldest_files_first(A, make_user, sweeper, monkeypatch):
+    monkeypatch.setitem(A.app.config, "USER_STORAGE_QUOTA_MB", 1)
+    monkeypatch.setitem(A.app.config, "USER_STORAGE_QUOTA_PRO_MB", 0)
+    alice, pro = make_user("alice"), make_user("pro", subscription_status="active")
+    for user_id in (alice, pro):
+        for name in ("1.bin", "2.bin", "3.bin"): save(A, user_id, 400 * 1024, name)
+    assert sweeper()["evicted"] == 1
+    assert saved_names(A, alice) == ["2.bin", "3.bin"] and storage(A, alice)["used_bytes"] == 800 * 1024
+    assert saved_names(A, pro) == ["1.bin", "2.bin", "3.bin"] # প্রো প্ল্যানে কোটা নেই
+
+
+def test_legacy_rows_get_their_size_from_disk(A, make_user, sweeper, monkeypatch):
+    # ব্লব স্টোরের আগের রো: file_size NULL, ফাইল সরাসরি USER_FILES_FOLDER-এ; সাইজ না জানলে কোটা এগুলোকে 0 বাইট ধরত
+    monkeypatch.setitem(A.app.config, "USER_STORAGE_QUOTA_MB", 1)
+    alice = make_user("alice")
+    legacy = f"{os.urandom(8).hex()}_scan.pdf"
+    with open(os.path.join(A.app.config["USER_FILES_FOLDER"], legacy), "wb") as fh: fh.write(os.urandom(700 * 1024))
+    with A.app.app_context():
+        A.db.session.add_all([A.UserFile(original_filename="scan.pdf", saved_filename=legacy, file_type="File Converter", user_id=alice,
+                                         created_at=datetime.now(timezone.utc) - timedelta(days=1)),
+                              A.UserFile(original_filename="gone.pdf", saved_filename=f"{os.urandom(8).hex()}_gone.pdf", file_type="File Converter", user_id=alice)])
+        A.db.session.commit()
+    save(A, alice, 500 * 1024, "new.bin")
+    assert storage(A, alice)["used_bytes"] == 500 * 1024
+    result = sweeper()
+    # দুটো রো-ই ভরাট হয় (হারানো ফাইল 0), তারপর কোটা ছাড়ানোয় সবচেয়ে পুরনো legacy ফাইলটি মুছে যায়
+    assert result["sizes_backfilled"] == 2 and result["evicted"] == 1
+    assert saved_names(A, alice) == ["gone.pdf", "new.bin"] and storage(A, alice)["used_bytes"] == 500 * 1024
+    assert not os.path.exists(os.path.join(A.app.config["USER_FILES_FOLDER"], legacy))
+    with A.app.app_context():
+        assert A.UserFile.query.filter_by(original_filename="gone.pdf").one().file_size == 0
+        assert A.recount_user_storage() and A.user_storage(alice)["used_bytes"] == 500 * 1024
+    assert sweeper()["sizes_backfilled"] == 0
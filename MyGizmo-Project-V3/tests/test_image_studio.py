@@ -0,0 +1,199 @@
+import io
+import os
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image, JpegImagePlugin
+
+from conftest import image_bytes, login
+
+
+def studio_opts(A, **form):
+    return A.parse_studio_options({"output_format": "PNG", **form})
+
+
+def output_sizes(outputs):
+    sizes = []
+    for _, data in outputs:
+        with Image.open(io.BytesIO(data)) as img: sizes.append(img.size)
+    return sizes
+
+
+# --- প্রসেস পুল (user-003) ---
+@pytest.fixture
+def image_pool(A):
+    A.app.config.update(IMAGE_WORKERS=2, IMAGE_PARALLEL_MIN_BATCH=2)
+    yield
+    A.app.config.update(IMAGE_WORKERS=1, IMAGE_PARALLEL_MIN_BATCH=4)
+    if A._image_executor is not None: A.discard_image_executor(A._image_executor)
+
+
+def test_parallel_batch_keeps_order_and_reports_failures(A, image_pool):
+    items = [(f"{i}.png", image_bytes("RGB", (10 + i, 20), "PNG", (i, 0, 0))) for i in range(5)]
+    items.insert(2, ("broken.png", b"not an image"))
+    errors = []
+    outputs = list(A.studio_iter_outputs(items, studio_opts(A), errors=errors))
+    assert A._image_executor is not None # সত্যিই পুলে চলেছে
+    assert output_sizes(outputs) == [(10 + i, 20) for i in range(5)]
+    assert len(errors) == 1 and errors[0].startswith("broken.png: processing failed")
+
+
+def test_small_batch_runs_serially(A, image_pool):
+    items = [("a.png", image_bytes("RGB", (8, 8), "PNG", (0, 0, 0)))]
+    assert len(list(A.studio_iter_outputs(items, studio_opts(A)))) == 1
+    assert A._image_executor is None
+
+
+class BreakingPool:
+    # প্রথম ছবির পর ওয়ার্কার মারা যাওয়ার মতো আচরণ
+    def __init__(self): self.shutdown_called = False
+    def map(self, fn, tasks):
+        yield fn(tasks[0])
+        raise BrokenProcessPool("worker died")
+    def shutdown(self, wait=True, cancel_futures=False): self.shutdown_called = True
+
+
+def test_broken_pool_falls_back_to_serial(A, image_pool, monkeypatch):
+    pool = BreakingPool()
+    monkeypatch.setattr(A, "get_image_executor", lambda: pool)
+    items = [(f"{i}.png", image_bytes("RGB", (10 + i, 10), "PNG", (0, 0, 0))) for i in range(4)]
+    errors = []
+    outputs = list(A.studio_iter_outputs(items, studio_opts(A), errors=errors))
+    assert output_sizes(outputs) == [(10 + i, 10) for i in range(4)] and errors == []
+    assert pool.shutdown_called
+
+
+# --- ইন-মেমরি পাইপলাইন (user-004) ---
+def test_process_image_in_memory(A):
+    ext, data = A.studio_process_image(image_bytes("RGBA", (40, 30), "PNG", (255, 0, 0, 100)), studio_opts(A))
+    with Image.open(io.BytesIO(data)) as img: assert ext == "png" and img.mode == "RGBA" and img.size == (40, 30)
+    ext, data = A.studio_process_image(image_bytes("RGB", (40, 30), "PNG", (0, 0, 255)), studio_opts(A, output_format="jpeg", width="20"))
+    with Image.open(io.BytesIO(data)) as img: assert ext == "jpg" and img.format == "JPEG" and img.size == (20, 30)
+
+
+def test_outputs_spill_to_temp_files_past_limit(A):
+    outputs = A.StudioOutputs(spill_bytes=10)
+    outputs.add("a", b"12345"); outputs.add("b", b"67890"); outputs.add("c", b"x")
+    try:
+        assert outputs.in_memory == 10 and [isinstance(buf, io.BytesIO) for buf in outputs.buffers()] == [True, True, False]
+        assert [buf.read() for buf in outputs.buffers()] == [b"12345", b"67890", b"x"]
+    finally: outputs.close()
+
+
+def folder_snapshot(A):
+    return {key: set(os.listdir(A.app.config[key])) for key in ("UPLOAD_FOLDER", "PROCESSED_FOLDER")}
+
+
+def post_studio(client, count=2, query="", **form):
+    files = [(io.BytesIO(image_bytes("RGB", (30 + i, 20), "JPEG", (0, 90, 0))), f"{i}.jpg") for i in range(count)]
+    return client.post("/process" + query, data={"images": files, **form}, content_type="multipart/form-data")
+
+
+def test_process_route_writes_no_temp_files(A, client):
+    A.app.config["RESULT_CACHE_ENABLED"] = False
+    try:
+        before = folder_snapshot(A)
+        r = post_studio(client, output_format="PNG")
+        with zipfile.ZipFile(io.BytesIO(r.data)) as zf: assert len(zf.namelist()) == 2
+        assert folder_snapshot(A) == before
+    finally: A.app.config["RESULT_CACHE_ENABLED"] = True
+
+
+# --- স্ট্রিমিং ZIP (user-005) ---
+def test_stream_zip_yields_each_entry_as_it_arrives(A):
+    consumed = []
+    def entries():
+        for name in ("a.txt", "b.bin"):
+            consumed.append(name)
+            yield (name, b"alpha" * 100) if name == "a.txt" else (name, io.BytesIO(b"beta" * 1000))
+    chunks = A.stream_zip(entries(), chunk_size=512)
+    first = next(chunks)
+    assert first and consumed == ["a.txt"] # দ্বিতীয় এন্ট্রি তৈরির আগেই প্রথম অংশ পাঠানো যায়
+    with zipfile.ZipFile(io.BytesIO(first + b"".join(chunks))) as zf:
+        assert zf.read("a.txt") == b"alpha" * 100 and zf.read("b.bin") == b"beta" * 1000
+
+
+def test_process_route_streams_zip_and_saves_copy(A, client, make_user):
+    A.app.config["RESULT_CACHE_ENABLED"] = False
+    try:
+        user_id = make_user("dave"); login(client, user_id)
+        r = post_studio(client, count=3, output_format="PNG")
+        assert r.is_streamed and r.mimetype == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(r.data)) as zf: assert output_sizes((n, zf.read(n)) for n in zf.namelist()) == [(30, 20), (31, 20), (32, 20)]
+        with A.app.app_context():
+            saved = A.UserFile.query.filter_by(user_id=user_id).one()
+            assert saved.file_type == "Image Studio" and saved.file_size == len(r.data)
+    finally: A.app.config["RESULT_CACHE_ENABLED"] = True
+
+
+def test_process_route_with_no_usable_images_redirects(A, client):
+    r = client.post("/process", data={"images": [(io.BytesIO(b"junk"), "bad.jpg")], "output_format": "PNG"}, content_type="multipart/form-data")
+    assert r.status_code == 302
+
+
+# --- ওয়াটারমার্ক (user-019) ---
+def test_watermark_options_are_clamped(A):
+    opts = studio_opts(A, text_size="100000", image_scale="50", text_opacity="3", img_opacity="-1")
+    assert (opts["text_size"], opts["image_scale"], opts["text_opacity"], opts["img_opacity"]) == (400, 1.0, 1.0, 0.0)
+    opts = studio_opts(A, text_size="1", image_scale="0")
+    assert (opts["text_size"], opts["image_scale"]) == (8, 0.01)
+
+
+def test_tile_cache_is_bounded_by_bytes(A):
+    cache = A.TileCache({"WATERMARK_CACHE_BYTES": 1000})
+    tile = lambda side: Image.new("RGBA", (side, side)) # side * side * 4 বাইট
+    cache.get("a", lambda: tile(10)); cache.get("b", lambda: tile(10))
+    assert cache.get("a", lambda: pytest.fail("cached")) and cache.stats()["bytes"] == 800
+    cache.get("c", lambda: tile(10)) # সবচেয়ে কম সাম্প্রতিক "b" বাদ
+    assert set(cache._entries) == {"a", "c"} and cache.counters["evictions"] == 1
+    cache.get("huge", lambda: tile(20))
+    assert "huge" not in cache._entries and cache.stats()["bytes"] == 800
+
+
+def test_batch_reuses_watermark_tiles_without_keeping_upload(A):
+    wm_data = image_bytes("RGBA", (40, 20), "PNG", (255, 255, 255, 255))
+    before = dict(A.watermark_tiles.counters)
+    opts = studio_opts(A, watermark_text="MyGizmo", image_scale="0.5", img_opacity="1")
+    items = [(f"{i}.png", image_bytes("RGB", (100, 80), "PNG", (0, 0, 0))) for i in range(3)]
+    outputs = list(A.studio_iter_outputs(items, opts, wm_data, parallel=False))
+    assert len(outputs) == 3
+    # প্রথম ছবিতে টেক্সট টাইল, ওয়াটারমার্ক ডিকোড ও রিসাইজ; বাকি দুটিতে দুটি টাইলই ক্যাশ থেকে
+    assert A.watermark_tiles.counters["hits"] - before["hits"] == 4
+    assert all(not isinstance(part, bytes) for key in A.watermark_tiles._entries for part in key)
+    with Image.open(io.BytesIO(outputs[0][1])) as img:
+        assert img.getpixel((45, 50)) == (255, 255, 255) and img.getpixel((5, 5)) == (0, 0, 0)
+
+
+# --- draft/reduce রিসাইজ (user-020) ---
+@pytest.mark.parametrize("size, box, keep_aspect, expected", [
+    ((4000, 3000), (800, 0), True, (800, 600)),
+    ((4000, 3000), (800, 800), True, (800, 600)),
+    ((400, 300), (800, 0), True, (400, 300)), # ছোট ছবি বড় করা হয় না
+    ((4000, 3000), (800, 100), False, (800, 100)),
+    ((4000, 3000), (0, 100), False, (4000, 100)),
+])
+def test_target_size(A, size, box, keep_aspect, expected):
+    assert A.studio_target_size(size, *box, keep_aspect) == expected
+
+
+def test_jpeg_is_decoded_at_reduced_scale(A, monkeypatch):
+    drafts = []
+    real_draft = JpegImagePlugin.JpegImageFile.draft
+    def draft(self, mode, size):
+        result = real_draft(self, mode, size); drafts.append(self.size); return result
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", draft)
+    with A.studio_open_resized(image_bytes("RGB", (2000, 1000), "JPEG", (10, 20, 30)), 200, 0, True) as img:
+        assert img.size == (200, 100) and img.mode == "RGB"
+    assert drafts == [(500, 250)] # 1/4 স্কেলে ডিকোড, টার্গেটের দ্বিগুণ (STUDIO_REDUCING_GAP) এর বেশি রেখে
+
+
+def test_exif_orientation_is_applied_before_resize(A):
+    buf = io.BytesIO(); exif = Image.Exif(); exif[0x0112] = 6 # 90° ঘোরানো
+    Image.new("RGB", (1200, 600), (0, 0, 0)).save(buf, "JPEG", exif=exif)
+    with A.studio_open_resized(buf.getvalue(), 300, 0, True) as img: assert img.size == (300, 600)
+
+
+def test_alpha_is_kept_only_when_present(A):
+    with A.studio_open_resized(image_bytes("RGBA", (20, 20), "PNG", (1, 2, 3, 4))) as img: assert img.mode == "RGBA"
+    with A.studio_open_resized(image_bytes("P", (20, 20), "GIF", 1)) as img: assert img.mode == "RGB"
@@ -0,0 +1,98 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import image_bytes, wait_for_job
+
+
+def test_async_job_lifecycle_and_expiry(A, client):
+    A.app.config["RESULT_CACHE_ENABLED"] = False
+    try:
+        job = post_jpg_to_pdf_job(client)
+        assert wait_for_job(client, job["status_url"])["status"] == "done"
+        result = client.get(job["result_url"])
+        assert result.status_code == 200 and result.data.startswith(b"%PDF")
+    finally: A.app.config["RESULT_CACHE_ENABLED"] = True
+    job_dir = os.path.join(A.app.config["JOBS_FOLDER"], job["job_id"])
+    assert not os.path.exists(os.path.join(job_dir, "inputs"))
+    # রিটেনশনের ভেতরে থাকলে থাকে, পেরোলে রো ও ফোল্ডার দুটোই মুছে যায়
+    with A.app.app_context():
+        assert A.expire_jobs() == 0
+        A.Job.query.filter_by(id=job["job_id"]).update({"finished_at": datetime.now(timezone.utc) - timedelta(hours=A.app.config["JOB_RETENTION_HOURS"] + 1)})
+        A.db.session.commit()
+        assert A.expire_jobs() == 1
+        assert A.db.session.get(A.Job, job["job_id"]) is None and not os.path.exists(job_dir)
+    assert client.get(job["status_url"]).status_code == 404
+
+
+def test_running_job_of_dead_worker_is_failed(A):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"]); dead.wait()
+    with A.app.app_context():
+        jobs = {}
+        for name, pid in (("orphan", dead.pid), ("alive", os.getpid())):
+            job = A.Job(id=f"{name}{os.urandom(4).hex()}", kind="convert", status="running", params="{}")
+            job_dir = os.path.join(A.app.config["JOBS_FOLDER"], job.id); os.makedirs(os.path.join(job_dir, "inputs"))
+            A.JobProgress(job_dir)(0.5)
+            if pid != os.getpid():
+                with open(os.path.join(job_dir, "progress.json"), "w") as fh: fh.write(f'{{"progress": 0.5, "host": "{A.socket.gethostname()}", "pid": {pid}}}')
+            A.db.session.add(job); jobs[name] = job.id
+        A.db.session.commit()
+        assert A.reset_stale_jobs() == 1
+        A.db.session.expire_all()
+        orphan = A.db.session.get(A.Job, jobs["orphan"])
+        assert orphan.status == "failed" and orphan.error.startswith("Interrupted")
+        assert not os.path.exists(os.path.join(A.app.config["JOBS_FOLDER"], orphan.id, "inputs"))
+        assert A.db.session.get(A.Job, jobs["alive"]).status == "running"
+
+
+def post_jpg_to_pdf_job(client, count=2):
+    files = [(io.BytesIO(image_bytes("RGB", (120, 80), "JPEG", (200, 30, 30))), f"{i}.jpg") for i in range(count)]
+    r = client.post("/convert?async=1", data={"conversion_type": "jpg_to_pdf", "file": files}, content_type="multipart/form-data")
+    assert r.status_code == 202
+    return r.get_json()
+
+
+def queue_job(A, kind):
+    job_id = uuid.uuid4().hex; os.makedirs(os.path.join(A.app.config["JOBS_FOLDER"], job_id, "inputs"))
+    A.db.session.add(A.Job(id=job_id, kind=kind, params=json.dumps({}))); A.db.session.commit()
+    return job_id
+
+
+def _crash_job(job_dir, params, progress):
+    os._exit(1) # OOM-kill হওয়া চাইল্ডের মতো
+
+
+def test_crashed_worker_fails_job_and_pool_is_rebuilt(A, client, monkeypatch):
+    monkeypatch.setitem(A.JOB_HANDLERS, "crash", _crash_job)
+    with A.app.app_context():
+        if A._job_executor is not None: A.discard_job_executor(A._job_executor) # চাইল্ডগুলো প্যাচের পরে fork হোক
+        broken = A.get_job_executor(); job_id = queue_job(A, "crash"); A.dispatch_job(job_id)
+        deadline = time.monotonic() + 30
+        while A.db.session.get(A.Job, job_id).status == "running" and time.monotonic() < deadline:
+            time.sleep(0.1); A.db.session.expire_all()
+        job = A.db.session.get(A.Job, job_id)
+        assert job.status == "failed" and "stopped unexpectedly" in job.error
+    assert A.get_job_executor() is not broken
+    # পরের জবগুলো নতুন পুলে স্বাভাবিকভাবে চলে
+    job = post_jpg_to_pdf_job(client)
+    assert wait_for_job(client, job["status_url"])["status"] == "done"
+
+
+def test_submit_failure_does_not_leave_job_running(A, monkeypatch):
+    class BrokenPool:
+        def submit(self, *args, **kwargs): raise BrokenProcessPool("pool is broken")
+        def shutdown(self, wait=True, cancel_futures=False): pass
+    monkeypatch.setattr(A, "get_job_executor", lambda: BrokenPool())
+    with A.app.app_context():
+        job_id = queue_job(A, "convert"); A.dispatch_job(job_id)
+        job = A.db.session.get(A.Job, job_id)
+        assert job.status == "failed" and job.error.startswith("Could not start the job") and job.finished_at
+    assert not os.path.exists(os.path.join(A.app.config["JOBS_FOLDER"], job_id, "inputs"))
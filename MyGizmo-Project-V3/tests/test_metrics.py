@@ -0,0 +1,58 @@
+import io
+import re
+
+import pytest
+
+from conftest import image_bytes, wait_for_job
+
+
+def stage_count(client, **labels):
+    # /metrics টেক্সট থেকে stage_seconds হিস্টোগ্রামের _count (না থাকলে 0)
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    wanted = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    match = re.search(r"^mygizmo_stage_seconds_count\{" + re.escape(wanted) + r"\} (\d+)$", r.get_data(as_text=True), re.M)
+    return int(match.group(1)) if match else 0
+
+
+def test_collect_buffers_samples_until_merge(A):
+    metrics = A.Metrics()
+    with metrics.collect() as outer:
+        with metrics.stage("decode", tool="t"): pass
+        with metrics.collect() as inner: metrics.observe("stage_seconds", 0.5, stage="encode", tool="t")
+        metrics.merge(inner) # ভেতরের collect() শেষে বাইরের বাফার ফিরে আসে
+    assert metrics.histograms == {} and [(name, labels["stage"]) for name, _, _, labels in outer] == [("stage_seconds", "decode"), ("stage_seconds", "encode")]
+    metrics.merge(outer)
+    assert metrics.histograms[("stage_seconds", (("stage", "encode"), ("tool", "t")))]["counts"][A.METRIC_TIME_BUCKETS.index(0.5)] == 1
+    assert "mygizmo_stage_seconds_count{stage=\"decode\",tool=\"t\"} 1" in metrics.render()
+
+
+def test_job_stage_metrics_reach_parent(A, client):
+    # jpg_to_pdf জবের encode ধাপ জব পুলের চাইল্ড প্রসেসে চলে; টাইমিংটি প্যারেন্টের /metrics-এ আসতে হবে
+    before = stage_count(client, stage="encode", tool="jpg_to_pdf")
+    A.app.config["RESULT_CACHE_ENABLED"] = False
+    try:
+        files = [(io.BytesIO(image_bytes("RGB", (120, 80), "JPEG", (0, 90, 0))), "a.jpg")]
+        r = client.post("/convert?async=1", data={"conversion_type": "jpg_to_pdf", "file": files}, content_type="multipart/form-data")
+        assert wait_for_job(client, r.get_json()["status_url"])["status"] == "done"
+    finally: A.app.config["RESULT_CACHE_ENABLED"] = True
+    assert stage_count(client, stage="encode", tool="jpg_to_pdf") == before + 1
+
+
+def test_failed_job_keeps_its_metrics(A, monkeypatch, tmp_path):
+    def failing(job_dir, params, progress):
+        with A.metrics.stage("decode", tool="failing"): raise RuntimeError("bad input")
+    monkeypatch.setitem(A.JOB_HANDLERS, "failing", failing)
+    with pytest.raises(RuntimeError) as info: A.run_job("failing", str(tmp_path), {})
+    assert [labels["tool"] for _, _, _, labels in info.value.job_metrics] == ["failing"]
+
+
+def test_metrics_access(A, client):
+    assert client.get("/metrics", headers={"X-Forwarded-For": "203.0.113.9"}).status_code == 403
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "203.0.113.9"}).status_code == 403
+    A.app.config["METRICS_TOKEN"] = "s3cret"
+    try:
+        assert client.get("/metrics").status_code == 403
+        assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+        assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}, environ_base={"REMOTE_ADDR": "203.0.113.9"}).status_code == 200
+    finally: A.app.config["METRICS_TOKEN"] = ""
@@ -0,0 +1,43 @@
+import gzip
+
+from conftest import login
+
+
+def test_anonymous_pages_are_cached_per_full_path(A, client):
+    before = dict(A.page_cache.counters)
+    first = client.get("/tools"); second = client.get("/tools")
+    assert first.status_code == second.status_code == 200 and first.data == second.data
+    assert A.page_cache.counters["hits"] == before["hits"] + 1
+    # কোয়েরি স্ট্রিং কী-এর অংশ: আলাদা কোয়েরি আলাদা এন্ট্রি
+    client.get("/tools?ref=mail")
+    assert A.page_cache.counters["misses"] == before["misses"] + 2
+    assert client.get("/tools", headers={"If-None-Match": second.get_etag()[0]}).status_code == 304
+
+
+def test_signed_in_pages_are_not_cached(A, client, make_user):
+    client.get("/tools") # লগআউট অবস্থার কপি ক্যাশে
+    entries = A.page_cache.stats()["entries"]; hits = A.page_cache.counters["hits"]
+    login(client, make_user("bob"))
+    r = client.get("/tools")
+    assert b"Welcome, bob!" in b" ".join(r.data.split()) and "private" in r.headers["Cache-Control"]
+    assert A.page_cache.counters["hits"] == hits and A.page_cache.stats()["entries"] == entries
+    other = A.app.test_client()
+    assert b"bob" not in other.get("/tools").data
+
+
+def test_large_pages_are_served_precompressed(A, client):
+    A.app.config["PAGE_CACHE_COMPRESS_MIN"], minimum = 1, A.app.config["PAGE_CACHE_COMPRESS_MIN"]
+    try:
+        plain = client.get("/about")
+        r = client.get("/about", headers={"Accept-Encoding": "gzip"})
+    finally: A.app.config["PAGE_CACHE_COMPRESS_MIN"] = minimum
+    assert r.headers["Content-Encoding"] == "gzip" and "Accept-Encoding" in r.headers["Vary"]
+    assert gzip.decompress(r.data) == plain.data and r.get_etag()[0] != plain.get_etag()[0]
+
+
+def test_pages_with_flash_messages_are_not_cached(A, client):
+    with client.session_transaction() as sess: sess["_flashes"] = [("error", "Something went wrong")]
+    entries = A.page_cache.stats()["entries"]
+    assert b"Something went wrong" in client.get("/contact").data
+    assert A.page_cache.stats()["entries"] == entries
+    assert b"Something went wrong" not in client.get("/contact").data
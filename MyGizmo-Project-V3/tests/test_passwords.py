@@ -0,0 +1,40 @@
+import pytest
+
+
+def test_hash_uses_configured_cost(A):
+    hasher = A.PasswordHasher(dict(A.app.config, BCRYPT_LOG_ROUNDS=5))
+    hashed = hasher.hash("secret123")
+    assert hashed.startswith("$2b$05$") and hasher.verify(hashed, "secret123") and not hasher.verify(hashed, "wrong")
+    assert not hasher.needs_rehash(hashed) and A.password_hasher.needs_rehash(hashed) and hasher.needs_rehash("garbage")
+    assert hasher.stats()["hashed"] == 1 and hasher.stats()["verified"] == 2
+
+
+def test_full_queue_raises_busy(A):
+    hasher = A.PasswordHasher(dict(A.app.config, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_TIMEOUT=0.01))
+    hasher._slots.acquire() # অন্য একটি হ্যাশ চলছে
+    try:
+        with pytest.raises(A.PasswordHashBusy): hasher.hash("secret123")
+    finally: hasher._slots.release()
+    assert hasher.stats()["rejected"] == 1 and hasher.hash("secret123")
+
+
+def login_form(email="alice@example.com", password="secret123"): return {"email": email, "password": password}
+
+
+def test_login_rehashes_after_cost_change(A, client, make_user):
+    user_id = make_user("alice")
+    A.app.config["BCRYPT_LOG_ROUNDS"] = 5
+    try: assert client.post("/login", data=login_form()).status_code == 302
+    finally: A.app.config["BCRYPT_LOG_ROUNDS"] = 4
+    with A.app.app_context(): assert A.db.session.get(A.User, user_id).password_hash.startswith("$2b$05$")
+
+
+def test_busy_hasher_returns_503(A, client, make_user, monkeypatch):
+    make_user("alice")
+    def busy(*args): raise A.PasswordHashBusy("password hashing queue is full")
+    monkeypatch.setattr(A.password_hasher, "verify", busy)
+    assert client.post("/login", data=login_form()).status_code == 503
+    form = {"username": "bobby", "email": "bobby@example.com", "password": "secret123", "confirm_password": "secret123"}
+    monkeypatch.setattr(A.password_hasher, "hash", busy)
+    assert client.post("/register", data=form).status_code == 503
+    with A.app.app_context(): assert A.User.query.filter_by(username="bobby").first() is None
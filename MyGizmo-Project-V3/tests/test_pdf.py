@@ -0,0 +1,61 @@
+import io
+
+import pytest
+from PIL import Image
+
+from conftest import image_bytes
+
+
+# --- ছবি -> PDF ---
+def test_jpg_to_pdf_pages(A):
+    pypdf = pytest.importorskip("pypdf")
+    images = [image_bytes("RGB", (300, 200), "JPEG", (10, 120, 240)), image_bytes("L", (100, 400), "JPEG", 128),
+              image_bytes("RGBA", (64, 64), "PNG", (255, 0, 0, 128)), image_bytes("P", (50, 80), "GIF", 3)]
+    buffer = A.convert_jpg_to_pdf([io.BytesIO(data) for data in images])
+    reader = pypdf.PdfReader(io.BytesIO(buffer.read()))
+    assert len(reader.pages) == len(images)
+    for page, (w, h) in zip(reader.pages, [(300, 200), (100, 400), (64, 64), (50, 80)]):
+        box = page.mediabox
+        assert float(box.width) / float(box.height) == pytest.approx(w / h, rel=0.01)
+        assert len(page.images) == 1
+
+
+def test_jpg_to_pdf_skips_non_images(A):
+    buffer = A.convert_jpg_to_pdf([io.BytesIO(b"not an image"), io.BytesIO(image_bytes("RGB", (40, 30), "JPEG", (0, 0, 0)))])
+    data = buffer.read()
+    assert data.startswith(b"%PDF") and data.rstrip().endswith(b"%%EOF")
+    assert A.convert_jpg_to_pdf([io.BytesIO(b"not an image")]) is None
+
+
+def test_downsample_target(A):
+    layout = A.parse_pdf_layout_options({"max_dpi": "72"})
+    assert A._pdf_downsample_target((0, 0, 100, 50), 400, 200, layout) == (100, 50)
+    assert A._pdf_downsample_target((0, 0, 100, 50), 101, 51, layout) is None # এক পিক্সেলের জন্য রি-এনকোড নয়
+    assert A._pdf_downsample_target((0, 0, 100, 50), 400, 200, A.parse_pdf_layout_options({})) is None
+
+
+# --- Image Studio-র PDF আউটপুট ---
+def studio_pdf_page(A, size, **form):
+    opts = A.parse_studio_options({"output_format": "PDF", "watermark_text": "MyGizmo", **form})
+    ext, data = A.studio_process_image(image_bytes("RGB", size, "JPEG", (30, 60, 90)), opts)
+    assert ext == "jpg"
+    return data, opts["pdf_layout"]
+
+
+@pytest.mark.parametrize("form", [{}, {"page_size": "a5", "max_dpi": "72"}, {"page_size": "image", "max_dpi": "300"}])
+def test_studio_pdf_pages_are_embedded_without_reencoding(A, monkeypatch, form):
+    page, layout = studio_pdf_page(A, (1200, 900), **form)
+    def no_decode(*args, **kwargs): raise AssertionError("page was decoded again")
+    monkeypatch.setattr(A, "studio_open_resized", no_decode)
+    pdf = io.BytesIO()
+    assert A.make_pdf_from_images([io.BytesIO(page)], pdf, layout) == 1
+    assert page in pdf.getvalue() # JPEG-এর DCT স্ট্রিম হুবহু
+
+
+def test_studio_pdf_downsamples_to_max_dpi(A):
+    page, _ = studio_pdf_page(A, (2400, 1800), page_size="a5", max_dpi="72")
+    with Image.open(io.BytesIO(page)) as im:
+        # A5 ল্যান্ডস্কেপ (595 x 420 pt) 72 DPI-তে: কন্টেন্ট এরিয়ায় ফিট হওয়া 4:3 ছবি
+        assert im.size == (560, 420)
+    full, _ = studio_pdf_page(A, (2400, 1800), page_size="a5")
+    with Image.open(io.BytesIO(full)) as im: assert im.size == (2400, 1800)
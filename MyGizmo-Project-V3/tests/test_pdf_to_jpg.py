@@ -0,0 +1,72 @@
+import io
+import os
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.mark.parametrize("spec, total, expected", [
+    ("", 5, [(1, 5)]),
+    ("1-3, 7, 10-", 12, [(1, 3), (7, 7), (10, 12)]),
+    ("4-, 2-3, 9", 6, [(2, 6)]), # জোড়া লাগানো রেঞ্জ একসাথে, ডকুমেন্টের বাইরের অংশ বাদ
+    ("3-100", 4, [(3, 4)]),
+])
+def test_parse_page_ranges(A, spec, total, expected):
+    assert A.parse_page_ranges(spec, total) == expected
+
+
+@pytest.mark.parametrize("spec, total", [("abc", 5), ("3-1", 5), ("0", 5), ("1--2", 5), ("8-9", 5)])
+def test_bad_page_ranges_are_reported(A, spec, total):
+    with pytest.raises(A.PageRangeError) as info: A.parse_page_ranges(spec, total)
+    assert A.pdf_to_jpg_error(info.value).startswith("Invalid page range:")
+
+
+def test_pdf_options_are_validated_before_work_starts(A):
+    opts = A.parse_pdf_options({"dpi": "5000", "image_format": "gif", "quality": "0"})
+    assert opts == {"dpi": A.app.config["PDF_MAX_DPI"], "pages": "", "image_format": "jpeg", "quality": 1}
+    with pytest.raises(A.PageRangeError): A.parse_pdf_options({"pages": "x"})
+
+
+def test_poppler_hint_only_when_poppler_is_missing(A):
+    assert "Poppler" in A.pdf_to_jpg_error(A.pdf2image.exceptions.PDFInfoNotInstalledError())
+    assert "Poppler" in A.pdf_to_jpg_error(FileNotFoundError("pdftoppm"))
+    assert A.pdf_to_jpg_error(A.pdf2image.exceptions.PDFPageCountError("broken")) == "Error during PDF to JPG conversion: broken"
+
+
+@pytest.fixture
+def fake_poppler(A, monkeypatch):
+    # pdftoppm-এর মতো output_folder-এ ফাইল লিখে পাথ ফেরত দেয়; কোন চাংকগুলো রেন্ডার হলো তা রেকর্ড করে
+    calls = []
+    def convert_from_path(pdf_path, dpi, first_page, last_page, fmt, output_folder, paths_only, **kwargs):
+        calls.append((first_page, last_page)); paths = []
+        for page in range(first_page, last_page + 1):
+            path = os.path.join(output_folder, f"p{page}.{fmt}")
+            with open(path, "wb") as fh: fh.write(f"page {page}".encode())
+            paths.append(path)
+        return paths
+    monkeypatch.setattr(A, "pdf2image", SimpleNamespace(pdfinfo_from_path=lambda path: {"Pages": 9}, convert_from_path=convert_from_path,
+                                                        exceptions=A.pdf2image.exceptions))
+    A.app.config["PDF_RENDER_CHUNK_PAGES"] = 2
+    yield calls
+    A.app.config["PDF_RENDER_CHUNK_PAGES"] = 4
+
+
+def test_pages_are_rendered_in_chunks(A, fake_poppler):
+    pages = A.convert_pdf_to_jpgs(io.BytesIO(b"%PDF-1.4"), A.parse_pdf_options({"pages": "2-6, 9"}))
+    assert next(pages) == ("page_2.jpg", b"page 2") and fake_poppler == [(2, 3)] # প্রথম চাংক শেষ হলেই প্রথম পেজ
+    assert [name for name, _ in pages] == ["page_3.jpg", "page_4.jpg", "page_5.jpg", "page_6.jpg", "page_9.jpg"]
+    assert fake_poppler == [(2, 3), (4, 5), (6, 6), (9, 9)]
+    assert os.listdir(A.app.config["PROCESSED_FOLDER"]) == [] # টেম্প ফোল্ডার মুছে গেছে
+
+
+def test_convert_route_streams_pages(A, client, fake_poppler):
+    data = {"conversion_type": "pdf_to_jpg", "pages": "1-3", "file": [(io.BytesIO(b"%PDF-1.4"), "doc.pdf")]}
+    r = client.post("/convert", data=data, content_type="multipart/form-data")
+    with zipfile.ZipFile(io.BytesIO(r.data)) as zf: assert zf.namelist() == ["page_1.jpg", "page_2.jpg", "page_3.jpg"]
+
+
+def test_convert_route_rejects_bad_range(A, client):
+    data = {"conversion_type": "pdf_to_jpg", "pages": "5-2", "file": [(io.BytesIO(b"%PDF-1.4"), "doc.pdf")]}
+    r = client.post("/convert", data=data, content_type="multipart/form-data", follow_redirects=True)
+    assert b"Invalid page range" in r.data
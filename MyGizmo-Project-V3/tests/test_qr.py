@@ -0,0 +1,54 @@
+import io
+import re
+import zipfile
+
+import pytest
+from PIL import Image
+
+
+def generate(client, url, **options):
+    r = client.post("/qr-generator", data={"url": url, **options})
+    assert r.status_code == 200
+    return re.search(r'/qr/[0-9a-f]{32}\.(?:png|svg)', r.get_data(as_text=True)).group(0)
+
+
+def test_each_payload_gets_its_own_immutable_url(A, client):
+    first = generate(client, "https://example.com/private?token=abc")
+    second = generate(client, "https://example.com/other")
+    assert first != second and "token" not in first
+    r = client.get(first)
+    assert r.mimetype == "image/png" and "immutable" in r.headers["Cache-Control"]
+    assert client.get(first + "?download=1").headers["Content-Disposition"] == 'attachment; filename="my_qr_code.png"'
+    assert generate(client, "https://example.com/private?token=abc") == first # একই ইনপুট, একই URL
+
+
+def test_unknown_digest_or_wrong_extension_is_404(A, client):
+    url = generate(client, "https://example.com/svg", format="svg")
+    assert client.get(url).data.startswith(b"<svg")
+    assert client.get(url.replace(".svg", ".png")).status_code == 404
+    assert client.get("/qr/" + "0" * 32 + ".png").status_code == 404
+
+
+def test_url_survives_memory_eviction(A, client):
+    url = generate(client, "https://example.com/evicted")
+    A.qr_engine._cache.clear() # অন্য ওয়ার্কারের মতো: LRU-তে নেই, ডিস্ক ক্যাশ থেকে আসে
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.parametrize("size", [150, 300, 517])
+def test_png_modules_are_whole_pixels(A, size):
+    matrix = A._qr_matrix("https://example.com/pixels", "M"); n = len(matrix)
+    with Image.open(io.BytesIO(A.render_qr("https://example.com/pixels", size, "M", "png"))) as img:
+        assert img.size == (size, size)
+        box = size // n; offset = (size - n * box) // 2
+        # প্রতিটি মডিউলের সব পিক্সেল একই রঙের (ঝাপসা বা অসমান প্রান্ত নেই)
+        for y, row in enumerate(matrix):
+            for x, cell in enumerate(row):
+                corners = {img.getpixel((offset + x * box + dx, offset + y * box + dy)) for dx in (0, box - 1) for dy in (0, box - 1)}
+                assert corners == {0 if cell else 255}
+
+
+def test_bulk_zip_names_are_unique(A, client):
+    csv_data = "https://a.example,label\nhttps://b.example,label\nhttps://c.example\n"
+    r = client.post("/qr-generator/bulk", data={"csv_file": (io.BytesIO(csv_data.encode()), "codes.csv")}, content_type="multipart/form-data")
+    with zipfile.ZipFile(io.BytesIO(r.data)) as zf: assert zf.namelist() == ["label.png", "label_2.png", "qr_00003.png"]
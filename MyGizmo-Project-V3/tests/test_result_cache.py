@@ -0,0 +1,59 @@
+import io
+import os
+import time
+
+import pytest
+
+from conftest import image_bytes
+
+
+def test_key_covers_tool_params_and_inputs(A):
+    key = A.result_cache.key("pdf_to_jpg", {"dpi": 150, "pages": ""}, ["abc"])
+    assert key == A.result_cache.key("pdf_to_jpg", {"pages": "", "dpi": 150}, ["abc"])
+    assert len({key, A.result_cache.key("pdf_to_jpg", {"dpi": 300, "pages": ""}, ["abc"]),
+                A.result_cache.key("pdf_to_jpg", {"dpi": 150, "pages": ""}, ["abd"]),
+                A.result_cache.key("jpg_to_pdf", {"dpi": 150, "pages": ""}, ["abc"])}) == 4
+
+
+@pytest.fixture
+def cache(A, tmp_path):
+    # শেয়ার করা result_cache নয়, নিজস্ব ফোল্ডার ও ছোট সাইজ সীমার একটি ক্যাশ
+    return A.ResultCache({"RESULT_CACHE_FOLDER": str(tmp_path), "RESULT_CACHE_ENABLED": True, "RESULT_CACHE_MAX_BYTES": 1000})
+
+
+def test_put_and_get(cache):
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, io.BytesIO(b"result"), "out.pdf", "application/pdf")
+    hit = cache.get("ab" * 32)
+    assert hit["download_name"] == "out.pdf" and hit["mimetype"] == "application/pdf"
+    with open(hit["path"], "rb") as fh: assert fh.read() == b"result"
+    assert cache.counters == {"hits": 1, "misses": 1, "stores": 1, "evictions": 0}
+
+
+def test_eviction_drops_least_recently_used(cache):
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, b"x" * 400, f"{i}.bin", "application/octet-stream")
+        os.utime(cache._paths(key)[1], (time.time() - 100 + i, time.time() - 100 + i))
+        if i == 0: cache.get(key) # প্রথমটি আবার ব্যবহৃত হলো, তাই দ্বিতীয়টি সবচেয়ে পুরনো
+    assert cache.get(keys[0]) and cache.get(keys[2])
+    assert cache.get(keys[1]) is None and cache.counters["evictions"] == 1
+    assert cache.stats()["size_bytes"] == 800
+
+
+def test_store_stream_commits_only_complete_streams(cache):
+    assert b"".join(cache.store_stream("cd" * 32, iter([b"a", b"b"]), "ok.zip", "application/zip")) == b"ab"
+    assert cache.get("cd" * 32)
+    def failing():
+        yield b"a"; raise OSError("client went away")
+    with pytest.raises(OSError): b"".join(cache.store_stream("ef" * 32, failing(), "bad.zip", "application/zip"))
+    assert cache.get("ef" * 32) is None and os.listdir(os.path.join(cache.folder, "tmp")) == []
+
+
+def test_conversion_route_serves_repeat_from_cache(A, client):
+    def post():
+        files = [(io.BytesIO(image_bytes("RGB", (50, 40), "JPEG", (9, 9, 9))), "a.jpg")]
+        return client.post("/convert", data={"conversion_type": "jpg_to_pdf", "file": files}, content_type="multipart/form-data")
+    first = post(); second = post()
+    assert "X-Cache" not in first.headers and second.headers["X-Cache"] == "HIT"
+    assert first.data == second.data and second.data.startswith(b"%PDF")
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+
+def add_post(A, user_id, slug):
+    with A.app.app_context():
+        A.db.session.add(A.Post(title=slug, slug=slug, content="Body", user_id=user_id)); A.db.session.commit()
+
+
+def test_unique_slugs_suffix_existing_and_repeated(A, make_user):
+    add_post(A, make_user(), "hello-world")
+    with A.app.app_context(): slugs = A.unique_slugs(["hello-world", "fresh", "fresh", "", "other"])
+    assert slugs[1] == "fresh" and slugs[3] == "" and slugs[4] == "other"
+    for slug, base in ((slugs[0], "hello-world"), (slugs[2], "fresh")):
+        assert slug.startswith(base + "-") and len(slug) == len(base) + 7
+    assert len(set(slugs)) == 5
+
+
+def test_make_slug_is_memoized(A):
+    A.make_slug.cache_clear()
+    A.make_slug("Hello World", "_"); A.make_slug("Hello World", "_")
+    assert A.make_slug.cache_info().hits == 1 and A.make_slug("Hello World", "_") == "hello_world"
+    assert A.make_slug("Top 10 Tips", remove_numbers=True) == "top-tips"
+
+
+def test_json_batch(A, client, make_user):
+    add_post(A, make_user(), "taken")
+    r = client.post("/generate-slugs?separator=_", json={"texts": ["Taken", "New Post", "New Post"], "lowercase": True})
+    slugs = r.get_json()["slugs"]
+    assert r.get_json()["count"] == 3 and slugs[0].startswith("taken-") and slugs[1] == "new_post" and slugs[2].startswith("new_post-")
+    assert client.post("/generate-slugs", json=["A B"]).get_json()["slugs"] == ["a-b"]
+    assert client.post("/generate-slugs", json={"texts": "nope"}).status_code == 400
+
+
+def test_plain_text_stream_stays_unique_across_chunks(A, client):
+    A.app.config["SLUG_QUERY_CHUNK"], chunk = 2, A.app.config["SLUG_QUERY_CHUNK"]
+    try: r = client.post("/generate-slugs", data="Same\nSame\nOther\nSame\n", content_type="text/plain")
+    finally: A.app.config["SLUG_QUERY_CHUNK"] = chunk
+    slugs = r.get_data(as_text=True).splitlines()
+    assert slugs[0] == "same" and slugs[2] == "other" and len(set(slugs)) == 4
+
+
+def test_ndjson_reports_bad_lines(A, client):
+    body = '{"text": "First"}\n\n"Second"\nnot json\n{"text": 3}\n'
+    r = client.post("/generate-slugs?unique=0", data=body, content_type="application/x-ndjson")
+    lines = [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+    assert lines[:2] == [{"slug": "first"}, {"slug": "second"}]
+    assert [line.get("line") for line in lines[2:]] == [4, 5] and all("error" in line for line in lines[2:])
+
+
+@pytest.mark.parametrize("separator", [["-"], "x" * 50])
+def test_bad_separator_is_rejected(A, client, separator):
+    assert client.post("/generate-slug", json={"text": "a b", "separator": separator}).status_code == 400
+    assert client.post("/generate-slugs", json={"texts": ["a b"], "separator": separator}).status_code == 400
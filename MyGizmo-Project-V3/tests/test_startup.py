@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = ["numpy", "pdf2image", "qrcode", "reportlab", "rembg", "stripe"]
+
+
+def imported_after_startup(A, preload=""):
+    # নতুন প্রসেসে `import app`; রিটার্ন: HEAVY-এর কোনগুলো লোড হয়ে গেছে
+    code = "import json, sys, app; print(json.dumps(sorted(m for m in %r if m in sys.modules)))" % HEAVY
+    env = dict(os.environ, PRELOAD_BACKENDS=preload)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(A.__file__), env=env, capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_heavy_backends_are_not_imported_at_startup(A):
+    assert imported_after_startup(A) == []
+
+
+def test_preload_backends(A):
+    assert imported_after_startup(A, "qr,stripe") == ["qrcode", "stripe"]
+
+
+def test_lazy_module_loads_on_first_use(A, monkeypatch):
+    monkeypatch.delitem(sys.modules, "wave", raising=False)
+    module = A.lazy_import("wave")
+    assert isinstance(module, A.LazyModule) and not module.loaded
+    assert module.WAVE_FORMAT_PCM == 1 and module.loaded and "wave" in A.LAZY_IMPORT_TIMINGS
+    assert A.lazy_import("wave") is sys.modules["wave"] # আগে থেকে লোড থাকলে আসল মডিউলটিই
@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+
+STRIPE_FIXTURES = sorted(os.path.join(FIXTURES_DIR, "stripe", name) for name in os.listdir(os.path.join(FIXTURES_DIR, "stripe")) if name.endswith(".json"))
+
+
+def load_event(prefix):
+    path = next(p for p in STRIPE_FIXTURES if os.path.basename(p).startswith(prefix))
+    with open(path) as fh: return fh.read()
+
+
+def post_event(client, raw):
+    r = client.post("/stripe-webhook", data=raw, content_type="application/json")
+    return r.status_code, r.get_data(as_text=True)
+
+
+def drain(A):
+    # ব্যাকগ্রাউন্ড ওয়ার্কারের বদলে এখানেই pending ইভেন্টগুলো প্রয়োগ; রিটার্ন: কতগুলো প্রসেস হলো
+    processed = 0
+    with A.app.app_context():
+        while True:
+            n = A.apply_stripe_events()
+            if not n: return processed
+            processed += n
+
+
+def statuses(A):
+    with A.app.app_context(): return {ev.event_id: ev.status for ev in A.StripeEvent.query.all()}
+
+
+def subscription_status(A, user_id):
+    with A.app.app_context(): return A.db.session.get(A.User, user_id).subscription_status
+
+
+def test_replay_fixtures(A, client, make_user):
+    user_id = make_user(stripe_customer_id="cus_fixture_1")
+    for path in STRIPE_FIXTURES:
+        with open(path) as fh: assert post_event(client, fh.read()) == (200, "OK")
+    assert drain(A) == 3
+    # checkout (active) ও পরের subscription.updated (past_due) একই ব্যাচে: created অনুযায়ী নতুনটি টেকে
+    assert subscription_status(A, user_id) == "past_due"
+    assert statuses(A) == {
+        "evt_fixture_checkout_completed": "superseded",
+        "evt_fixture_subscription_updated": "applied",
+        "evt_fixture_subscription_deleted": "unmatched",
+        "evt_fixture_invoice_paid": "ignored",
+    }
+
+
+def test_duplicate_delivery_is_stored_once(A, client, make_user):
+    user_id = make_user(stripe_customer_id="cus_fixture_1")
+    raw = load_event("01_")
+    assert post_event(client, raw) == (200, "OK")
+    assert post_event(client, raw) == (200, "OK (duplicate)")
+    assert drain(A) == 1
+    assert subscription_status(A, user_id) == "active"
+    assert statuses(A) == {"evt_fixture_checkout_completed": "applied"}
+
+
+def test_duplicate_after_processing_does_not_reapply(A, client, make_user):
+    user_id = make_user(stripe_customer_id="cus_fixture_1")
+    post_event(client, load_event("01_")); drain(A)
+    post_event(client, load_event("02_")); drain(A)
+    assert post_event(client, load_event("01_")) == (200, "OK (duplicate)")
+    assert drain(A) == 0
+    assert subscription_status(A, user_id) == "past_due"
+
+
+@pytest.mark.parametrize("same_batch", [True, False])
+def test_out_of_order_delivery_keeps_newest_status(A, client, make_user, same_batch):
+    # Stripe ক্রম নিশ্চিত করে না: নতুন (past_due) ইভেন্ট আগে এলে পুরনো checkout সেটি উল্টে দিতে পারবে না
+    user_id = make_user(stripe_customer_id="cus_fixture_1")
+    post_event(client, load_event("02_"))
+    if not same_batch: drain(A)
+    post_event(client, load_event("01_"))
+    drain(A)
+    assert subscription_status(A, user_id) == "past_due"
+    assert statuses(A) == {"evt_fixture_subscription_updated": "applied", "evt_fixture_checkout_completed": "superseded"}
+
+
+def test_unknown_customer_is_unmatched(A, client, make_user):
+    other_id = make_user(stripe_customer_id="cus_someone_else", subscription_status="active")
+    post_event(client, load_event("03_"))
+    assert drain(A) == 1
+    assert statuses(A) == {"evt_fixture_subscription_deleted": "unmatched"}
+    assert subscription_status(A, other_id) == "active"
+
+
+def test_invalid_events_are_rejected(A, client):
+    event = json.loads(load_event("01_")); del event["id"]
+    assert post_event(client, json.dumps(event))[0] == 400
+    assert post_event(client, "not json")[0] == 400
+    assert statuses(A) == {}
@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+
+
+@contextmanager
+def recorded_queries(A):
+    # ব্লকের ভেতরে engine-এ যত SQL চলল
+    seen = []
+    def record(conn, cursor, statement, *args): seen.append(statement)
+    sa.event.listen(A.db.engine, "before_cursor_execute", record)
+    try: yield seen
+    finally: sa.event.remove(A.db.engine, "before_cursor_execute", record)
+
+
+def test_load_user_is_served_from_cache(A, make_user):
+    user_id = make_user("frank")
+    with A.app.app_context():
+        first = A.load_user(str(user_id))
+        with recorded_queries(A) as seen: second = A.load_user(str(user_id))
+        assert seen == [] and second.username == first.username == "frank" and second.is_authenticated
+        assert A.load_user("999") is None
+
+
+def test_committed_changes_invalidate_but_rollbacks_do_not(A, make_user):
+    user_id = make_user("grace")
+    with A.app.app_context():
+        A.load_user(user_id)
+        user = A.db.session.get(A.User, user_id); user.subscription_status = "active"
+        A.db.session.flush(); A.db.session.rollback()
+        assert user_id in A.user_cache._local
+        A.db.session.get(A.User, user_id).subscription_status = "active"; A.db.session.commit()
+        assert user_id not in A.user_cache._local
+        assert A.load_user(user_id).subscription_status == "active"
+
+
+def test_cached_user_loads_row_for_other_attributes(A, make_user):
+    user_id = make_user("heidi")
+    with A.app.app_context():
+        A.load_user(user_id)
+        cached = A.load_user(user_id)
+        assert cached.files == [] and cached.verify_password("secret123")
+
+
+def test_shared_folder_invalidation_reaches_other_workers(A, tmp_path):
+    config = {"USER_CACHE_TTL": 60, "USER_CACHE_FOLDER": str(tmp_path)}
+    worker_a, worker_b = A.UserCache(config), A.UserCache(config)
+    worker_a.put(7, {"id": 7, "username": "ivan"})
+    assert worker_b.get(7) == {"id": 7, "username": "ivan"}
+    worker_a.invalidate(7)
+    assert worker_b.get(7) is None and worker_b.counters == {"hits": 1, "misses": 1, "invalidations": 0}
+
+
+def test_zero_ttl_disables_cache(A):
+    cache = A.UserCache({"USER_CACHE_TTL": 0, "USER_CACHE_FOLDER": None})
+    cache.put(1, {"id": 1})
+    assert cache.get(1) is None and cache.stats()["entries"] == 0
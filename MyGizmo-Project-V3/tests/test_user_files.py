@@ -0,0 +1,52 @@
+import io
+import os
+
+from conftest import login
+
+
+def save(A, user_id, data, name="out.bin", file_type="File Converter"):
+    with A.app.app_context():
+        A.save_user_file(A.db.session.get(A.User, user_id), io.BytesIO(data), name, file_type)
+        return A.UserFile.query.filter_by(user_id=user_id).order_by(A.UserFile.id.desc()).first().saved_filename
+
+
+def blob(A, data):
+    with A.app.app_context(): return A.db.session.get(A.FileBlob, A.file_digest(data))
+
+
+# --- কনটেন্ট-অ্যাড্রেসড ব্লব স্টোর (user-008) ---
+def test_same_content_is_stored_once_and_ref_counted(A, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    data = b"same output" * 100
+    save(A, alice, data); save(A, alice, data, "again.bin"); save(A, bob, data)
+    stored = blob(A, data)
+    assert stored.ref_count == 3 and stored.size == len(data)
+    assert os.path.getsize(A.blob_path(stored.hash)) == len(data) and os.listdir(os.path.join(A.app.config["USER_FILES_FOLDER"], "blobs", "tmp")) == []
+    with A.app.app_context():
+        for user_file in A.UserFile.query.filter_by(user_id=alice).all(): A.db.session.delete(user_file)
+        A.db.session.commit()
+    assert blob(A, data).ref_count == 1
+
+
+def test_gc_removes_unreferenced_blobs_only(A, make_user):
+    alice = make_user("alice")
+    kept, dropped = b"kept", b"dropped"
+    save(A, alice, kept); save(A, alice, dropped)
+    stray = os.path.join(A.app.config["USER_FILES_FOLDER"], "blobs", "tmp", "crashed.tmp")
+    with open(stray, "wb") as fh: fh.write(b"partial")
+    with A.app.app_context():
+        A.db.session.delete(A.UserFile.query.filter_by(blob_hash=A.file_digest(dropped)).one()); A.db.session.commit()
+        A.gc_blobs(min_age_seconds=0) # ব্লব ফোল্ডার সব টেস্টে শেয়ার করা, তাই মোট সংখ্যা নয়, নির্দিষ্ট ফাইলগুলো দেখা হয়
+    assert blob(A, dropped) is None and not os.path.exists(A.blob_path(A.file_digest(dropped)))
+    assert blob(A, kept).ref_count == 1 and os.path.exists(A.blob_path(A.file_digest(kept)))
+    assert not os.path.exists(stray)
+
+
+def test_download_serves_blob_to_owner_only(A, client, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    saved_name = save(A, alice, b"%PDF-1.4 alice", "report.pdf")
+    login(client, bob)
+    assert client.get(f"/download_file/{saved_name}").status_code == 404
+    login(client, alice)
+    r = client.get(f"/download_file/{saved_name}")
+    assert r.data == b"%PDF-1.4 alice" and "report.pdf" in r.headers["Content-Disposition"]